@@ -0,0 +1,72 @@
+"""
+Token <-> AudioQuery mora alignment on synthetic long responses:
+banded monotonic DP vs the old 1:1 positional mapping (time and accuracy).
+
+    python benchmarks/bench_alignment.py [n_tokens ...]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from mora_alignment import align_token_moras, split_moras
+from mora_emotions import MoraEmotions
+
+KANA = "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわん"
+
+
+def synthetic(n_tokens, rng):
+    """
+    Returns (readings, mora_counts, query_moras, true_token_of_query_mora).
+    The query drops punctuation and has some substituted / extra moras,
+    like a real AudioQuery compared to the per-token estimate.
+    """
+    readings, counts = [], []
+    query, truth = [], []
+    for t in range(n_tokens):
+        if rng.random() < 0.1:
+            reading = rng.choice("、。")
+        else:
+            reading = "".join(rng.choice(KANA) for _ in range(rng.randint(1, 3)))
+        readings.append(reading)
+        moras = split_moras(reading)
+        counts.append(len(moras))
+        for mora in moras:
+            if mora in "、。":
+                continue
+            r = rng.random()
+            if r < 0.05:
+                mora = rng.choice(KANA).translate({c: c + 0x60 for c in range(ord("ぁ"), ord("ゖ") + 1)})
+            query.append(mora)
+            truth.append(t)
+            if r > 0.98:
+                query.append("ー")
+                truth.append(t)
+    return readings, counts, query, np.asarray(truth)
+
+
+def main(sizes):
+    rng = random.Random(0)
+    print(f"{'Tokens':>7} | {'Moras':>6} | {'DP time':>9} | {'DP acc':>7} | {'Positional acc':>14}")
+    print("-" * 58)
+    for n in sizes:
+        readings, counts, query, truth = synthetic(n, rng)
+        emotions = MoraEmotions.from_tokens(readings, [1.0] * n, [0.0] * n, counts, readings)
+
+        t = time.perf_counter()
+        alignment = align_token_moras(readings, emotions.token_index, query)
+        elapsed = time.perf_counter() - t
+
+        dp_acc = np.mean(alignment.query_token_index == truth)
+        positional = emotions.padded(len(query))
+        pos_index = np.r_[positional.token_index, np.full(len(query) - positional.data_length, -1)]
+        pos_acc = np.mean(pos_index == truth)
+        print(f"{n:>7} | {len(query):>6} | {elapsed * 1000:>7.1f}ms | {dp_acc:>6.1%} | {pos_acc:>14.1%}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [500, 1000, 5000, 10000])
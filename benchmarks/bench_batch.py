@@ -0,0 +1,90 @@
+"""
+Batch rendering throughput: the same BatchPipeline stages run one prompt at a time
+(generate -> prepare -> synthesize -> write, what a loop over main.py without restarts
+would do) vs overlapped as a StagePipeline with bounded queues, with synthesis on a
+thread or on two worker processes.
+
+The stub Ollama server answers each prompt after llm_delay seconds and the fake VOICEVOX
+core sleeps synth_delay seconds per synthesis, standing in for the real model times.
+
+    python benchmarks/bench_batch.py [n_prompts] [llm_delay] [synth_delay]
+"""
+import functools
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent))
+
+from alignment import TokenMoraMapper
+from batch import BatchPipeline
+from emotion_dynamics import TUNED_PARAMS, EmotionDynamics
+from fake_voicevox import FakeVoicevoxCore
+from llm_client import OllamaClient
+from stub_ollama import StubOllamaServer
+from text_processing import TextProcessor
+from token_streams import synthetic_stream
+from tts_engine import TTSEngine
+
+
+def main(n, llm_delay, synth_delay):
+    dynamics = TUNED_PARAMS  # as in main.py
+    mapper = TokenMoraMapper(TextProcessor())
+    # Picklable, for the worker processes
+    tts = TTSEngine(core_factory=functools.partial(FakeVoicevoxCore, synth_delay=synth_delay), query_cache_size=0)
+    with StubOllamaServer(recorded=synthetic_stream(120), delay=llm_delay) as server, \
+            tempfile.TemporaryDirectory() as d:
+        llm = OllamaClient(server.url, auto_start=False)
+        prompts = os.path.join(d, "prompts.jsonl")
+        with open(prompts, "w", encoding="utf-8") as f:
+            for i in range(n):
+                f.write(json.dumps({"prompt": f"台詞 {i}"}, ensure_ascii=False) + "\n")
+
+        # Reading dictionary, scipy and the fake core are loaded before either run is timed
+        warm_up = BatchPipeline(llm, mapper, EmotionDynamics(**dynamics), tts, os.path.join(d, "warm_up"), verbose=False)
+        with open(os.path.join(d, "warm_up.jsonl"), "w", encoding="utf-8") as f:
+            f.write('{"prompt": "warm up"}\n')
+        warm_up.run(os.path.join(d, "warm_up.jsonl"))
+
+        sequential = BatchPipeline(llm, mapper, EmotionDynamics(**dynamics), tts, os.path.join(d, "seq"), verbose=False)
+        os.makedirs(sequential.output_dir)
+        t = time.perf_counter()
+        audio = 0.0
+        for job in sequential.read_jobs(prompts):
+            job["timings"] = {}
+            sequential._generate(job)
+            sequential._prepare(job)
+            sequential._synthesize(job)
+            sequential._write(job)
+            audio += job["audio_seconds"]
+        t_seq = time.perf_counter() - t
+
+        runs = {}
+        for name, backend, workers in (("thread", "thread", 1), ("process x2", "process", 2)):
+            pipeline = BatchPipeline(llm, mapper, EmotionDynamics(**dynamics), tts, os.path.join(d, backend),
+                                     synth_backend=backend, synth_workers=workers, verbose=False)
+            runs[name] = pipeline.run(prompts)
+        llm.close()
+
+    print(f"{n} prompts, llm_delay={llm_delay}s, synth_delay={synth_delay}s, "
+          f"{audio / n:.1f}s of audio per prompt")
+    print(f"{'':<22} | {'Wall':>8} | {'Prompts/min':>11} | {'Audio s / wall s':>16}")
+    print("-" * 67)
+    print(f"{'sequential':<22} | {t_seq:>7.2f}s | {n / t_seq * 60:>11.1f} | {audio / t_seq:>16.2f}")
+    for name, metrics in runs.items():
+        print(f"{'overlapped, ' + name:<22} | {metrics['wall_time']:>7.2f}s | {metrics['prompts_per_min']:>11.1f} | "
+              f"{metrics['audio_per_wall_second']:>16.2f}")
+    for name, metrics in runs.items():
+        stages = ", ".join(f"{stage} busy {m['busy']:.2f}s / stalled {m['wait_output']:.2f}s"
+                           for stage, m in metrics["stages"].items() if stage != "source")
+        print(f"{name}: {stages}")
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 20,
+         float(args[1]) if len(args) > 1 else 0.1,
+         float(args[2]) if len(args) > 2 else 0.1)
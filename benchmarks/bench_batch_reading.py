@@ -0,0 +1,86 @@
+"""
+Reading analysis of a whole response: TextProcessor.analyze_tokens() (batch, readings
+in context) vs analyze() per token (cold and warm cache).
+
+Accuracy is measured against the reading of each full sentence: the per-token path
+reads split compounds on their own ("東" + "京" -> "ひがし" + "きょう"), so its mora
+counts drift from what the sentence is actually read as.
+
+    python benchmarks/bench_batch_reading.py [n_tokens ...]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from text_processing import TextProcessor
+
+SENTENCES = [
+    "東京タワーへ行きました。",
+    "今日は天気が良いので散歩しましょう。",
+    "新しいPythonのライブラリを試してみた。",
+    "昔々、勇敢な猫が住んでいました！",
+    "自然言語処理の研究は面白いですね。",
+    "Let me think about the plot.",
+    "大切な約束を忘れないでください。",
+]
+
+
+def tokenize(n_tokens, rng):
+    """
+    Sentences split into 1-3 character tokens, like a BPE vocabulary splits Japanese.
+    Returns (tokens, [(first token, end token, sentence index), ...]).
+    """
+    tokens, spans = [], []
+    while len(tokens) < n_tokens:
+        index = rng.randrange(len(SENTENCES))
+        text = SENTENCES[index]
+        first = len(tokens)
+        i = 0
+        while i < len(text):
+            j = i + rng.randint(1, 3)
+            tokens.append(text[i:j])
+            i = j
+        spans.append((first, len(tokens), index))
+    return tokens, spans
+
+
+def drift(analyses, spans, reference):
+    """
+    Sum over sentences of |estimated moras - moras of the sentence's own reading|.
+    """
+    return sum(abs(sum(a["mora_count"] for a in analyses[first:end]) - reference[index])
+               for first, end, index in spans)
+
+
+def main(sizes):
+    rng = random.Random(0)
+    tp = TextProcessor()
+    tp.warm_up()
+    reference = [tp.analyze_tokens([s])[0]["mora_count"] for s in SENTENCES]
+    print(f"{'Tokens':>7} | {'Per-token cold':>14} | {'Per-token warm':>14} | {'Batch':>9} | {'Drift per-token':>15} | {'Drift batch':>11}")
+    print("-" * 86)
+    for n in sizes:
+        tokens, spans = tokenize(n, rng)
+
+        tp.cache.clear()
+        t = time.perf_counter()
+        per_token = [tp.analyze(token) for token in tokens]
+        t_cold = time.perf_counter() - t
+        t = time.perf_counter()
+        for token in tokens:
+            tp.analyze(token)
+        t_warm = time.perf_counter() - t
+
+        t = time.perf_counter()
+        batch = tp.analyze_tokens(tokens)
+        t_batch = time.perf_counter() - t
+
+        print(f"{len(tokens):>7} | {t_cold * 1000:>12.1f}ms | {t_warm * 1000:>12.1f}ms | {t_batch * 1000:>7.1f}ms | "
+              f"{drift(per_token, spans, reference):>15} | {drift(batch, spans, reference):>11}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 10000])
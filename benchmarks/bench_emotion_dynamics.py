@@ -0,0 +1,48 @@
+"""
+Micro-benchmark: scalar EmotionDynamics.update() loop vs update_batch().
+
+    python benchmarks/bench_emotion_dynamics.py [n_moras ...]
+"""
+import sys
+import time
+import random
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from emotion_dynamics import EmotionDynamics
+
+
+def best_of(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t)
+    return best
+
+
+def main(sizes):
+    rng = random.Random(0)
+    print(f"{'Moras':>8} | {'Scalar':>10} | {'Batch':>10} | {'Speedup':>8} | Identical")
+    print("-" * 58)
+    for n in sizes:
+        conf = [rng.random() for _ in range(n)]
+        ent = [rng.random() * 3.0 for _ in range(n)]
+
+        def scalar():
+            ed = EmotionDynamics(decay_rate=0.7, pitch_sensitivity=0.2, speed_sensitivity=0.1)
+            return [ed.update(c, e) for c, e in zip(conf, ent)]
+
+        def batch():
+            ed = EmotionDynamics(decay_rate=0.7, pitch_sensitivity=0.2, speed_sensitivity=0.1)
+            return ed.update_batch(conf, ent)
+
+        identical = batch()["pitch_delta"].tolist() == [r["pitch_delta"] for r in scalar()]
+        t_scalar = best_of(scalar)
+        t_batch = best_of(batch)
+        print(f"{n:>8} | {t_scalar * 1000:>8.2f}ms | {t_batch * 1000:>8.2f}ms | {t_scalar / t_batch:>7.1f}x | {identical}")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1_000, 10_000, 100_000])
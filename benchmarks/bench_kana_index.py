@@ -0,0 +1,89 @@
+"""
+English -> kana on English-heavy text (technical answers): the memory-mapped KanaIndex
+vs the old per-match alkana.get_kana() callback in re.sub.
+
+Load times are measured in fresh interpreters (importing alkana builds a 49k-entry dict;
+numpy is imported before the clock starts, the pipeline has it loaded anyway).
+The throughput columns only time the English replacement, not pykakasi.
+
+    python benchmarks/bench_kana_index.py [n_words ...]
+"""
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+import random
+from pathlib import Path
+
+SRC = str(Path(__file__).parent.parent / "src")
+sys.path.append(SRC)
+
+from kana_index import KanaIndex
+
+WORDS = ("The model returns a JSON response from the API server . Python NumPy arrays and "
+         "GPU kernels make inference fast . Use the HTTPServer class with async handlers ; "
+         "tokens are streamed to the client and cached . LLM の出力を VOICEVOX で読み上げます 。").split()
+
+
+def load_time(code: str) -> float:
+    out = subprocess.run([sys.executable, "-c", f"import sys, time, numpy; sys.path.insert(0, {SRC!r}); "
+                          f"t = time.perf_counter(); {code}; print(time.perf_counter() - t)"],
+                         capture_output=True, text=True, check=True)
+    return float(out.stdout)
+
+
+def main(sizes):
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as d:
+        path = os.path.join(d, "kana_index.bin")
+        KanaIndex.open(path)
+        t_alkana = min(load_time("import alkana; alkana.get_kana('hello')") for _ in range(3))
+        t_index = min(load_time(f"from kana_index import KanaIndex; KanaIndex.load({path!r}).lookup(['hello'])")
+                      for _ in range(3))
+        print(f"Load: alkana {t_alkana * 1000:.1f}ms, kana index {t_index * 1000:.1f}ms "
+              f"({os.path.getsize(path) / 1e6:.1f}MB mapped)\n")
+
+        import alkana
+        index = KanaIndex.load(path)
+        english = re.compile(r"[a-zA-Z]+")
+
+        def old(text):
+            def replace_eng(match):
+                kana = alkana.get_kana(match.group(0).lower())
+                return kana if kana else match.group(0)
+            return english.sub(replace_eng, text)
+
+        def new(text):
+            matches = list(english.finditer(text))
+            readings = index.resolve([m.group(0) for m in matches])
+            parts, pos = [], 0
+            for m, kana in zip(matches, readings):
+                if kana:
+                    parts.append(text[pos:m.start()])
+                    parts.append(kana)
+                    pos = m.end()
+            parts.append(text[pos:])
+            return "".join(parts)
+
+        print(f"{'Words':>7} | {'alkana':>9} | {'Index':>9} | {'Words/s index':>13} | {'Unread old':>10} | {'Unread new':>10}")
+        print("-" * 73)
+        for n in sizes:
+            text = " ".join(rng.choice(WORDS) for _ in range(n))
+            t = time.perf_counter()
+            out_old = old(text)
+            t_old = time.perf_counter() - t
+            t = time.perf_counter()
+            out_new = new(text)
+            t_new = time.perf_counter() - t
+            # Latin words left over (read letter by letter by the rest of the pipeline)
+            unread_old = len(english.findall(out_old))
+            unread_new = len(english.findall(out_new))
+            print(f"{n:>7} | {t_old * 1000:>7.2f}ms | {t_new * 1000:>7.2f}ms | {n / t_new:>13.0f} | "
+                  f"{unread_old:>10} | {unread_new:>10}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [100, 1000, 10000, 100000])
@@ -0,0 +1,67 @@
+"""
+Memory of the aligned mora emotions for a long response:
+list-of-dicts (one dict per mora, plus __PAD__ dicts) vs MoraEmotions (struct of arrays).
+
+    python benchmarks/bench_mora_emotions.py [n_tokens]
+"""
+import sys
+import random
+import tracemalloc
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from mora_emotions import MoraEmotions
+
+
+def list_of_dicts(texts, conf, ent, counts, n_query):
+    # What TokenMoraMapper did before: map_tokens_to_moras + get_aligned_emotions
+    aligned = []
+    for text, c, e, n in zip(texts, conf, ent, counts):
+        for _ in range(n):
+            aligned.append({"source_token": text, "confidence": c, "entropy": e})
+    final = []
+    for i in range(n_query):
+        if i < len(aligned):
+            final.append(aligned[i])
+        else:
+            final.append({"confidence": 1.0, "entropy": 0.0, "source_token": "__PAD__"})
+    return aligned, final
+
+
+def struct_of_arrays(texts, conf, ent, counts, n_query):
+    aligned = MoraEmotions.from_tokens(texts, conf, ent, counts)
+    return aligned, aligned.padded(n_query)
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    result = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current, peak
+
+
+def main(n_tokens):
+    rng = random.Random(0)
+    # Token texts are shared with the LLM response in both cases, so they are created outside
+    texts = [rng.choice(["です", "、", "the", "こんにちは", "。", "ちょっと"]) for _ in range(n_tokens)]
+    conf = [rng.random() for _ in range(n_tokens)]
+    ent = [rng.random() for _ in range(n_tokens)]
+    counts = [rng.randint(0, 4) for _ in range(n_tokens)]
+    n_query = sum(counts) + 50  # query a bit longer than estimated -> padding
+
+    _, before, before_peak = measure(list_of_dicts, texts, conf, ent, counts, n_query)
+    _, after, after_peak = measure(struct_of_arrays, texts, conf, ent, counts, n_query)
+
+    print(f"{n_tokens} tokens, {sum(counts)} moras (+50 padding)")
+    print(f"{'':<18} | {'retained':>10} | {'peak':>10}")
+    print("-" * 46)
+    print(f"{'list of dicts':<18} | {before / 1024:>8.1f}KB | {before_peak / 1024:>8.1f}KB")
+    print(f"{'MoraEmotions':<18} | {after / 1024:>8.1f}KB | {after_peak / 1024:>8.1f}KB")
+    print(f"-> {before / after:.1f}x less retained memory")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000)
@@ -0,0 +1,57 @@
+"""
+Per-request overhead against a local stub Ollama server:
+one-off requests.post (new TCP connection each time) vs OllamaClient's pooled Session.
+
+    python benchmarks/bench_ollama_session.py [n_requests]
+"""
+import sys
+import time
+import json
+from pathlib import Path
+
+import requests
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent))
+
+from llm_client import OllamaClient
+from stub_ollama import StubOllamaServer
+
+
+def unpooled_generate(url, model, prompt):
+    # What OllamaClient did before: module-level requests.post per generation
+    payload = {"model": model, "prompt": prompt, "stream": True}
+    tokens = []
+    with requests.post(f"{url}/api/generate", json=payload, stream=True) as response:
+        for line in response.iter_lines():
+            if line:
+                tokens.append(json.loads(line).get("response", ""))
+    return tokens
+
+
+def main(n):
+    with StubOllamaServer(["こんにちは", "。"] * 5) as server:
+        t = time.perf_counter()
+        for _ in range(n):
+            unpooled_generate(server.url, "stub", "hi")
+        t_before = time.perf_counter() - t
+        conns_before = server.connections
+
+        client = OllamaClient(server.url, auto_start=False)
+        server.connections = 0
+        t = time.perf_counter()
+        for _ in range(n):
+            client.generate("stub", "hi")
+        t_after = time.perf_counter() - t
+        conns_after = server.connections
+        client.close()
+
+    print(f"{n} generations against {server.url}")
+    print(f"{'':<18} | {'per request':>12} | {'TCP connections':>15}")
+    print("-" * 52)
+    print(f"{'requests.post':<18} | {t_before / n * 1000:>10.3f}ms | {conns_before:>15}")
+    print(f"{'pooled Session':<18} | {t_after / n * 1000:>10.3f}ms | {conns_after:>15}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
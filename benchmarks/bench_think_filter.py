@@ -0,0 +1,91 @@
+"""
+Long reasoning traces: streaming ThinkFilter vs the old regex over the full text.
+
+The regex could only run after generation and left the reasoning tokens in the token
+list, so they were still analyzed (TextProcessor) before mapping. The filter drops
+them token by token and knows when the answer starts.
+
+    python benchmarks/bench_think_filter.py [n_reasoning_tokens ...]
+"""
+import re
+import sys
+import time
+import random
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+
+from text_processing import TextProcessor
+from think_filter import ThinkFilter
+
+REASONING = "ユーザーは猫の話を求めている。まず登場人物を考えよう。Let me think about the plot. "
+ANSWER = "昔々、勇敢な猫がいました。ある日、嵐がやってきました！"
+
+
+def tokenize(text, rng):
+    tokens = []
+    i = 0
+    while i < len(text):
+        j = i + rng.randint(1, 4)
+        tokens.append(text[i:j])
+        i = j
+    return tokens
+
+
+def trace(n_reasoning, rng):
+    tokens = []
+    for piece in ("<think>", "</think>"):
+        # Split tags like a BPE vocabulary does: "<", "think", ">"
+        while len(tokens) < n_reasoning and piece == "</think>":
+            tokens.extend(tokenize(REASONING, rng))
+        tokens.extend(["<", piece.strip("<>"), ">"] if rng.random() < 0.5 else [piece])
+    for _ in range(10):
+        tokens.extend(tokenize(ANSWER, rng))
+    return [{"token": t, "done": False, "prob": 0.9, "entropy": 0.1} for t in tokens]
+
+
+def main(sizes):
+    rng = random.Random(0)
+    tp = TextProcessor()
+    tp.warm_up()
+    print(f"{'Reasoning':>9} | {'Tokens':>7} | {'Filter':>9} | {'Regex':>8} | {'Visible at':>10} | {'Analyze old':>11} | {'Analyze new':>11}")
+    print("-" * 84)
+    for n in sizes:
+        chunks = trace(n, rng)
+
+        t = time.perf_counter()
+        f = ThinkFilter()
+        visible = []
+        visible_at = None
+        for i, chunk in enumerate(chunks):
+            out = f.feed(chunk)
+            if out and visible_at is None:
+                visible_at = i
+            visible.extend(out)
+        visible.extend(f.flush())
+        t_filter = time.perf_counter() - t
+
+        t = time.perf_counter()
+        full_text = "".join(c["token"] for c in chunks)
+        clean = re.sub(r"<think>.*?</think>", "", full_text, flags=re.DOTALL).strip()
+        t_regex = time.perf_counter() - t
+        assert clean == "".join(c["token"] for c in visible).strip()
+
+        # Reading analysis of what reaches the mapper (cold cache each time)
+        tp.cache.clear()
+        t = time.perf_counter()
+        for c in chunks:
+            tp.analyze(c["token"])
+        t_old = time.perf_counter() - t
+        tp.cache.clear()
+        t = time.perf_counter()
+        for c in visible:
+            tp.analyze(c["token"])
+        t_new = time.perf_counter() - t
+
+        print(f"{n:>9} | {len(chunks):>7} | {t_filter * 1000:>7.1f}ms | {t_regex * 1000:>6.2f}ms | "
+              f"{'#' + str(visible_at):>10} | {t_old * 1000:>9.1f}ms | {t_new * 1000:>9.1f}ms")
+
+
+if __name__ == "__main__":
+    main([int(a) for a in sys.argv[1:]] or [1000, 10000, 50000])
@@ -0,0 +1,97 @@
+"""
+Recorded token streams: TokenRecording files vs NDJSON of the same normalized chunks
+(one JSON object per line, what a json.dumps() logger would write).
+
+Writes n_sessions synthetic sessions of n_tokens tokens (top-5 logprobs) both ways, then
+compares file size, the time to scan every session's entropy (the input of a parameter
+sweep over EmotionDynamics) and the time to rebuild all chunks for replay.
+
+    python benchmarks/bench_token_recording.py [n_sessions] [n_tokens]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent))
+
+from llm_client import OllamaClient
+from token_metrics import apply_token_metrics
+from token_recording import TokenRecording, recording_paths, scan_recordings
+from token_streams import synthetic_stream
+
+
+def normalized(n_tokens, seed):
+    chunks = [OllamaClient._normalize(None, c) for c in synthetic_stream(n_tokens, seed=seed)]
+    return apply_token_metrics(chunks)
+
+
+def ndjson_entropy(path):
+    with open(path, encoding="utf-8") as f:
+        return np.array([json.loads(line)["entropy"] for line in f], dtype=np.float32)
+
+
+def ndjson_chunks(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def size_of(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+
+def timed(fn):
+    t = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t, result
+
+
+def main(n_sessions, n_tokens):
+    with tempfile.TemporaryDirectory() as d:
+        ndjson_paths = []
+        for i in range(n_sessions):
+            chunks = normalized(n_tokens, i)
+            TokenRecording.from_chunks(chunks, np.arange(len(chunks)) * 0.02).save(os.path.join(d, f"{i:05d}.tokrec"))
+            path = os.path.join(d, f"{i:05d}.ndjson")
+            with open(path, "w", encoding="utf-8") as f:
+                for chunk in chunks:
+                    f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+            ndjson_paths.append(path)
+        paths = recording_paths(d)
+
+        rows = []
+        t_scan_rec, scanned = timed(lambda: [s["entropy"] for s in scan_recordings(paths, ("entropy",))])
+        t_scan_json, parsed = timed(lambda: [ndjson_entropy(p) for p in ndjson_paths])
+        assert all(np.array_equal(a, b) for a, b in zip(scanned, parsed))
+
+        def replay_all():
+            total = 0
+            for p in paths:
+                with TokenRecording.load(p) as rec:
+                    total += sum(1 for _ in rec.chunks())
+            return total
+
+        t_chunks_rec, n_rec = timed(replay_all)
+        t_chunks_json, n_json = timed(lambda: sum(len(ndjson_chunks(p)) for p in ndjson_paths))
+        assert n_rec == n_json
+        rows.append(("size", f"{size_of(ndjson_paths) / 1e6:.2f} MB", f"{size_of(paths) / 1e6:.2f} MB",
+                     size_of(ndjson_paths) / size_of(paths)))
+        rows.append(("scan entropy", f"{t_scan_json:.3f}s", f"{t_scan_rec:.3f}s", t_scan_json / t_scan_rec))
+        rows.append(("rebuild chunks", f"{t_chunks_json:.3f}s", f"{t_chunks_rec:.3f}s", t_chunks_json / t_chunks_rec))
+
+    print(f"{n_sessions} sessions x {n_tokens} tokens (top-5 logprobs)")
+    print(f"{'':<16} | {'NDJSON':>10} | {'tokrec':>10} | {'Ratio':>6}")
+    print("-" * 52)
+    for name, a, b, ratio in rows:
+        print(f"{name:<16} | {a:>10} | {b:>10} | {ratio:>5.1f}x")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 200,
+         int(args[1]) if len(args) > 1 else 500)
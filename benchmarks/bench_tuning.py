@@ -0,0 +1,97 @@
+"""
+EmotionDynamics parameter sweep: one EmotionDynamics.update_batch() run per configuration
+and session (what trying settings one by one amounts to) vs tuning.sweep(), which
+filters each decay rate once for all sessions and derives every sensitivity from it.
+
+Sessions are synthetic token streams saved as TokenRecording files and read back with
+tuning.load_sequences() (token level, <think> stripped). The loop is timed on a small
+grid and reported per configuration; the sweep runs on the full grid with one process
+and with one per core.
+
+    python benchmarks/bench_tuning.py [n_sessions] [n_tokens]
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent))
+
+from emotion_dynamics import EmotionDynamics
+from llm_client import OllamaClient
+from token_metrics import apply_token_metrics
+from token_recording import TokenRecording, recording_paths
+from token_streams import synthetic_stream
+from tuning import DEFAULT_TARGETS, best, load_sequences, sweep
+
+FULL_GRID = (np.linspace(0.5, 0.95, 10), np.linspace(0, 1, 21), np.linspace(0, 0.3, 16))
+SMALL_GRID = (np.linspace(0.5, 0.95, 3), np.linspace(0, 1, 3), np.linspace(0, 0.3, 3))
+
+
+def loop(sequences, decays, pitch, speed):
+    """
+    Score of each configuration from update_batch() curves, one configuration at a time.
+    """
+    scores = np.zeros((len(decays), len(pitch), len(speed)))
+    for i, d in enumerate(decays):
+        for j, p in enumerate(pitch):
+            for k, s in enumerate(speed):
+                dynamics = EmotionDynamics(decay_rate=d, pitch_sensitivity=p, speed_sensitivity=s)
+                pitch_curves, speed_curves = [], []
+                for confidence, entropy in sequences:
+                    dynamics.reset()
+                    state = dynamics.update_batch(confidence, entropy)
+                    pitch_curves.append(state["pitch_delta"])
+                    speed_curves.append(state["speed_delta"])
+                pitch_delta, speed_delta = np.concatenate(pitch_curves), np.concatenate(speed_curves)
+                stats = {"pitch_std": pitch_delta.std(), "pitch_clip_rate": np.mean(np.abs(pitch_delta) > 0.3),
+                         "mean_slowdown": speed_delta.mean(), "length_clip_rate": np.mean(np.abs(speed_delta) > 0.15)}
+                scores[i, j, k] = sum(((stats[n] - t) / tol) ** 2 for n, (t, tol) in DEFAULT_TARGETS.items())
+    return scores
+
+
+def main(n_sessions, n_tokens):
+    with tempfile.TemporaryDirectory() as d:
+        for i in range(n_sessions):
+            chunks = apply_token_metrics([OllamaClient._normalize(None, c) for c in synthetic_stream(n_tokens, seed=i)])
+            TokenRecording.from_chunks(chunks).save(os.path.join(d, f"{i:05d}.tokrec"))
+        t = time.perf_counter()
+        sequences = load_sequences(recording_paths(d))
+        t_load = time.perf_counter() - t
+
+    sweep(sequences[:1], [0.8], [0.1], [0.1])  # scipy import
+    t = time.perf_counter()
+    small = loop(sequences, *SMALL_GRID)
+    t_loop = time.perf_counter() - t
+    np.testing.assert_allclose(small, sweep(sequences, *SMALL_GRID)["score"], rtol=1e-6, atol=1e-9)
+
+    n_full = np.prod([len(axis) for axis in FULL_GRID])
+    n_small = small.size
+    workers = os.cpu_count() or 1
+    runs = {}
+    for name, w in [("sweep, 1 process", 1)] + ([(f"sweep, {workers} processes", workers)] if workers > 1 else []):
+        t = time.perf_counter()
+        result = sweep(sequences, *FULL_GRID, workers=w)
+        runs[name] = time.perf_counter() - t
+
+    values = sum(len(c) for c, _ in sequences)
+    print(f"{n_sessions} sessions, {values} values (loaded in {t_load:.2f}s), {n_full} configurations")
+    print(f"{'':<22} | {'Wall':>9} | {'Per config':>11}")
+    print("-" * 49)
+    print(f"{'loop (' + str(n_small) + ' configs)':<22} | {t_loop:>8.2f}s | {t_loop / n_small * 1000:>9.2f}ms")
+    print(f"{'loop (estimated)':<22} | {t_loop / n_small * n_full:>8.1f}s | {t_loop / n_small * 1000:>9.2f}ms")
+    for name, seconds in runs.items():
+        print(f"{name:<22} | {seconds:>8.2f}s | {seconds / n_full * 1000:>9.3f}ms")
+    row = best(result, 1)[0]
+    print(f"Best: decay_rate={row['decay_rate']:.3f} pitch_sensitivity={row['pitch_sensitivity']:.3f} "
+          f"speed_sensitivity={row['speed_sensitivity']:.3f} (score {row['score']:.3f})")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(int(args[0]) if args else 500,
+         int(args[1]) if len(args) > 1 else 400)
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Stand-in for the `ollama` executable, for testing OllamaServer on machines without Ollama.
+`fake_ollama.py serve` serves StubOllamaServer on OLLAMA_HOST (host:port), like `ollama serve`.
+
+Environment (to simulate a slow or broken server):
+    FAKE_OLLAMA_STARTUP_DELAY   seconds to wait before listening
+    FAKE_OLLAMA_EXIT_CODE       exit with this code instead of serving
+
+    OllamaServer(url, executable=[sys.executable, "benchmarks/fake_ollama.py"])
+"""
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent))
+
+from stub_ollama import StubOllamaServer
+
+
+def main(argv):
+    if argv[:1] != ["serve"]:
+        print("usage: fake_ollama.py serve", file=sys.stderr)
+        return 2
+    host, _, port = os.environ.get("OLLAMA_HOST", "127.0.0.1:11434").rpartition(":")
+    time.sleep(float(os.environ.get("FAKE_OLLAMA_STARTUP_DELAY", "0")))
+    if "FAKE_OLLAMA_EXIT_CODE" in os.environ:
+        return int(os.environ["FAKE_OLLAMA_EXIT_CODE"])
+    server = StubOllamaServer(port=int(port))
+    print(f"fake ollama listening on {server.url}", flush=True)
+    server.serve_forever()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,107 @@
+"""
+Stand-in for voicevox_core.VoicevoxCore, for tests and benchmarks without the DLLs.
+
+AudioQueries use the JSON (dict) form: one mora per kana character,
+a pause after 、。！？ . synthesis() renders each mora as a block of constant
+samples derived from its text and pitch, so the output depends on every
+modulated value and stitched audio can be compared sample by sample.
+
+    TTSEngine(core_factory=FakeVoicevoxCore)
+    TTSEngine(core_factory=functools.partial(FakeVoicevoxCore, synth_delay=0.05))
+"""
+import io
+import time
+import wave
+import zlib
+
+SAMPLE_RATE = 24000
+PAUSE_CHARS = set("、。！？!?,.")
+
+
+class FakeVoicevoxCore:
+    def __init__(self, open_jtalk_dict_dir: str = "", use_gpu: bool = False,
+                 query_delay: float = 0.0, synth_delay: float = 0.0, synth_work: int = 0):
+        """
+        :param query_delay: seconds slept per audio_query call.
+        :param synth_delay: seconds slept per synthesis call.
+        :param synth_work: CPU work per synthesized mora (busy loop iterations), to simulate
+            a compute bound model.
+        """
+        self.query_delay = query_delay
+        self.synth_delay = synth_delay
+        self.synth_work = synth_work
+        self.loaded = set()
+        self.calls = {"audio_query": 0, "synthesis": 0}
+
+    def is_model_loaded(self, speaker_id: int) -> bool:
+        return speaker_id in self.loaded
+
+    def load_model(self, speaker_id: int):
+        self.loaded.add(speaker_id)
+
+    def audio_query(self, text: str, speaker_id: int) -> dict:
+        self.calls["audio_query"] += 1
+        time.sleep(self.query_delay)
+        phrases = []
+        moras = []
+        for c in text:
+            if c in PAUSE_CHARS:
+                if moras:
+                    phrases.append({"moras": moras, "accent": 1, "pause_mora": self._pause(), "is_interrogative": False})
+                    moras = []
+            elif not c.isspace():
+                moras.append({"text": c, "consonant": None, "consonant_length": None,
+                              "vowel": "a", "vowel_length": 0.1, "pitch": 5.5})
+        if moras:
+            phrases.append({"moras": moras, "accent": 1, "pause_mora": None, "is_interrogative": False})
+        return {
+            "accent_phrases": phrases,
+            "speedScale": 1.0,
+            "pitchScale": 0.0,
+            "intonationScale": 1.0,
+            "volumeScale": 1.0,
+            "prePhonemeLength": 0.1,
+            "postPhonemeLength": 0.1,
+            "outputSamplingRate": SAMPLE_RATE,
+            "outputStereo": False,
+            "kana": ""
+        }
+
+    @staticmethod
+    def _pause() -> dict:
+        return {"text": "、", "consonant": None, "consonant_length": None,
+                "vowel": "pau", "vowel_length": 0.2, "pitch": 0.0}
+
+    def synthesis(self, query: dict, speaker_id: int) -> bytes:
+        self.calls["synthesis"] += 1
+        time.sleep(self.synth_delay)
+        speed = query.get("speedScale", 1.0) or 1.0
+
+        def frames(seconds):
+            return max(0, int(round(seconds / speed * SAMPLE_RATE)))
+
+        pcm = bytearray()
+        pcm += bytes(2 * frames(query.get("prePhonemeLength", 0.0)))
+        for phrase in query["accent_phrases"]:
+            for mora in phrase["moras"]:
+                self._burn()
+                length = (mora.get("consonant_length") or 0.0) + mora["vowel_length"]
+                value = zlib.crc32(f"{mora['text']}:{mora['pitch']:.6f}".encode()) % 30000
+                pcm += value.to_bytes(2, "little", signed=True) * frames(length)
+            if phrase.get("pause_mora"):
+                pcm += bytes(2 * frames(phrase["pause_mora"]["vowel_length"]))
+        pcm += bytes(2 * frames(query.get("postPhonemeLength", 0.0)))
+
+        buf = io.BytesIO()
+        with wave.open(buf, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(SAMPLE_RATE)
+            w.writeframes(bytes(pcm))
+        return buf.getvalue()
+
+    def _burn(self):
+        x = 0
+        for i in range(self.synth_work):
+            x += i * i
+        return x
@@ -0,0 +1,135 @@
+"""
+Load test for the HTTP / WebSocket server: N concurrent clients against a SpeechServer
+backed by the stub Ollama server (synthetic answers) and the fake VOICEVOX core.
+Reports time to first audio, total latency, rejected requests and throughput.
+
+    python benchmarks/load_test.py [--clients 16] [--requests 4] [--transport http|ws]
+                                   [--tokens 300] [--max-sessions 4] [--max-queue 16]
+                                   [--synth-workers 1] [--synth-delay 0.02] [--llm-delay 0.0]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web, WSMsgType
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent))
+
+from async_llm_client import AsyncOllamaClient
+from fake_voicevox import FakeVoicevoxCore
+from server import SpeechServer
+from stub_ollama import StubOllamaServer
+from text_processing import TextProcessor
+from token_streams import synthetic_stream
+from tts_engine import TTSEngine
+
+
+async def http_request(session, url):
+    start = time.perf_counter()
+    first = None
+    async with session.post(f"{url}/speak", json={"prompt": "物語を聞かせて"}) as response:
+        if response.status == 503:
+            return None
+        response.raise_for_status()
+        async for line in response.content:
+            message = json.loads(line)
+            if message["type"] == "segment" and first is None:
+                first = time.perf_counter() - start
+            elif message["type"] == "error":
+                raise RuntimeError(message["error"])
+    return first, time.perf_counter() - start
+
+
+async def ws_request(ws):
+    start = time.perf_counter()
+    first = None
+    await ws.send_json({"prompt": "物語を聞かせて"})
+    async for msg in ws:
+        if msg.type == WSMsgType.BINARY:
+            if first is None:
+                first = time.perf_counter() - start
+            continue
+        message = json.loads(msg.data)
+        if message["type"] == "done":
+            break
+        if message["type"] == "error":
+            if message["error"] == "busy":
+                return None
+            raise RuntimeError(message["error"])
+    return first, time.perf_counter() - start
+
+
+async def client(url, transport, n_requests, results):
+    async with aiohttp.ClientSession() as session:
+        if transport == "ws":
+            async with session.ws_connect(f"{url}/ws") as ws:
+                for _ in range(n_requests):
+                    results.append(await ws_request(ws))
+        else:
+            for _ in range(n_requests):
+                results.append(await http_request(session, url))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def run(args):
+    ollama = StubOllamaServer(recorded=synthetic_stream(args.tokens), delay=args.llm_delay).start()
+    tts = TTSEngine(core_factory=lambda *a, **k: FakeVoicevoxCore(*a, synth_delay=args.synth_delay, **k))
+    server = SpeechServer(AsyncOllamaClient(ollama.url, max_concurrency=args.max_sessions), TextProcessor(), tts,
+                          max_sessions=args.max_sessions, max_queue=args.max_queue,
+                          synth_workers=args.synth_workers)
+    runner = web.AppRunner(server.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+    try:
+        results = []
+        start = time.perf_counter()
+        await asyncio.gather(*(client(url, args.transport, args.requests, results) for _ in range(args.clients)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await runner.cleanup()
+        ollama.stop()
+
+    served = [r for r in results if r is not None]
+    first = [r[0] for r in served if r[0] is not None]
+    total = [r[1] for r in served]
+    print(f"{args.clients} clients x {args.requests} requests over {args.transport}, {args.tokens} tokens each, "
+          f"max_sessions={args.max_sessions}, max_queue={args.max_queue}, synth_workers={args.synth_workers}, "
+          f"synth_delay={args.synth_delay}s")
+    print(f"Served {len(served)}, rejected {len(results) - len(served)} in {elapsed:.2f}s "
+          f"({len(served) / elapsed:.2f} answers/s, peak {ollama.max_in_flight} generations)")
+    if served:
+        print(f"{'':<20} | {'p50':>8} | {'p95':>8} | {'max':>8}")
+        print("-" * 53)
+        for name, values in (("time to first audio", first), ("total latency", total)):
+            print(f"{name:<20} | {statistics.median(values):>7.3f}s | {percentile(values, 95):>7.3f}s | "
+                  f"{max(values):>7.3f}s")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test for src/server.py (stub Ollama, fake VOICEVOX)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=4, help="Requests per client, one after another")
+    parser.add_argument("--transport", choices=("http", "ws"), default="http")
+    parser.add_argument("--tokens", type=int, default=300, help="Tokens per answer")
+    parser.add_argument("--max-sessions", type=int, default=4)
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--synth-workers", type=int, default=1)
+    parser.add_argument("--synth-delay", type=float, default=0.02, help="Seconds per fake synthesis call")
+    parser.add_argument("--llm-delay", type=float, default=0.0, help="Seconds before the stub answers")
+    asyncio.run(run(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
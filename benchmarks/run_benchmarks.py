@@ -0,0 +1,274 @@
+"""
+Offline benchmark suite: replays token streams through a stub Ollama server
+(stub_ollama.py) and synthesizes with the fake core (fake_voicevox.py), so the
+whole pipeline can be timed on Linux without network, Ollama or the VOICEVOX DLLs.
+
+Per response size it reports the latency (median of --repeat runs) and throughput of:
+    llm_generate      OllamaClient.generate() against the stub (HTTP, parsing, token metrics)
+    text_processing   TextProcessor.analyze() of every token, cold cache
+    reading_batch     TextProcessor.analyze_tokens() of the whole response
+    mapping           TokenMoraMapper.map_tokens_to_moras() (batch reading analysis)
+    audio_query       TTSEngine.generate_audio_query() (fake core, cold query cache)
+    alignment         TokenMoraMapper.get_aligned_emotions()
+    dynamics          EmotionDynamics.update_batch() over the aligned moras
+    modulation        apply_emotion_modulation() (includes dynamics)
+    synthesis         TTSEngine.synthesis() (fake core)
+    main              main.main(), end to end (fresh caches and working directory per run)
+    main_stream       main.main(stream=True)
+    main_long         main.main(long_form=True)
+
+    python benchmarks/run_benchmarks.py                              # small, medium, large
+    python benchmarks/run_benchmarks.py --sizes 5000 --repeat 5
+    python benchmarks/run_benchmarks.py --recording rec.ndjson       # a stream saved from a real server
+    python benchmarks/run_benchmarks.py --output new.json --baseline old.json
+
+Results are written as JSON (--output); with --baseline the medians are compared and
+the exit status is 1 if any stage got slower than --threshold times the baseline.
+"""
+import argparse
+import contextlib
+import copy
+import datetime
+import io
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+sys.path.append(str(Path(__file__).parent.parent / "src"))
+sys.path.append(str(Path(__file__).parent))
+
+import numpy as np
+
+import main as pipeline_main
+from alignment import TokenMoraMapper
+from emotion_dynamics import EmotionDynamics
+from fake_voicevox import FakeVoicevoxCore
+from llm_client import OllamaClient
+from modulation import apply_emotion_modulation, get_attr
+from stub_ollama import StubOllamaServer
+from text_processing import TextProcessor
+from token_streams import stream_tokens, synthetic_stream
+from tts_engine import TTSEngine
+
+SIZES = {"small": 50, "medium": 500, "large": 5000}
+MODEL = "bench"
+SPEAKER_ID = 1
+
+
+def _time(fn: Callable[[], Any], repeat: int, setup: Callable[[], Any] = None):
+    """
+    Runs fn (or fn(setup()) when setup is given, setup not timed) repeat times.
+    Returns (durations, last result).
+    """
+    durations = []
+    result = None
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        t = time.perf_counter()
+        result = fn(arg) if setup is not None else fn()
+        durations.append(time.perf_counter() - t)
+    return durations, result
+
+
+def _stats(durations: List[float], tokens: int, moras: int) -> Dict[str, float]:
+    median = statistics.median(durations)
+    return {
+        "median_s": median,
+        "min_s": min(durations),
+        "max_s": max(durations),
+        "tokens_per_s": tokens / median if median > 0 else float("inf"),
+        "moras_per_s": moras / median if median > 0 else float("inf"),
+    }
+
+
+def _count_moras(audio_query) -> int:
+    return sum(len(get_attr(p, "moras", [])) for p in get_attr(audio_query, "accent_phrases", []))
+
+
+def _run_main(url: str, repeat: int, stream: bool, long_form: bool = False) -> List[float]:
+    durations = []
+    cwd = os.getcwd()
+    for _ in range(repeat):
+        with tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    t = time.perf_counter()
+                    pipeline_main.main(stream=stream, long_form=long_form, base_url=url,
+                                       core_factory=FakeVoicevoxCore)
+                    durations.append(time.perf_counter() - t)
+                if not Path("output_emotional.wav").exists():
+                    raise RuntimeError("main() did not write any audio")
+            finally:
+                os.chdir(cwd)
+    return durations
+
+
+def _warm_text_processor() -> TextProcessor:
+    """
+    A TextProcessor with converters and kana index loaded but an empty reading cache.
+    """
+    tp = TextProcessor()
+    tp.warm_up()
+    return tp
+
+
+def bench_stream(chunks: List[Dict[str, Any]], repeat: int) -> Dict[str, Any]:
+    n_tokens = stream_tokens(chunks)
+    stages = {}
+    with StubOllamaServer(recorded=chunks) as server:
+        with OllamaClient(server.url, auto_start=False) as llm:
+            durations, res = _time(lambda: llm.generate(model=MODEL, prompt="bench"), repeat)
+        if "error" in res:
+            raise RuntimeError(f"stub generation failed: {res['error']}")
+        stages["llm_generate"] = durations
+        tokens = res["tokens"]
+        text = re.sub(r"<think>.*?</think>", "", res["response"], flags=re.DOTALL).strip()
+
+        texts = [t["token"] for t in tokens]
+        # Lazy imports (pykakasi, kana index, scipy) would land in the first timed run
+        EmotionDynamics().warm_up()
+        stages["text_processing"], _ = _time(
+            lambda tp: [tp.analyze(t) for t in texts], repeat, setup=_warm_text_processor)
+        stages["reading_batch"], _ = _time(
+            lambda tp: tp.analyze_tokens(texts), repeat, setup=_warm_text_processor)
+
+        mapper = TokenMoraMapper(TextProcessor())
+        mapper.map_tokens_to_moras(tokens)  # warm up the converters
+        stages["mapping"], aligned_values = _time(lambda: mapper.map_tokens_to_moras(tokens), repeat)
+
+        stages["audio_query"], audio_query = _time(
+            lambda tts: tts.generate_audio_query(text, SPEAKER_ID), repeat,
+            setup=lambda: TTSEngine(core_factory=FakeVoicevoxCore))
+        moras = _count_moras(audio_query)
+
+        stages["alignment"], mora_emotions = _time(
+            lambda: mapper.get_aligned_emotions(audio_query, aligned_values), repeat)
+
+        dynamics = EmotionDynamics(decay_rate=0.7, pitch_sensitivity=0.2, speed_sensitivity=0.1)
+        confidence = np.asarray(mora_emotions.confidence)
+        entropy = np.asarray(mora_emotions.entropy)
+        stages["dynamics"], _ = _time(
+            lambda: dynamics.update_batch(confidence, entropy, initial_state=(0.0, 0.0)), repeat)
+
+        def modulate(query):
+            dynamics.reset()
+            return apply_emotion_modulation(query, mora_emotions, dynamics, verbose=False)
+        stages["modulation"], _ = _time(modulate, repeat, setup=lambda: copy.deepcopy(audio_query))
+
+        tts = TTSEngine(core_factory=FakeVoicevoxCore)
+        stages["synthesis"], wav = _time(lambda: tts.synthesis(audio_query, SPEAKER_ID), repeat)
+
+        stages["main"] = _run_main(server.url, repeat, stream=False)
+        stages["main_stream"] = _run_main(server.url, repeat, stream=True)
+        stages["main_long"] = _run_main(server.url, repeat, stream=False, long_form=True)
+
+    return {
+        "tokens": n_tokens,
+        "moras": moras,
+        "wav_bytes": len(wav),
+        "stages": {name: _stats(d, n_tokens, moras) for name, d in stages.items()},
+    }
+
+
+def run_suite(streams: Dict[str, List[Dict[str, Any]]], repeat: int = 3) -> Dict[str, Any]:
+    return {
+        "meta": {
+            "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+            "repeat": repeat,
+        },
+        "results": {name: bench_stream(chunks, repeat) for name, chunks in streams.items()},
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float = 1.25) -> List[Dict[str, Any]]:
+    """
+    Median ratios (current / baseline) of every stage present in both runs.
+    """
+    rows = []
+    for name, result in current["results"].items():
+        base = baseline.get("results", {}).get(name)
+        if base is None:
+            continue
+        for stage, stats in result["stages"].items():
+            base_stats = base["stages"].get(stage)
+            if base_stats is None or base_stats["median_s"] <= 0:
+                continue
+            ratio = stats["median_s"] / base_stats["median_s"]
+            rows.append({
+                "size": name, "stage": stage,
+                "baseline_s": base_stats["median_s"], "current_s": stats["median_s"],
+                "ratio": ratio, "regression": ratio > threshold,
+            })
+    return rows
+
+
+def print_results(report: Dict[str, Any]):
+    for name, result in report["results"].items():
+        print(f"\n== {name}: {result['tokens']} tokens, {result['moras']} moras ==")
+        print(f"{'Stage':<16} | {'Median':>10} | {'Min':>10} | {'Tokens/s':>11} | {'Moras/s':>11}")
+        print("-" * 70)
+        for stage, s in result["stages"].items():
+            print(f"{stage:<16} | {s['median_s'] * 1000:>8.2f}ms | {s['min_s'] * 1000:>8.2f}ms | "
+                  f"{s['tokens_per_s']:>11.0f} | {s['moras_per_s']:>11.0f}")
+
+
+def print_comparison(rows: List[Dict[str, Any]]):
+    print(f"\n{'Size':<8} | {'Stage':<16} | {'Baseline':>10} | {'Current':>10} | {'Change':>8}")
+    print("-" * 66)
+    for r in rows:
+        flag = "  REGRESSION" if r["regression"] else ""
+        print(f"{r['size']:<8} | {r['stage']:<16} | {r['baseline_s'] * 1000:>8.2f}ms | "
+              f"{r['current_s'] * 1000:>8.2f}ms | {r['ratio'] - 1:>+7.0%}{flag}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Offline pipeline benchmarks")
+    parser.add_argument("--sizes", nargs="*", default=list(SIZES),
+                        help="Response sizes: small / medium / large or a token count")
+    parser.add_argument("--recording", action="append", default=[],
+                        help="NDJSON stream saved from a real Ollama server (repeatable)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="Earlier --output file to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Slowdown ratio reported as a regression")
+    args = parser.parse_args(argv)
+
+    streams = {}
+    for size in args.sizes:
+        n = SIZES.get(size) or int(size)
+        streams[size if size in SIZES else f"{n}"] = synthetic_stream(n)
+    for path in args.recording:
+        with open(path, encoding="utf-8") as f:
+            streams[Path(path).stem] = [json.loads(line) for line in f if line.strip()]
+
+    report = run_suite(streams, repeat=args.repeat)
+    print_results(report)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            rows = compare(report, json.load(f), args.threshold)
+        print_comparison(rows)
+        if any(r["regression"] for r in rows):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Minimal local stand-in for the Ollama HTTP API (GET /, GET /api/version and POST /api/generate),
+for tests and benchmarks that must run without a real server.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # like the real (Go) server
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, body: bytes, content_type: str):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send(b'{"version": "0.0.0-stub"}', "application/json")
+        else:
+            self._send(b"Ollama is running", "text/plain")
+
+    def do_POST(self):
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        with self.server.lock:
+            self.server.requests.append(payload)
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        try:
+            time.sleep(self.server.delay)
+        finally:
+            with self.server.lock:
+                self.server.in_flight -= 1
+        lines = [json.dumps(chunk, ensure_ascii=False) for chunk in self.server.chunks_for(payload)]
+        self._send(("\n".join(lines) + "\n").encode("utf-8"), "application/x-ndjson")
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    """
+    Serves the given tokens as an Ollama /api/generate NDJSON stream.
+    Extra per-chunk fields (e.g. logprobs) can be given with chunk_extras,
+    or a recorded stream replayed as is with from_recording().
+    delay: seconds each generation takes (max_in_flight records the peak concurrency).
+
+        with StubOllamaServer(["Hello", "!"]) as server:
+            client = OllamaClient(server.url)
+    """
+    daemon_threads = True
+
+    def __init__(self, tokens: List[str] = None, chunk_extras: List[Dict[str, Any]] = None,
+                 delay: float = 0.0, port: int = 0, recorded: List[Dict[str, Any]] = None):
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.tokens = tokens if tokens is not None else ["こんにちは", "。"]
+        self.chunk_extras = chunk_extras or []
+        self.recorded = recorded
+        self.requests: List[Dict[str, Any]] = []
+        self.delay = delay
+        self.connections = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    @classmethod
+    def from_recording(cls, path: str, **kwargs) -> "StubOllamaServer":
+        """
+        Replays an NDJSON stream saved from a real server, e.g.
+        curl -s http://localhost:11434/api/generate -d '{"model": ..., "prompt": ..., "logprobs": true}' > rec.ndjson
+        """
+        with open(path, encoding="utf-8") as f:
+            recorded = [json.loads(line) for line in f if line.strip()]
+        return cls(recorded=recorded, **kwargs)
+
+    def chunks_for(self, payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if self.recorded is not None:
+            return [dict(chunk, model=payload.get("model")) for chunk in self.recorded]
+        chunks = []
+        for i, token in enumerate(self.tokens):
+            chunk = {"model": payload.get("model"), "response": token, "done": False}
+            if i < len(self.chunk_extras):
+                chunk.update(self.chunk_extras[i])
+            chunks.append(chunk)
+        chunks.append({"model": payload.get("model"), "response": "", "done": True})
+        return chunks
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
@@ -0,0 +1,83 @@
+"""
+Token streams for the offline benchmarks, in the raw Ollama /api/generate chunk format
+(what StubOllamaServer.from_recording() replays).
+
+synthetic_stream() builds a deterministic stand-in for a recorded answer: a <think> block
+followed by Japanese text with kanji, kana, English words, numbers and punctuation, split
+into 1-3 character tokens, each with top-5 logprobs.
+
+    chunks = synthetic_stream(5000)
+    save_stream(chunks, "rec_5000.ndjson")
+"""
+import json
+import math
+import random
+from typing import Any, Dict, List
+
+THINK = "<think>ユーザーは短い物語を求めている。勇敢な猫の話にしよう。</think>"
+
+SENTENCES = [
+    "昔々、小さな村に勇敢な猫が住んでいました。",
+    "その猫の名前はタマといいます。",
+    "ある日、村に大きな嵐がやってきました！",
+    "タマは友達のネズミと一緒にPlanを考えました。",
+    "みんなで力を合わせれば、きっと大丈夫だよ。",
+    "空は暗く、風はとても強かったのです。",
+    "でもタマは少しも怖がりませんでした。",
+    "3匹の子猫がHouseの屋根の上で震えていました。",
+    "タマはゆっくりと屋根に登っていきました。",
+    "「もう安心してね」とタマは言いました。",
+    "嵐が去ると、村のみんながタマにありがとうと言いました。",
+    "それからタマは村のHeroになったのです。",
+]
+
+
+def _token_pieces(text: str, rng: random.Random) -> List[str]:
+    pieces = []
+    i = 0
+    while i < len(text):
+        if text[i].isascii() and text[i].isalpha():
+            # English words stay whole, like a BPE vocabulary would mostly keep them
+            j = i
+            while j < len(text) and text[j].isascii() and text[j].isalpha():
+                j += 1
+        else:
+            j = min(len(text), i + rng.randint(1, 3))
+        pieces.append(text[i:j])
+        i = j
+    return pieces
+
+
+def _logprobs(token: str, rng: random.Random, k: int = 5) -> List[Dict[str, Any]]:
+    # Mostly confident tokens with occasional hesitation, like a real sampling run
+    peak = rng.betavariate(5, 1)
+    rest = [rng.random() for _ in range(k - 1)]
+    scale = (1.0 - peak) / sum(rest)
+    probs = [peak] + [r * scale for r in rest]
+    top = [{"token": token, "logprob": math.log(probs[0])}]
+    top += [{"token": f"{token}#{i}", "logprob": math.log(max(p, 1e-12))} for i, p in enumerate(probs[1:])]
+    return [{"token": token, "logprob": top[0]["logprob"], "top_logprobs": top}]
+
+
+def synthetic_stream(n_tokens: int, seed: int = 0, think: bool = True) -> List[Dict[str, Any]]:
+    """
+    Ollama chunks for an answer of exactly n_tokens tokens (plus the final done chunk).
+    """
+    rng = random.Random(seed)
+    tokens = _token_pieces(THINK, rng) if think else []
+    while len(tokens) < n_tokens:
+        tokens.extend(_token_pieces(rng.choice(SENTENCES), rng))
+    tokens = tokens[:n_tokens]
+    chunks = [{"response": t, "done": False, "logprobs": _logprobs(t, rng)} for t in tokens]
+    chunks.append({"response": "", "done": True, "done_reason": "stop"})
+    return chunks
+
+
+def save_stream(chunks: List[Dict[str, Any]], path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        for chunk in chunks:
+            f.write(json.dumps(chunk, ensure_ascii=False) + "\n")
+
+
+def stream_tokens(chunks: List[Dict[str, Any]]) -> int:
+    return sum(1 for chunk in chunks if not chunk.get("done"))
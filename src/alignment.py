@@ -1,101 +1,70 @@
 from typing import List, Dict, Any
 from text_processing import TextProcessor
+from mora_emotions import MoraEmotions
+from mora_alignment import align_token_moras
+from mora_view import MoraView
 
 class TokenMoraMapper:
-    def __init__(self, text_processor: TextProcessor):
+    def __init__(self, text_processor: TextProcessor, band: int = 32, batch: bool = True):
+        """
+        :param band: Half width (in moras) of the DP band used to align token readings
+            to the AudioQuery moras. Larger = tolerates bigger local count drift, slower.
+        :param batch: Read all tokens in one pass (TextProcessor.analyze_tokens), so words
+            split across tokens get their reading in context. False: analyze() per token (cached).
+        """
         self.tp = text_processor
+        self.band = band
+        self.batch = batch
+        # Token <-> AudioQuery mora index of the last get_aligned_emotions() call
+        self.last_alignment = None
 
-    def map_tokens_to_moras(self, tokens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def map_tokens_to_moras(self, tokens: List[Dict[str, Any]]) -> MoraEmotions:
         """
         Takes a list of normalized LLM tokens (with 'token', 'prob', 'top_logprobs' etc.)
-        Returns a list of 'mora-like' structures aligned with emotion values.
+        Returns the 'mora-like' stream of emotion values (one entry per estimated mora).
         
         This is an intermediate representation. 
         Real Voicevox AudioQuery moras will be matched against this later.
         """
-        aligned_moras = []
-        
-        for token_data in tokens:
-            text = token_data.get("token", "")
-            confidence = token_data.get("prob", 1.0)
-            
-            # Use 'top_logprobs' to calculate naive entropy if not provided
-            # For now standardizing logprobs/entropy handling might be outside scope here,
-            # assuming 'entropy' might be pre-calculated or we use a placeholder.
-            # Let's look for 'entropy' key, else 0.0
-            entropy = token_data.get("entropy", 0.0)
-            
-            # Analyze token
-            analysis = self.tp.analyze(text)
-            read_str = analysis["reading"]
-            mora_count = analysis["mora_count"]
-            
-            # If no moras (punctuation, spaces, etc), we still might want to track it 
-            # or just skip for emotion mapping?
-            # Voicevox has pauses.
-            # Let's create an entry per moral
-            
-            if mora_count > 0:
-                # Distribute this token's emotion to its moras
-                # Simple strategy: Copy values.
-                for _ in range(mora_count):
-                    aligned_moras.append({
-                        "source_token": text,
-                        "confidence": confidence,
-                        "entropy": entropy,
-                        # We don't know exact char/mora assignment here without meticulous aligning
-                        # But we just need the stream of values.
-                    })
-            else:
-                # No moras (maybe silence/punctuation)
-                pass
-                
-        return aligned_moras
+        texts = [token_data.get("token", "") for token_data in tokens]
+        confidences = [token_data.get("prob", 1.0) for token_data in tokens]
+        # 'entropy' is pre-calculated by the LLM client (see token_metrics.py), else 0.0
+        entropies = [token_data.get("entropy", 0.0) for token_data in tokens]
+
+        # Analyze tokens
+        # Tokens without moras (punctuation, spaces, etc) get a count of 0 and are skipped.
+        # Simple strategy: every mora of a token copies the token's values.
+        if self.batch:
+            analyses = self.tp.analyze_tokens(texts)
+        else:
+            analyses = [self.tp.analyze(text) for text in texts]
+        readings = [analysis["reading"] for analysis in analyses]
+        mora_counts = [analysis["mora_count"] for analysis in analyses]
+
+        return MoraEmotions.from_tokens(texts, confidences, entropies, mora_counts, readings)
 
-    def get_aligned_emotions(self, audio_query: Any, aligned_values: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    def get_aligned_emotions(self, audio_query: Any, aligned_values: MoraEmotions, view: MoraView = None) -> MoraEmotions:
         """
-        Returns a list of emotion data dicts that corresponds 1-to-1 with the 
+        Returns the emotion values that correspond 1-to-1 with the 
         flattened moras of the provided audio_query.
+        view: MoraView of audio_query, if the caller already has one (it is reused for modulation).
         """
-        # 1. Flatten the AudioQuery moras to count them and establish order
-        #    Note: audio_query might be a Dict or an Object depending on binding.
-        #    We assume attribute access 'accent_phrases' works or dict access.
-        #    Safe way: try dict access, fall back to attribute.
-        
-        def get_attr(obj, key):
-            if isinstance(obj, dict):
-                return obj.get(key)
-            else:
-                return getattr(obj, key, [])
-
-        accent_phrases = get_attr(audio_query, "accent_phrases")
-        
-        flattened_moras = []
-        for phrase in accent_phrases:
-            moras = get_attr(phrase, "moras")
-            for mora in moras:
-                flattened_moras.append(mora)
+        # 1. Flatten the AudioQuery moras to get their texts in order
+        #    (dict or voicevox_core object, see MoraView)
+        query_moras = (view if view is not None else MoraView(audio_query)).texts
                 
         # 2. Map aligned_tokens to these moras
-        #    We assume the text processing phase aligned roughly correctly.
-        #    We will stretch/compress or just map 1:1.
+        #    Token readings are aligned to the mora texts with a banded monotonic DP,
+        #    so a mis-counted token (punctuation, "は" read as "ワ", ...) only affects itself
+        #    instead of shifting every emotion after it.
+        self.last_alignment = None
+        if aligned_values.readings is not None and aligned_values.data_length:
+            alignment = align_token_moras(aligned_values.readings, aligned_values.token_index[:aligned_values.data_length],
+                                          query_moras, band=self.band)
+            if alignment.matched:
+                self.last_alignment = alignment
+                return aligned_values.realigned(alignment.query_token_index)
         
-        final_emotions = []
-        
-        token_mora_idx = 0
-        total_token_moras = len(aligned_values)
-        
-        for i, _ in enumerate(flattened_moras):
-            if token_mora_idx < total_token_moras:
-                # Copy emotion from the aligned token-mora
-                final_emotions.append(aligned_values[token_mora_idx])
-                token_mora_idx += 1
-            else:
-                # Padding if query is longer than expected
-                final_emotions.append({
-                    "confidence": 1.0, 
-                    "entropy": 0.0,
-                    "source_token": "__PAD__"
-                })
-                
-        return final_emotions
+        #    Fallback (no readings / nothing matched): map 1:1 by position,
+        #    truncating or padding (__PAD__) the tail. Both are views, nothing is copied.
+        return aligned_values.padded(len(query_moras))
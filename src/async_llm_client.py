@@ -0,0 +1,126 @@
+import asyncio
+import json
+from typing import Any, AsyncGenerator, Dict, Optional, Union
+
+import aiohttp
+
+from llm_client import OllamaClient
+from token_metrics import apply_token_metrics
+
+class AsyncOllamaClient:
+    """
+    asyncio counterpart of OllamaClient, so one event loop can serve many
+    conversations against one Ollama server.
+    Chunks have the same normalized format as OllamaClient.generate_stream().
+
+    Does not start the Ollama server (see OllamaClient for that).
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434", max_concurrency: int = 8,
+                 connect_timeout: float = 3.0, read_timeout: float = 300.0,
+                 keep_alive: Optional[Union[str, int]] = "30m", top_logprobs: int = 5):
+        """
+        :param max_concurrency: Max simultaneous generations. Further calls wait for a free slot.
+            Also the size of the connection pool.
+        :param connect_timeout: Seconds to wait for a TCP connection.
+        :param read_timeout: Seconds to wait between bytes of a response (i.e. per streamed chunk).
+        :param keep_alive: Ollama 'keep_alive' so the model stays loaded between turns. None = server default.
+        :param top_logprobs: Number of candidate tokens to request logprobs for (0 = no logprobs).
+        """
+        self.base_url = base_url
+        self.api_generate = f"{base_url}/api/generate"
+        self.max_concurrency = max_concurrency
+        self.keep_alive = keep_alive
+        self.top_logprobs = top_logprobs
+        self.timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # Created lazily: aiohttp sessions must be created inside the running loop
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    _build_payload = OllamaClient._build_payload
+    _normalize = OllamaClient._normalize
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def is_running(self) -> bool:
+        try:
+            async with self._get_session().get(self.base_url) as response:
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def generate_stream(self, model: str, prompt: str, system: str = "",
+                              options: Dict[str, Any] = None) -> AsyncGenerator[Dict[str, Any], None]:
+        """
+        Async generator that yields processed chunks from Ollama.
+        Cancelling the consuming task (or closing the generator) aborts the HTTP request
+        and frees the concurrency slot.
+        """
+        payload = self._build_payload(model, prompt, system, options)
+
+        async with self._semaphore:
+            try:
+                async with self._get_session().post(self.api_generate, json=payload) as response:
+                    response.raise_for_status()
+                    async for line in response.content:
+                        line = line.strip()
+                        if line:
+                            yield apply_token_metrics([self._normalize(json.loads(line))])[0]
+
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                print(f"Error calling Ollama: {e!r}")
+                yield {"error": str(e) or repr(e)}
+
+    async def generate(self, model: str, prompt: str, system: str = "",
+                       options: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Non-streaming generation.
+        """
+        full_response = ""
+        tokens = []
+
+        stream = self.generate_stream(model, prompt, system, options)
+        try:
+            async for chunk in stream:
+                if "error" in chunk:
+                    return chunk
+
+                if "token" in chunk:
+                    full_response += chunk["token"]
+                    tokens.append(chunk)
+
+                if chunk.get("done", False):
+                    break
+        finally:
+            # Release the concurrency slot now, not when the generator is garbage collected
+            await stream.aclose()
+
+        return {
+            "response": full_response,
+            "tokens": tokens
+        }
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+if __name__ == "__main__":
+    async def demo():
+        async with AsyncOllamaClient() as client:
+            prompts = ["Hello, how are you?", "こんにちは", "Say hi."]
+            results = await asyncio.gather(*(client.generate(model="qwen2.5:0.5b", prompt=p) for p in prompts))
+            for p, res in zip(prompts, results):
+                print(f"{p} -> {res.get('response', res)}")
+
+    asyncio.run(demo())
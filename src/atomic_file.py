@@ -0,0 +1,44 @@
+import contextlib
+import os
+import tempfile
+from typing import IO, Iterator, Optional, Union
+
+
+@contextlib.contextmanager
+def atomic_open(path: Union[str, os.PathLike], mode: str = "wb", encoding: Optional[str] = None) -> Iterator[IO]:
+    """
+    Opens a temporary file next to path for writing; on success it replaces path, so
+    readers see the old file or the complete new one. The temporary name is unique
+    (tempfile.mkstemp), so processes writing the same path at once (e.g. building a
+    shared kana_index.bin) never write into each other's file. On error it is removed.
+
+        with atomic_open("cache.json", "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+    """
+    if mode not in ("w", "wb"):
+        raise ValueError("mode must be 'w' or 'wb'")
+    path = os.fspath(path)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or ".", prefix=os.path.basename(path) + ".",
+                                    suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode, encoding=encoding) as f:
+            yield f
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def write_atomic(path: Union[str, os.PathLike], data: Union[bytes, str]):
+    """
+    Writes data (bytes, or str as UTF-8) to path with atomic_open().
+    """
+    if isinstance(data, str):
+        with atomic_open(path, "w", encoding="utf-8") as f:
+            f.write(data)
+    else:
+        with atomic_open(path, "wb") as f:
+            f.write(data)
@@ -0,0 +1,322 @@
+import argparse
+import functools
+import json
+import os
+import re
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Add src to path if running from elsewhere
+sys.path.append(str(Path(__file__).parent))
+
+import parallel_synthesis
+from alignment import TokenMoraMapper
+from atomic_file import write_atomic
+from emotion_dynamics import TUNED_PARAMS, EmotionDynamics
+from llm_client import DEFAULT_MODEL, OllamaClient
+from stage_pipeline import Stage, StagePipeline
+from streaming import mora_metadata, prepare_segment
+from think_filter import ThinkFilter
+from wav_writer import split_wav
+
+_SAFE_ID = re.compile(r"^[\w\-][\w.\-]*$")
+STAGES = ("generate", "prepare", "synthesize", "write")
+
+
+def _step(name: str, fn, job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    One stage of one job. A failure is recorded in the job, which goes on (untouched by
+    the later stages) to be reported, so one bad line does not stop the batch.
+    """
+    if "error" in job or job.get("skipped"):
+        return job
+    start = time.perf_counter()
+    try:
+        fn(job)
+    except Exception as e:
+        job["error"] = f"{name}: {e}"
+    job.setdefault("timings", {})[name] = time.perf_counter() - start
+    return job
+
+
+def _synthesize_in_worker(job: Dict[str, Any]):
+    # Process backend: the worker's own TTSEngine (see parallel_synthesis._init_worker)
+    job["wav"] = parallel_synthesis._synthesize(job.pop("audio_query"), job["speaker_id"])
+
+
+class BatchPipeline:
+    """
+    Renders many prompts offline: one WAV file and one JSON metadata file per line of a
+    JSONL file, with the models loaded once for the whole batch.
+
+    The stages run as a StagePipeline, connected by bounded queues (queue_size prompts
+    each), so for consecutive prompts they overlap:
+        generate    LLM answer for prompt N+1 (think filtered)          thread
+        prepare     mapping / AudioQuery / alignment / modulation (N)   thread
+        synthesize  synthesis (N-1)                                     thread, or synth_workers processes
+        write       WAV and metadata files                              the calling thread
+    A slow stage blocks the ones before it instead of letting answers pile up in memory.
+    With the thread backend, prepare (AudioQuery) and synthesize share the VOICEVOX core of
+    tts and take turns on it (TTSEngine serializes core calls); the process backend gives
+    synthesis cores of its own.
+
+    Input lines: {"prompt": ..., "id"?, "speaker_id"?, "system"?, "options"?}; the id
+    (default: the line number) names the output files <id>.wav / <id>.json.
+    The metadata file is written last (atomically), so a prompt counts as done only when
+    both files are complete: after a restart those prompts are skipped (resume).
+    A failed prompt is reported and the batch goes on; it is retried on the next run.
+    """
+
+    def __init__(self, llm, mapper: TokenMoraMapper, dynamics: EmotionDynamics, tts, output_dir: str,
+                 model: str = DEFAULT_MODEL, speaker_id: int = 1, base_speed: float = 1.2,
+                 options: Optional[Dict[str, Any]] = None, queue_size: int = 2, synthesizer=None,
+                 synth_backend: str = "thread", synth_workers: int = 1, verbose: bool = True):
+        """
+        :param options: Default Ollama options, merged with each line's.
+        :param queue_size: Prompts buffered between two stages.
+        :param synthesizer: Object with synthesis(query, speaker_id), e.g. a ParallelSynthesizer.
+            Defaults to tts. Thread backend only.
+        :param synth_backend: "thread", or "process": synth_workers processes with their own
+            VOICEVOX core, created like tts (its core_factory must be picklable), each
+            synthesizing a whole prompt.
+        """
+        if synth_backend not in ("thread", "process"):
+            raise ValueError(f"Unknown synthesis backend '{synth_backend}'")
+        self.llm = llm
+        self.mapper = mapper
+        self.dynamics = dynamics
+        self.tts = tts
+        self.output_dir = output_dir
+        self.model = model
+        self.speaker_id = speaker_id
+        self.base_speed = base_speed
+        self.options = options if options is not None else {"num_predict": 5000}
+        self.queue_size = queue_size
+        self.synthesizer = synthesizer if synthesizer is not None else tts
+        self.synth_backend = synth_backend
+        self.synth_workers = synth_workers
+        self.verbose = verbose
+        self.metrics: Dict[str, Any] = {}
+
+    def paths(self, job_id: str) -> Tuple[str, str]:
+        base = os.path.join(self.output_dir, job_id)
+        return f"{base}.wav", f"{base}.json"
+
+    def is_done(self, job_id: str) -> bool:
+        return os.path.exists(self.paths(job_id)[1])
+
+    def read_jobs(self, path: str) -> Iterator[Dict[str, Any]]:
+        """
+        One job per non-empty line; invalid lines become jobs with an "error".
+        """
+        seen = set()
+        with open(path, encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                job = {"line": line_no, "id": f"{line_no:05d}"}
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict) or not isinstance(request.get("prompt"), str):
+                        raise ValueError("'prompt' (string) is required")
+                    job_id = str(request.get("id", job["id"]))
+                    options = {**self.options, **(request.get("options") or {})}
+                    speaker_id = int(request.get("speaker_id", self.speaker_id))
+                except (ValueError, TypeError) as e:
+                    job["error"] = f"invalid line: {e}"
+                    yield job
+                    continue
+                job.update(id=job_id, prompt=request["prompt"], system=request.get("system", ""),
+                           options=options, speaker_id=speaker_id)
+                if not _SAFE_ID.match(job_id):
+                    job["error"] = f"invalid id '{job_id}'"
+                elif job_id in seen:
+                    job["error"] = f"duplicate id '{job_id}'"
+                seen.add(job_id)
+                yield job
+
+    def _generate(self, job: Dict[str, Any]):
+        result = self.llm.generate(model=self.model, prompt=job["prompt"], system=job["system"],
+                                   options=job["options"])
+        if "error" in result:
+            raise RuntimeError(f"LLM: {result['error']}")
+        think_filter = ThinkFilter()
+        tokens = list(think_filter.filter(result["tokens"]))
+        job["tokens"] = tokens
+        job["text"] = "".join(t["token"] for t in tokens)
+        job["token_count"] = sum(1 for t in result["tokens"] if t["token"])
+        job["think_tokens"] = think_filter.think_tokens
+        if not job["text"].strip():
+            raise ValueError("empty answer (or only thinking)")
+
+    def _prepare(self, job: Dict[str, Any]):
+        self.dynamics.reset()  # every line is a separate utterance
+        job["audio_query"], view, emotions = prepare_segment(
+            job.pop("tokens"), self.mapper, self.dynamics, self.tts, job["speaker_id"], self.base_speed)
+        job["moras"] = mora_metadata(view, emotions)
+
+    def _synthesize(self, job: Dict[str, Any]):
+        job["wav"] = self.synthesizer.synthesis(job.pop("audio_query"), job["speaker_id"])
+
+    def _write(self, job: Dict[str, Any]):
+        wav = job.pop("wav")
+        (channels, sample_width, rate), pcm = split_wav(wav)
+        audio_seconds = len(pcm) / (channels * sample_width * rate)
+        wav_path, meta_path = self.paths(job["id"])
+        write_atomic(wav_path, wav)
+        metadata = {
+            "id": job["id"],
+            "line": job["line"],
+            "prompt": job["prompt"],
+            "model": self.model,
+            "speaker_id": job["speaker_id"],
+            "text": job["text"],
+            "tokens": job["token_count"],
+            "think_tokens": job["think_tokens"],
+            "wav": os.path.basename(wav_path),
+            "sample_rate": rate,
+            "audio_seconds": audio_seconds,
+            "timings": job["timings"],
+            "moras": job["moras"],
+        }
+        write_atomic(meta_path, json.dumps(metadata, ensure_ascii=False, indent=1).encode("utf-8"))
+        job["audio_seconds"] = audio_seconds
+
+    def _jobs(self, path: str) -> Iterator[Dict[str, Any]]:
+        for job in self.read_jobs(path):
+            if "error" not in job and self.is_done(job["id"]):
+                job["skipped"] = True
+            yield job
+
+    def stages(self) -> List[Stage]:
+        if self.synth_backend == "process":
+            initargs = (str(self.tts.core_dir), self.tts.use_gpu, self.tts.core_factory, [self.speaker_id])
+            synthesize = Stage("synthesize", functools.partial(_step, "synthesize", _synthesize_in_worker),
+                               backend="process", workers=self.synth_workers,
+                               queue_size=max(self.queue_size, self.synth_workers),
+                               initializer=parallel_synthesis._init_worker, initargs=initargs)
+        else:
+            synthesize = Stage("synthesize", functools.partial(_step, "synthesize", self._synthesize),
+                               backend="thread", workers=self.synth_workers,
+                               queue_size=max(self.queue_size, self.synth_workers))
+        return [
+            Stage("generate", functools.partial(_step, "generate", self._generate), backend="thread",
+                  queue_size=self.queue_size),
+            Stage("prepare", functools.partial(_step, "prepare", self._prepare), backend="thread",
+                  queue_size=self.queue_size),
+            synthesize,
+        ]
+
+    def run(self, path: str) -> Dict[str, Any]:
+        """
+        Processes the JSONL file at path. Returns self.metrics:
+        prompts, done, skipped, failed (list of {"line", "id", "error"}), audio_seconds,
+        wall_time, prompts_per_min, audio_per_wall_second, per stage busy time and the
+        StagePipeline metrics (queue depths, stalls) in "stages".
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.metrics = {"prompts": 0, "done": 0, "skipped": 0, "failed": [], "audio_seconds": 0.0,
+                        "wall_time": None, "prompts_per_min": None, "audio_per_wall_second": None,
+                        "busy": {name: 0.0 for name in STAGES}, "stages": {}}
+        start = time.perf_counter()
+        pipeline = StagePipeline(self._jobs(path), self.stages(), queue_size=self.queue_size)
+        try:
+            for job in pipeline.run():
+                self._finish(job, start)
+        finally:
+            self.metrics["stages"] = pipeline.metrics
+            for name, stage in pipeline.metrics.items():
+                if name in self.metrics["busy"]:
+                    self.metrics["busy"][name] = stage["busy"]
+            self._report(time.perf_counter() - start, pipeline)
+        return self.metrics
+
+    def _finish(self, job: Dict[str, Any], start: float):
+        self.metrics["prompts"] += 1
+        if job.get("skipped"):
+            self.metrics["skipped"] += 1
+            return
+        write_start = time.perf_counter()
+        _step("write", self._write, job)
+        self.metrics["busy"]["write"] += time.perf_counter() - write_start
+        if "error" in job:
+            self.metrics["failed"].append({"line": job["line"], "id": job["id"], "error": job["error"]})
+            if self.verbose:
+                print(f"[Batch] Line {job['line']} ({job['id']}) failed: {job['error']}")
+            return
+        self.metrics["done"] += 1
+        self.metrics["audio_seconds"] += job["audio_seconds"]
+        if self.verbose:
+            print(f"[Batch] {job['id']}: {job['audio_seconds']:.1f}s of audio, "
+                  f"{time.perf_counter() - start:.1f}s elapsed: '{job['text'].strip()[:30]}'")
+
+    def _report(self, wall_time: float, pipeline: StagePipeline):
+        metrics = self.metrics
+        metrics["wall_time"] = wall_time
+        metrics["prompts_per_min"] = metrics["done"] / wall_time * 60 if wall_time > 0 else 0.0
+        metrics["audio_per_wall_second"] = metrics["audio_seconds"] / wall_time if wall_time > 0 else 0.0
+        if not self.verbose:
+            return
+        print(f"\n[Batch] {metrics['done']} rendered, {metrics['skipped']} already done, "
+              f"{len(metrics['failed'])} failed in {wall_time:.1f}s")
+        print(f"[Batch] {metrics['prompts_per_min']:.1f} prompts/min, "
+              f"{metrics['audio_per_wall_second']:.2f} audio seconds per wall second")
+        for line in pipeline.report().splitlines():
+            print(f"[Batch]   {line}")
+        print(f"[Batch]   {'write':<12} {'caller':<10} {metrics['prompts'] - metrics['skipped']:>6} "
+              f"{metrics['busy']['write']:>7.2f}s")
+
+
+def main(argv=None, core_factory=None):
+    parser = argparse.ArgumentParser(description="Render a JSONL file of prompts to WAV + metadata files")
+    parser.add_argument("input", help="JSONL file, one {\"prompt\": ...} per line")
+    parser.add_argument("output_dir")
+    parser.add_argument("--url", default="http://localhost:11434", help="Ollama server URL")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--speaker", type=int, default=1, help="Default speaker ID")
+    parser.add_argument("--queue-size", type=int, default=2, help="Prompts buffered between stages")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Synthesize pause-separated parts of each answer in N worker processes")
+    parser.add_argument("--synth-processes", type=int, default=0,
+                        help="Synthesize N prompts at a time in worker processes (instead of --workers)")
+    args = parser.parse_args(argv)
+
+    from parallel_synthesis import ParallelSynthesizer
+    from startup import Startup
+    from text_processing import TextProcessor
+    from tts_engine import TTSEngine
+    from wav_cache import WavCache
+
+    # Loaded once for the whole batch; the reading dictionary and VOICEVOX load
+    # while the first answer is generated
+    startup = Startup()
+    llm = OllamaClient(args.url, auto_start=False)
+    llm.ensure_running()
+    llm.preload(args.model)
+    tp = TextProcessor(cache_path="reading_cache.json", kana_index_path="kana_index.bin")
+    startup.run("reading_dict", tp.warm_up, background=True)
+    dynamics = EmotionDynamics(**TUNED_PARAMS)
+    startup.run("dynamics", dynamics.warm_up, background=True)
+    wav_cache = WavCache("wav_cache")
+    tts = TTSEngine(core_factory=core_factory, wav_cache=wav_cache)
+    startup.run("tts", tts.warm_up, [args.speaker], background=True)
+    synthesizer = ParallelSynthesizer(args.workers, core_factory=core_factory, speaker_ids=[args.speaker],
+                                      wav_cache=wav_cache) if args.workers > 1 and not args.synth_processes else None
+    pipeline = BatchPipeline(llm, TokenMoraMapper(tp), dynamics, tts, args.output_dir, model=args.model,
+                             speaker_id=args.speaker, queue_size=args.queue_size, synthesizer=synthesizer,
+                             synth_backend="process" if args.synth_processes else "thread",
+                             synth_workers=max(1, args.synth_processes))
+    try:
+        metrics = pipeline.run(args.input)
+    finally:
+        if synthesizer is not None:
+            synthesizer.close()
+        llm.close()
+        tp.save_cache()
+    return 1 if metrics["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
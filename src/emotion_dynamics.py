@@ -1,3 +1,10 @@
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+# Tuning used by main.py, server.py and batch.py (tuning.py searches for others)
+TUNED_PARAMS = {"decay_rate": 0.7, "pitch_sensitivity": 0.2, "speed_sensitivity": 0.1}
+
 class EmotionDynamics:
     def __init__(self, decay_rate: float = 0.8, pitch_sensitivity: float = 5.0, speed_sensitivity: float = 0.2):
         """
@@ -49,6 +56,57 @@ class EmotionDynamics:
             "speed_delta": self.speed_val
         }
 
+    def update_batch(self, confidence, entropy, initial_state: Optional[Tuple[float, float]] = None) -> Dict[str, Any]:
+        """
+        Vectorized update() over a whole mora sequence.
+        confidence / entropy: array-likes of equal length (one value per mora).
+        initial_state: (pitch_val, speed_val) to start from. Defaults to the current state.
+
+        The recurrence val[n] = val[n-1] * decay +/- impact[n] is run as a first-order
+        IIR filter (scipy.signal.lfilter), which performs the same float operations
+        in the same order as calling update() per mora, so results are bit-identical.
+        The final state is stored back, so consecutive segments can be chained.
+
+        Returns {"pitch_delta": ndarray, "speed_delta": ndarray, "final_state": (pitch_val, speed_val)}
+        """
+        confidence = np.asarray(confidence, dtype=np.float64)
+        entropy = np.asarray(entropy, dtype=np.float64)
+        if confidence.shape != entropy.shape or confidence.ndim != 1:
+            raise ValueError("confidence and entropy must be 1-D arrays of the same length")
+
+        pitch_val, speed_val = initial_state if initial_state is not None else (self.pitch_val, self.speed_val)
+
+        if len(confidence) == 0:
+            pitch_deltas = np.empty(0)
+            speed_deltas = np.empty(0)
+        else:
+            # scipy.signal takes ~0.7s to import, so it is only loaded by the first batch
+            from scipy.signal import lfilter
+
+            # y[n] = x[n] + decay * y[n-1], with the decayed initial state as filter memory
+            a = [1.0, -self.decay_rate]
+            pitch_impact = (1.0 - confidence) * self.pitch_sensitivity
+            pitch_deltas, _ = lfilter([1.0], a, -pitch_impact, zi=[self.decay_rate * pitch_val])
+            speed_impact = entropy * self.speed_sensitivity
+            speed_deltas, _ = lfilter([1.0], a, speed_impact, zi=[self.decay_rate * speed_val])
+            pitch_val = float(pitch_deltas[-1])
+            speed_val = float(speed_deltas[-1])
+
+        self.pitch_val = pitch_val
+        self.speed_val = speed_val
+
+        return {
+            "pitch_delta": pitch_deltas,
+            "speed_delta": speed_deltas,
+            "final_state": (pitch_val, speed_val)
+        }
+
+    def warm_up(self):
+        """
+        Import scipy.signal now (e.g. on a background thread) instead of in the first update_batch().
+        """
+        import scipy.signal
+
     def reset(self):
         self.pitch_val = 0.0
         self.speed_val = 0.0
@@ -0,0 +1,222 @@
+import bisect
+import mmap
+import os
+import re
+import struct
+import threading
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from atomic_file import write_atomic
+
+_MAGIC = b"KANAIDX1"
+_HEADER = struct.Struct("<8sII")  # magic, entry count, key width
+
+# Letter names for acronyms ("GPU" -> "ジーピーユー")
+LETTER_KANA = {
+    "a": "エー", "b": "ビー", "c": "シー", "d": "ディー", "e": "イー", "f": "エフ", "g": "ジー",
+    "h": "エイチ", "i": "アイ", "j": "ジェー", "k": "ケー", "l": "エル", "m": "エム", "n": "エヌ",
+    "o": "オー", "p": "ピー", "q": "キュー", "r": "アール", "s": "エス", "t": "ティー", "u": "ユー",
+    "v": "ブイ", "w": "ダブリュー", "x": "エックス", "y": "ワイ", "z": "ゼット",
+}
+# camelCase / PascalCase / acronym parts: "HTTPServer" -> "HTTP", "Server"; "getKana" -> "get", "Kana"
+_WORD_PART = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+")
+_VOWELS = set("aeiouyAEIOUY")
+# Plural "-s" is voiceless after these
+_VOICELESS_END = set("クプトフッ")
+# Fewer words than this are looked up with bisect: numpy's per-call overhead (~15us)
+# only pays off for batches
+_BATCH_MIN = 16
+
+
+class KanaIndex:
+    """
+    English -> Katakana lookup over the alkana vocabulary, stored as a sorted array of
+    fixed-width ASCII keys plus a (character) offset table into one UTF-8 string of readings.
+
+    Saved to a file, the index is memory-mapped: opening it takes a few milliseconds
+    (no 50k-entry dict is built) and all words of a text are resolved with one
+    np.searchsorted call. Words not in the vocabulary go through fallback rules
+    (see resolve).
+
+        index = KanaIndex.open("kana_index.bin")  # built from alkana on the first run
+        index.resolve(["Python", "GPU", "tokens"])  # ['パイソン', 'ジーピーユー', 'トウクンズ']
+    """
+
+    def __init__(self, buffer, count: int, width: int, source: Optional[mmap.mmap] = None):
+        self.count = count
+        self.width = width
+        keys_size = count * width
+        offsets_at = _HEADER.size + keys_size + (-keys_size % 4)
+        self.keys = np.frombuffer(buffer, dtype=f"S{width}", count=count, offset=_HEADER.size)
+        self.offsets = np.frombuffer(buffer, dtype="<u4", count=count + 1, offset=offsets_at)
+        self._values_at = offsets_at + 4 * (count + 1)
+        self._buffer = buffer
+        self._mmap = source
+        self._values: Optional[str] = None
+
+    @staticmethod
+    def serialize(vocabulary: Dict[str, str]) -> bytes:
+        """
+        The index file contents for {lowercase word: Katakana}.
+        Keys are only looked up by [a-zA-Z]+ words, so other keys ("you're") are left out.
+        """
+        words = sorted(w for w in vocabulary if w.isascii() and w.isalpha())
+        width = max(map(len, words), default=1)
+        keys = np.array(words, dtype=f"S{width}").tobytes()
+        values = [vocabulary[w] for w in words]
+        offsets = np.zeros(len(words) + 1, dtype="<u4")
+        np.cumsum([len(v) for v in values], out=offsets[1:])
+        return b"".join([_HEADER.pack(_MAGIC, len(words), width), keys, b"\0" * (-len(keys) % 4),
+                         offsets.tobytes(), "".join(values).encode("utf-8")])
+
+    @classmethod
+    def from_vocabulary(cls, vocabulary: Dict[str, str]) -> "KanaIndex":
+        return cls.from_bytes(cls.serialize(vocabulary))
+
+    @classmethod
+    def from_bytes(cls, data) -> "KanaIndex":
+        magic, count, width = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not a kana index")
+        return cls(data, count, width)
+
+    @classmethod
+    def load(cls, path: str) -> "KanaIndex":
+        """
+        Memory-map an index file written by save().
+        """
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            magic, count, width = _HEADER.unpack_from(mm)
+            if magic != _MAGIC:
+                raise ValueError(f"{path} is not a kana index")
+        except (ValueError, struct.error):
+            mm.close()
+            raise
+        return cls(mm, count, width, source=mm)
+
+    @classmethod
+    def open(cls, path: Optional[str] = None) -> "KanaIndex":
+        """
+        Load the index at path, or build it from the alkana vocabulary (and save it
+        to path, if given). Unreadable files are rebuilt.
+        """
+        if path and os.path.exists(path):
+            try:
+                return cls.load(path)
+            except (OSError, ValueError, struct.error) as e:
+                print(f"Rebuilding kana index {path}: {e}")
+        from alkana.data import data
+        index = cls.from_vocabulary(data)
+        if path:
+            index.save(path)
+        return index
+
+    def save(self, path: str):
+        write_atomic(path, self._buffer[:])
+
+    def close(self):
+        if self._mmap is not None:
+            # Drop the arrays first, an mmap with exported buffers cannot be closed
+            self.keys = self.offsets = self._buffer = self._values = None
+            self._mmap.close()
+            self._mmap = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def values(self) -> str:
+        # Decoded once on first use (~1ms), so a hit is a str slice instead of a decode
+        if self._values is None:
+            self._values = self._buffer[self._values_at:].decode("utf-8")
+        return self._values
+
+    def lookup(self, words: Sequence[str]) -> List[Optional[str]]:
+        """
+        Vocabulary readings of words (case-insensitive), None where a word is not in it.
+        """
+        if not words or not self.count:
+            return [None] * len(words)
+        if len(words) < _BATCH_MIN:
+            return [self._lookup_one(w) for w in words]
+        lowered = [w.lower() for w in words]
+        queries = np.array(lowered, dtype=f"S{self.width}")  # longer words are truncated ...
+        positions = np.minimum(np.searchsorted(self.keys, queries), self.count - 1)
+        found = self.keys[positions] == queries
+        fits = np.fromiter(map(len, lowered), dtype=np.int64, count=len(lowered)) <= self.width
+        hits = (found & fits).tolist()  # ... and must not match the truncated form
+        starts = self.offsets[positions].tolist()
+        ends = self.offsets[positions + 1].tolist()
+        values = self.values
+        return [values[s:e] if hit else None for hit, s, e in zip(hits, starts, ends)]
+
+    def _lookup_one(self, word: str) -> Optional[str]:
+        key = word.lower().encode("ascii", "replace")
+        if len(key) > self.width:
+            return None
+        i = bisect.bisect_left(self.keys, key)
+        if i == self.count or self.keys[i] != key:
+            return None
+        return self.values[self.offsets[i]:self.offsets[i + 1]]
+
+    def resolve(self, words: Sequence[str]) -> List[Optional[str]]:
+        """
+        Readings of [a-zA-Z]+ words. Out-of-vocabulary words fall back to, in order:
+            acronyms       all capitals or no vowels, spelled letter by letter ("GPU", "http")
+            compounds      camelCase / PascalCase parts ("GitHub", "HTTPServer"), each resolved
+            plurals        "-s" / "-es" on a vocabulary word ("tokens" -> "トウクンズ")
+        None if no rule applies (the word is left as it is).
+        """
+        # Text repeats its words: look up and apply the rules once per distinct word
+        unique = list(dict.fromkeys(words))
+        readings = self.lookup(unique)
+        for i, (word, reading) in enumerate(zip(unique, readings)):
+            if reading is None:
+                readings[i] = self._fallback(word)
+        if len(unique) == len(words):
+            return readings
+        by_word = dict(zip(unique, readings))
+        return [by_word[w] for w in words]
+
+    def _fallback(self, word: str) -> Optional[str]:
+        if word.isupper() or (len(word) > 1 and not _VOWELS.intersection(word)):
+            return spell(word)
+        parts = _WORD_PART.findall(word)
+        if len(parts) > 1:
+            readings = self.resolve(parts)
+            if all(readings):
+                return "".join(readings)
+            return None
+        lower = word.lower()
+        if len(lower) > 3 and lower.endswith("s"):
+            base, plural_of_es = self.lookup([lower[:-1], lower[:-2]])
+            if base is not None:
+                return base + ("ス" if base[-1] in _VOICELESS_END else "ズ")
+            if lower.endswith("es") and plural_of_es is not None:
+                return plural_of_es + "イズ"
+        return None
+
+
+def spell(word: str) -> str:
+    """
+    Letter-by-letter reading ("API" -> "エーピーアイ").
+    """
+    return "".join(LETTER_KANA.get(c, c) for c in word.lower())
+
+
+_shared: Dict[Optional[str], KanaIndex] = {}
+_shared_lock = threading.Lock()
+
+def shared_index(path: Optional[str] = None) -> KanaIndex:
+    """
+    One read-only index per path per process (TextProcessor instances share it).
+    """
+    with _shared_lock:
+        index = _shared.get(path)
+        if index is None:
+            index = _shared[path] = KanaIndex.open(path)
+        return index
@@ -1,103 +1,174 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from typing import Dict, Any, Generator, List
-import subprocess
+from typing import Dict, Any, Generator, List, Optional, Union
 import time
 import random
 
+from ollama_server import OllamaServer
+from token_metrics import apply_token_metrics
+
+# Model used by main.py, server.py and batch.py unless one is given
+DEFAULT_MODEL = "dodo-metan-gpt-oss:latest"
+
 class OllamaClient:
-    def __init__(self, base_url: str = "http://localhost:11434"):
+    def __init__(self, base_url: str = "http://localhost:11434", pool_size: int = 4,
+                 connect_timeout: float = 3.0, read_timeout: float = 300.0,
+                 retries: int = 3, backoff_factor: float = 0.5,
+                 keep_alive: Optional[Union[str, int]] = "30m", top_logprobs: int = 5,
+                 auto_start: bool = True):
+        """
+        :param pool_size: Max pooled (kept-alive) connections to the Ollama server.
+        :param connect_timeout: Seconds to wait for a TCP connection.
+        :param read_timeout: Seconds to wait between bytes of a response (i.e. per streamed chunk).
+        :param retries: Retries on connection errors / 502-504, with exponential backoff.
+            A generation whose response already started streaming is never re-sent.
+        :param keep_alive: Ollama 'keep_alive' (e.g. "30m", -1 = forever) so the model stays
+            loaded between turns. None = server default.
+        :param top_logprobs: Number of candidate tokens to request logprobs for (0 = no logprobs).
+            Used to derive per-token confidence / entropy (see token_metrics.py).
+        """
         self.base_url = base_url
         self.api_generate = f"{base_url}/api/generate"
+        self.timeout = (connect_timeout, read_timeout)
+        self.keep_alive = keep_alive
+        self.top_logprobs = top_logprobs
+        self.session = self._create_session(pool_size, retries, backoff_factor)
+        self.server = OllamaServer(base_url, keep_alive=keep_alive, load_timeout=read_timeout)
+        if auto_start:
+            self._check_and_start_ollama()
+
+    def _create_session(self, pool_size: int, retries: int, backoff_factor: float) -> requests.Session:
+        """
+        One pooled Session per client, so generations reuse keep-alive TCP connections
+        instead of opening one per request. Retries are only mounted for the API endpoints.
+        (Health checks / server start go through self.server, see OllamaServer.)
+        """
+        retry = Retry(
+            total=retries,
+            connect=retries,
+            read=0,
+            status=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=frozenset(["GET", "POST"]),
+            raise_on_status=False
+        )
+        session = requests.Session()
+        session.mount(f"{self.base_url}/api/", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry))
+        session.mount(self.base_url, HTTPAdapter(pool_connections=1, pool_maxsize=1, max_retries=0))
+        return session
+
+    def close(self):
+        self.session.close()
+        self.server.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def ensure_running(self):
+        """
+        Start the Ollama server if it is not running (what auto_start does in __init__).
+        """
         self._check_and_start_ollama()
 
+    def preload(self, model: str) -> bool:
+        """
+        Load the model into the server's memory without generating anything,
+        so the first real generation does not pay for it.
+        """
+        return self.server.warm(model)
+
     def _check_and_start_ollama(self):
         """
-        Check if Ollama server is running, and start it if not.
+        Check if Ollama server is running, and start it if not (see OllamaServer).
         """
         try:
-            requests.get(self.base_url)
-            print("Ollama is already running.")
-            return
-        except requests.exceptions.ConnectionError:
-            print("Ollama is not running. Attempting to start...")
-        
-        try:
-            # subprocess.Popen will start the process in background
-            # 'ollama serve' is the standard command
-            # Creationflags=0x08000000 (CREATE_NO_WINDOW) to hide window if desired, 
-            # but let's keep it simple or use CREATE_NEW_CONSOLE if needed.
-            # On Windows, 'ollama' might be a shell command.
-            # We use shell=True or find absolute path if needed.
-            # Assuming 'ollama' is in PATH as verified by 'where ollama'
-            subprocess.Popen("ollama serve", shell=True, creationflags=subprocess.CREATE_NEW_CONSOLE)
-            
-            # Wait for it to become responsive
-            print("Waiting for Ollama to start...")
-            for i in range(10):
-                try:
-                    time.sleep(2)
-                    requests.get(self.base_url)
-                    print("Ollama started successfully.")
-                    return
-                except requests.exceptions.ConnectionError:
-                    if i == 9:
-                         print("Timed out waiting for Ollama to start.")
-            
+            if self.server.ensure_running():
+                print(f"Ollama started successfully ({self.server.metrics['ready_time']:.2f}s).")
+            else:
+                print("Ollama is already running.")
         except FileNotFoundError:
-             print("Ollama executable not found in PATH.")
+            print("Ollama executable not found in PATH.")
         except Exception as e:
-             print(f"Failed to start Ollama: {e}")
+            print(f"Failed to start Ollama: {e}")
 
-    def generate_stream(self, model: str, prompt: str, system: str = "", options: Dict[str, Any] = None) -> Generator[Dict[str, Any], None, None]:
+    def _iter_chunks(self, model: str, prompt: str, system: str, options: Dict[str, Any]) -> Generator[Dict[str, Any], None, None]:
         """
-        Generator that yields processed chunks from Ollama.
+        Raw JSON chunks from Ollama, or a final {"error": ...}.
         """
-        payload = {
-            "model": model,
-            "prompt": prompt,
-            "system": system,
-            "stream": True,  # Keep streaming for real-time processing
-            "options": options or {}
-        }
-        
-        # To get logprobs, we usually need specific model support or API support.
-        # Standard Ollama API currently (v0.1.x) might simplified response.
-        # We'll check if we can get equivalent info.
+        payload = self._build_payload(model, prompt, system, options)
         
         try:
-            with requests.post(self.api_generate, json=payload, stream=True) as response:
+            with self.session.post(self.api_generate, json=payload, stream=True, timeout=self.timeout) as response:
                 response.raise_for_status()
                 for line in response.iter_lines():
                     if line:
-                        chunk = json.loads(line)
-                        yield self._normalize(chunk)
+                        yield json.loads(line)
                         
         except requests.exceptions.RequestException as e:
             print(f"Error calling Ollama: {e}")
             yield {"error": str(e)}
 
+    def generate_stream(self, model: str, prompt: str, system: str = "", options: Dict[str, Any] = None) -> Generator[Dict[str, Any], None, None]:
+        """
+        Generator that yields processed chunks from Ollama.
+        """
+        for chunk in self._iter_chunks(model, prompt, system, options):
+            if "error" in chunk:
+                yield chunk
+                return
+            yield apply_token_metrics([self._normalize(chunk)])[0]
+
+    def _build_payload(self, model: str, prompt: str, system: str, options: Dict[str, Any]) -> Dict[str, Any]:
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "system": system,
+            "stream": True,  # Keep streaming for real-time processing
+            "options": options or {}
+        }
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if self.top_logprobs > 0:
+            payload["logprobs"] = True
+            payload["top_logprobs"] = self.top_logprobs
+        return payload
+
     def generate(self, model: str, prompt: str, system: str = "", options: Dict[str, Any] = None) -> Dict[str, Any]:
         """
         Non-streaming generation.
         """
         full_response = ""
         tokens = []
+        start = time.perf_counter()
+        first_token_time = None
         
-        for chunk in self.generate_stream(model, prompt, system, options):
+        for chunk in self._iter_chunks(model, prompt, system, options):
             if "error" in chunk:
                 return chunk
             
-            if "token" in chunk:
-                full_response += chunk["token"]
-                tokens.append(chunk)
+            token = self._normalize(chunk)
+            if first_token_time is None and token["token"]:
+                first_token_time = time.perf_counter() - start
+            full_response += token["token"]
+            tokens.append(token)
                 
-            if chunk.get("done", False):
+            if token["done"]:
                 break
+        
+        # Confidence / entropy for the whole response in one batch
+        apply_token_metrics(tokens)
                 
         return {
             "response": full_response,
-            "tokens": tokens
+            "tokens": tokens,
+            "first_token_time": first_token_time,
+            "generation_time": time.perf_counter() - start
         }
 
     def _normalize(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
@@ -110,28 +181,33 @@ class OllamaClient:
         #      self._debug_printed = True 
         
         # chunk structure typical:
-        # { "model": "...", "created_at": "...", "response": "t", "done": false }
-        # If 'logprobs' is supported/enabled, it might be in context?
-        # Currently, Ollama might not return token-level probabilities in simple streaming mode easily
-        # without looking at logits, which requires advanced setup or specific endpoints.
-        # For Phase 1, we will handle the basic "response" field.
-        # IF we cannot get logprobs, we will mock them or use a Placeholder for Phase 2 implementation.
+        # { "model": "...", "created_at": "...", "response": "t", "done": false,
+        #   "logprobs": [{"token": "t", "logprob": -0.1, "top_logprobs": [{"token": "t", "logprob": -0.1}, ...]}] }
+        # 'logprobs' is only present when requested (see _build_payload) and supported by the server.
+        # A chunk usually holds one token; if it holds several, the chunk's logprob is their sum
+        # and the candidates of the first one (the branch point) are kept.
         
-        return {
+        normalized = {
             "token": chunk.get("response", ""),
             "done": chunk.get("done", False),
             
-            # [MOCK] Emotional Data Injection
-            # If API doesn't provide 'prob', we use SAFE DEFAULTS (Neutral).
+            # If API doesn't provide logprobs, we use SAFE DEFAULTS (Neutral).
             # prob: 1.0 (Confident)
             # entropy: 0.0 (Clear)
+            # Otherwise they are filled by token_metrics.apply_token_metrics().
             
             "prob": chunk.get("prob", 1.0),
             "entropy": chunk.get("entropy", 0.0),
-            
-            # Future: Real extraction logic
-            # "top_logprobs": [] 
         }
+        
+        entries = chunk.get("logprobs") or []
+        if entries:
+            normalized["logprob"] = sum(e.get("logprob", 0.0) for e in entries)
+            normalized["top_logprobs"] = [
+                [c.get("token", ""), c.get("logprob", 0.0)] for c in entries[0].get("top_logprobs") or []
+            ]
+        
+        return normalized
 
 if __name__ == "__main__":
     client = OllamaClient()
@@ -0,0 +1,95 @@
+import time
+from typing import Any, Dict, List
+
+from alignment import TokenMoraMapper
+from emotion_dynamics import EmotionDynamics
+from streaming import StreamingPipeline, is_speakable
+from tracing import NULL_TRACE
+from wav_writer import WavWriter
+
+
+class LongFormPipeline(StreamingPipeline):
+    """
+    Long answers (thousands of tokens) with bounded memory.
+
+    The token stream is consumed in windows of whole sentences (up to window_tokens
+    tokens; longer sentences are cut). Each window is mapped, modulated and synthesized,
+    and its frames are appended to the output file (WavWriter) before the next window
+    is read, so neither the token list, the text, the AudioQuery nor the audio of the
+    whole answer is ever held. EmotionDynamics state is carried across windows.
+
+    Unlike StreamingPipeline.run() there is no separate generation thread: while a window is being
+    synthesized the LLM stream is not read, so a model faster than the TTS waits on the
+    connection instead of queueing sentences in memory.
+    """
+
+    def __init__(self, llm, mapper: TokenMoraMapper, dynamics: EmotionDynamics, tts,
+                 speaker_id: int = 1, base_speed: float = 1.2, window_tokens: int = 200,
+                 verbose: bool = True, trace=NULL_TRACE):
+        """
+        :param window_tokens: Tokens synthesized together. Larger windows give OpenJTalk
+            more context (accent phrases across sentences) and cost more memory.
+        """
+        super().__init__(llm, mapper, dynamics, tts, speaker_id=speaker_id, base_speed=base_speed,
+                         verbose=verbose, trace=trace)
+        self.window_tokens = window_tokens
+
+    def _reset_metrics(self):
+        super()._reset_metrics()
+        self.metrics.update({"windows": 0, "bytes": 0, "audio_seconds": 0.0})
+
+    def _speak_window(self, window: List[Dict[str, Any]], out: WavWriter, start: float):
+        text = "".join(t.get("token", "") for t in window)
+        if not is_speakable(text):
+            return
+        try:
+            wav, mora_count = self._speak(window)
+        except Exception as e:
+            print(f"[Long] Warning: skipped window '{text.strip()[:20]}': {e}")
+            return
+        with self.trace.span("file_write") as span:
+            span.count(bytes=out.write_wav(wav))
+
+        elapsed = time.perf_counter() - start
+        if self.metrics["time_to_first_audio"] is None:
+            self.metrics["time_to_first_audio"] = elapsed
+        self.metrics["windows"] += 1
+        self.metrics["bytes"] = out.data_bytes
+        self.metrics["audio_seconds"] = out.duration
+        if self.verbose:
+            print(f"[Long] #{self.metrics['windows'] - 1:03d} ({elapsed:.2f}s, {mora_count} moras, "
+                  f"{out.duration:.1f}s of audio): '{text.strip()[:40]}'")
+
+    def run(self, model: str, prompt: str, output_file: str, system: str = "",
+            options: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Generates, speaks and writes the answer to output_file (nothing is written if
+        nothing was spoken). Returns self.metrics; on LLM failure it has an "error" entry
+        (the audio spoken until then is kept).
+        """
+        start = time.perf_counter()
+        self._reset_metrics()
+        self.dynamics.reset()
+
+        window: List[Dict[str, Any]] = []
+        source = self._segments(start, model, prompt, system, options, max_tokens=self.window_tokens)
+        try:
+            with WavWriter(output_file) as out:
+                for seg in source:
+                    if isinstance(seg, dict):
+                        self.metrics["error"] = seg["error"]
+                        break
+                    self.metrics["segments"] += 1
+                    if window and len(window) + len(seg) > self.window_tokens:
+                        self._speak_window(window, out, start)
+                        window = []
+                    window.extend(seg)
+                if window:
+                    self._speak_window(window, out, start)
+                    window = []
+        except Exception as e:
+            self.metrics["error"] = str(e)
+        finally:
+            source.close()
+            self.metrics["total_time"] = time.perf_counter() - start
+        return self.metrics
@@ -2,52 +2,116 @@ import sys
 import os
 from pathlib import Path
 import json
+import argparse
+import time
+import io
+import wave
 
 # Add src to path if running from elsewhere
 sys.path.append(str(Path(__file__).parent))
 
+_T_IMPORT = time.perf_counter()
+
 # Ensure utf-8 output (for Japanese logging)
 if sys.platform == "win32":
     sys.stdout.reconfigure(encoding='utf-8')
 
-from llm_client import OllamaClient
+from llm_client import DEFAULT_MODEL, OllamaClient
 from text_processing import TextProcessor
-from emotion_dynamics import EmotionDynamics
+from emotion_dynamics import TUNED_PARAMS, EmotionDynamics
 from alignment import TokenMoraMapper
 from tts_engine import TTSEngine
+from modulation import apply_emotion_modulation, set_base_speed
+from mora_view import MoraView
+from streaming import StreamingPipeline
+from long_form import LongFormPipeline
+from parallel_synthesis import ParallelSynthesizer
+from wav_cache import WavCache
+from tracing import NULL_TRACE, Tracer
+from startup import Startup
+from think_filter import ThinkFilter
+from token_recording import RecordingClient, ReplayClient, recording_paths
 
-def main():
-    print("=== LLM Emotional Talk Pipeline [Prototype] ===")
-    
-    # 1. Initialize
-    print("\n[Init] Initializing modules...")
+# Heavy dependencies (pykakasi, alkana, scipy, voicevox_core) are imported on first use
+IMPORT_TIME = time.perf_counter() - _T_IMPORT
+
+def run_streaming(llm, mapper, dynamics, tts, speaker_id, model_name, user_input, output_file, trace=NULL_TRACE):
+    """
+    Streaming mode: each sentence is synthesized as soon as the LLM finishes it.
+    Per-sentence WAV chunks are appended to output_file in order.
+    """
+    print("[Stream] Streaming mode: speaking each sentence while generating the next...")
+    pipeline = StreamingPipeline(llm, mapper, dynamics, tts, speaker_id=speaker_id, trace=trace)
+
+    out = None
     try:
-        llm = OllamaClient()
-        tp = TextProcessor()
-        dynamics = EmotionDynamics(decay_rate=0.7, pitch_sensitivity=0.2, speed_sensitivity=0.1) # Adjusted sensitivity
-        mapper = TokenMoraMapper(tp)
-        tts = TTSEngine() # Speaker 1 = Zundamon
-        speaker_id = 1
-        
-    except Exception as e:
-        print(f"Initialization failed: {e}")
+        for result in pipeline.run(model=model_name, prompt=user_input, options={"num_predict": 5000}):
+            if "error" in result:
+                print(f"LLM Error: {result['error']}")
+                break
+
+            with trace.span("file_write", bytes=len(result["wav"])):
+                with wave.open(io.BytesIO(result["wav"]), "rb") as chunk:
+                    if out is None:
+                        out = wave.open(output_file, "wb")
+                        out.setparams(chunk.getparams())
+                    out.writeframes(chunk.readframes(chunk.getnframes()))
+    finally:
+        if out is not None:
+            out.close()
+
+    metrics = pipeline.metrics
+    if out is None:
+        print("[Error] Nothing was spoken (empty text or only thinking).")
         return
 
-    # 2. Get Prompt
-    user_input = "Tell me a short story about a brave cat."
-    # Or asking user: user_input = input("You: ")
-    print(f"\n[Input] Prompt: {user_input}")
+    print(f"\n[Done] Saved {metrics['segments']} segments to {output_file}")
+    print(f"[Metric] Tokens: {metrics['tokens']}, Generation: {metrics['generation_time']:.2f}s, Total: {metrics['total_time']:.2f}s")
+    print(f"[Metric] Time to first audio: {metrics['time_to_first_audio']:.2f}s")
 
-    # 3. LLM Generation
-    print("[LLM] Generating text (with emotion analysis)...")
-    # Using a model that definitely exists or default.
-    model_name = "dodo-metan-gpt-oss:latest" 
-    
-    # We use non-streaming for Phase 1 simplicity, but streaming is better for latency.
-    # Logic: Get full response -> Process -> Speak.
+def run_long_form(llm, mapper, dynamics, tts, speaker_id, model_name, user_input, output_file, trace=NULL_TRACE):
+    """
+    Long-form mode: the answer is synthesized in windows of sentences and appended to
+    output_file as it goes, so memory does not grow with the length of the answer.
+    """
+    print("[Long] Long-form mode: synthesizing in windows, writing audio incrementally...")
+    pipeline = LongFormPipeline(llm, mapper, dynamics, tts, speaker_id=speaker_id, trace=trace)
+    metrics = pipeline.run(model=model_name, prompt=user_input, output_file=output_file,
+                           options={"num_predict": 5000})
+    if "error" in metrics:
+        print(f"LLM Error: {metrics['error']}")
+    if metrics["windows"] == 0:
+        print("[Error] Nothing was spoken (empty text or only thinking).")
+        return
+
+    print(f"\n[Done] Saved {metrics['windows']} windows ({metrics['audio_seconds']:.1f}s of audio) to {output_file}")
+    print(f"[Metric] Tokens: {metrics['tokens']}, Generation: {metrics['generation_time']:.2f}s, Total: {metrics['total_time']:.2f}s")
+    print(f"[Metric] Time to first audio: {metrics['time_to_first_audio']:.2f}s")
+
+def warm_up_ollama(llm, model_name):
+    llm.ensure_running()
+    llm.preload(model_name)
+
+def save_reading_cache(tp):
+    if tp.cache is None:
+        return
+    stats = tp.cache.stats()
+    print(f"[Proc] Reading cache: {stats['hits']} hits / {stats['misses']} misses (hit rate {stats['hit_rate']:.0%})")
+    try:
+        tp.save_cache()
+    except OSError as e:
+        print(f"[Proc] Warning: Could not save reading cache: {e}")
+
+def run_batch(llm, mapper, dynamics, tts, synthesizer, speaker_id, model_name, user_input, output_file, trace=NULL_TRACE):
+    """
+    Non-streaming mode: get the full response -> process -> speak.
+    (See --stream for the low latency mode)
+    """
+    t_start = time.perf_counter()
     
     # [Adjustment] Increased token limit to 5000 to handle 'thinking' process without cutoff
-    llm_res = llm.generate(model=model_name, prompt=user_input, options={"num_predict": 5000})
+    with trace.span("llm") as span:
+        llm_res = llm.generate(model=model_name, prompt=user_input, options={"num_predict": 5000})
 
     if "error" in llm_res:
         print(f"LLM Error: {llm_res['error']}")
@@ -55,16 +119,21 @@ def main():
         
     tokens = llm_res["tokens"]
     full_text = llm_res["response"]
+    span.count(tokens=sum(1 for t in tokens if t["token"]))
+    if llm_res.get("first_token_time") is not None:
+        trace.record("llm_first_token", llm_res["first_token_time"])
     print(f"[LLM] Raw Response ({len(tokens)} tokens): '{full_text[:100]}...'")
     
-    # [Filter] Strip out <think>...</think> tags if present
-    import re
-    # Remove <think> content (DOTALL to match across newlines)
-    clean_text = re.sub(r'<think>.*?</think>', '', full_text, flags=re.DOTALL).strip()
+    # [Filter] Drop <think>...</think> reasoning tokens before any text processing,
+    # so they are neither analyzed nor shift the token <-> mora alignment
+    with trace.span("think_filter", tokens=len(tokens)):
+        think_filter = ThinkFilter()
+        tokens = list(think_filter.filter(tokens))
+        clean_text = "".join(t["token"] for t in tokens)
     
-    if clean_text != full_text:
+    if think_filter.think_chars:
         print(f"[Proc] Filtered out thinking process. Length: {len(full_text)} -> {len(clean_text)}")
-        full_text = clean_text
+    full_text = clean_text
         
     if not full_text.strip():
         print("[Error] LLM generated empty text (or only thinking). Skipping TTS.")
@@ -73,145 +142,162 @@ def main():
     # 4. Text Processing & Alignment Preparation
     print("[Proc] Mapping tokens to emotional data stream...")
     # This maps Token -> [Mora-like objects with emotion] (Naive)
-    aligned_values = mapper.map_tokens_to_moras(tokens)
+    with trace.span("mapping", tokens=len(tokens)) as span:
+        aligned_values = mapper.map_tokens_to_moras(tokens)
+        span.count(moras=len(aligned_values))
     
     # 5. AudioQuery Generation
     print("[TTS] Generating AudioQuery...")
     # Note: voicevox_core 0.15+ audio_query returns an object usually.
-    audio_query = tts.generate_audio_query(full_text, speaker_id)
+    with trace.span("audio_query", chars=len(full_text)):
+        audio_query = tts.generate_audio_query(full_text, speaker_id)
     
     # [Adjustment] Increase base speed for natural Japanese conversation
-    try:
-        current_speed = getattr(audio_query, "speedScale", 1.0)
-        setattr(audio_query, "speedScale", 1.2)
-        print(f"[TTS] Adjusted base speed: {current_speed} -> 1.2")
-    except Exception as e:
-        print(f"[TTS] Warning: Could not set speedScale: {e}")
+    current_speed = set_base_speed(audio_query, 1.2)
+    print(f"[TTS] Adjusted base speed: {current_speed} -> 1.2")
     
     # 6. Alignment & Modulation
     print("[Mod] applying emotional dynamics...")
     
     # Get parallel list of emotions matching the query structure
-    mora_emotions = mapper.get_aligned_emotions(audio_query, aligned_values)
-    
-    # Flatten query access for modification
-    # We need to modify 'audio_query' in place.
-    # Helper to traverse
-    def get_attr(obj, key):
-        if isinstance(obj, dict):
-            return obj.get(key)
-        else:
-            return getattr(obj, key)
-
-    def set_attr(obj, key, val):
-        if isinstance(obj, dict):
-            obj[key] = val
-        else:
-            setattr(obj, key, val)
-
-    accent_phrases = get_attr(audio_query, "accent_phrases")
-    
-    mora_idx = 0
-    dynamics.reset()
-    
-    for phrase in accent_phrases:
-        moras = get_attr(phrase, "moras")
-        for mora in moras:
-            # Get emotion for this mora
-            emo = mora_emotions[mora_idx]
-            
-            # Physics Update
-            # In Phase 2: Confidence -> Pitch, Entropy -> Speed
-    # [Log] Token-wise modulation summary
-    print("[Mod] applying emotional dynamics (Token-wise Log)...")
-    print(f"{'Token':<15} | {'Conf':<6} | {'Ent':<6} | {'Avg P-Delta':<11} | {'Avg S-Delta':<11}")
-    print("-" * 65)
+    # (the moras are flattened once and shared by alignment and modulation)
+    with trace.span("alignment"):
+        view = MoraView(audio_query)
+        mora_emotions = mapper.get_aligned_emotions(audio_query, aligned_values, view)
     
-    # Helper to print stats
-    def print_token_stat(text, stats):
-         if not stats['pitch_deltas']: return
-         avg_p = sum(stats['pitch_deltas']) / len(stats['pitch_deltas'])
-         avg_s = sum(stats['speed_deltas']) / len(stats['speed_deltas'])
-         # Ensure utf-8 output for stdout
-         p_txt = f"{avg_p:+.4f}"
-         s_txt = f"{avg_s:+.4f}"
-         print(f"{text:<15} | {stats['conf']:.2f}   | {stats['ent']:.2f}   | {p_txt:<11} | {s_txt:<11}")
-
-    last_token_text = None
-    last_token_stats = {"pitch_deltas": [], "speed_deltas": [], "conf": 0.0, "ent": 0.0}
-    
-    for phrase in accent_phrases:
-        moras = get_attr(phrase, "moras")
-        for mora in moras:
-            # Get emotion for this mora
-            emo = mora_emotions[mora_idx]
-            current_token_text = emo.get("source_token", "?")
-            
-            # Check for token change
-            if current_token_text != last_token_text:
-                if last_token_text is not None:
-                     print_token_stat(last_token_text, last_token_stats)
-                
-                # Reset for new token
-                last_token_text = current_token_text
-                last_token_stats = {
-                    "pitch_deltas": [], 
-                    "speed_deltas": [], 
-                    "conf": emo.get('confidence', 1.0), 
-                    "ent": emo.get('entropy', 0.0)
-                }
-            
-            # Physics Update
-            # In Phase 2: Confidence -> Pitch, Entropy -> Speed
-            state = dynamics.update(emo.get('confidence', 1.0), emo.get('entropy', 0.0))
-            
-            pitch_delta = state['pitch_delta']
-            speed_delta = state['speed_delta']
-            
-            # Record for stats
-            last_token_stats['pitch_deltas'].append(pitch_delta)
-            last_token_stats['speed_deltas'].append(speed_delta)
-            
-            # Apply
-            # mora.pitch is usually 0.0.
-            # mora.vowel_length is duration in seconds.
-            
-            try:
-                current_pitch = get_attr(mora, "pitch")
-                current_length = get_attr(mora, "vowel_length")
-            except AttributeError:
-                # Fallback if structure is different
-                mora_idx += 1
-                continue
-            
-            # Debug log - Removed per-mora log
-            # print(f"  [Mora {mora_idx:03d}] ...")
-
-            set_attr(mora, "pitch", current_pitch + pitch_delta)
-            
-            # Length should not be negative.
-            new_length = max(0.01, current_length + speed_delta)
-            set_attr(mora, "vowel_length", new_length)
-            
-            mora_idx += 1
-            
-    # Print final token
-    if last_token_text:
-        print_token_stat(last_token_text, last_token_stats)
+    with trace.span("modulation") as span:
+        dynamics.reset()
+        span.count(moras=apply_emotion_modulation(audio_query, mora_emotions, dynamics, view=view))
             
     print("[Mod] Modulation complete.")
     
     # 7. Synthesis
-    print("[TTS] Synthesizing...")
-    wav_data = tts.synthesis(audio_query, speaker_id)
+    with trace.span("synthesis") as span:
+        if synthesizer is not None:
+            print(f"[TTS] Synthesizing with {synthesizer.workers} workers...")
+            wav_data = synthesizer.synthesis(audio_query, speaker_id)
+        else:
+            print("[TTS] Synthesizing...")
+            wav_data = tts.synthesis(audio_query, speaker_id)
+        span.count(bytes=len(wav_data))
     
-    output_file = "output_emotional.wav"
-    with open(output_file, "wb") as f:
-        f.write(wav_data)
+    with trace.span("file_write", bytes=len(wav_data)):
+        with open(output_file, "wb") as f:
+            f.write(wav_data)
         
     print(f"\n[Done] Saved to {output_file}")
+    print(f"[Metric] Time to first audio: {time.perf_counter() - t_start:.2f}s")
     
     # Playback? (Requires pyaudio/simpleaudio, skipped for now)
 
+def main(stream: bool = False, workers: int = 1, base_url: str = "http://localhost:11434",
+         core_factory=None, user_input: str = "Tell me a short story about a brave cat.",
+         output_file: str = "output_emotional.wav", trace_path: str = None, metrics_path: str = None,
+         long_form: bool = False, record_dir: str = None, replay_path: str = None):
+    """
+    :param record_dir: Save the LLM token stream to this directory (see RecordingClient).
+    :param replay_path: Replay a recorded token stream (file or directory) instead of asking Ollama.
+    :param long_form: Synthesize in windows with bounded memory (see LongFormPipeline).
+    :param base_url: Ollama server.
+    :param core_factory: See TTSEngine (e.g. a fake core for benchmarks).
+    :param trace_path: Append per-step timings of the request to this JSON lines file.
+    :param metrics_path: Write the step timings as a Prometheus text dump.
+    """
+    print("=== LLM Emotional Talk Pipeline [Prototype] ===")
+    startup = Startup()
+    startup.record("imports", IMPORT_TIME)
+    # Using a model that definitely exists or default.
+    model_name = DEFAULT_MODEL
+    
+    # 1. Initialize
+    # Slow steps (server check + model load, reading dictionary, VOICEVOX core + speaker)
+    # run in the background, overlapping each other and the LLM generation.
+    print("\n[Init] Initializing modules...")
+    try:
+        if replay_path:
+            llm = ReplayClient(recording_paths(replay_path) if os.path.isdir(replay_path) else replay_path, realtime=True)
+        else:
+            llm = OllamaClient(base_url, auto_start=False)
+        if record_dir:
+            llm = RecordingClient(llm, record_dir)
+        startup.run("ollama", warm_up_ollama, llm, model_name, background=True)
+        tp = TextProcessor(cache_path="reading_cache.json", # Pre-warmed reading cache
+                           kana_index_path="kana_index.bin")
+        startup.run("reading_dict", tp.warm_up, background=True)
+        dynamics = EmotionDynamics(**TUNED_PARAMS)
+        startup.run("dynamics", dynamics.warm_up, background=True)
+        mapper = TokenMoraMapper(tp)
+        wav_cache = WavCache("wav_cache") # Identical (modulated) sentences are not re-synthesized
+        tts = TTSEngine(core_factory=core_factory, wav_cache=wav_cache) # Speaker 1 = Zundamon
+        speaker_id = 1
+        startup.run("tts", tts.warm_up, [speaker_id], background=True)
+        # Worker processes start (and load the speaker) while the LLM is generating
+        synthesizer = ParallelSynthesizer(workers, core_factory=core_factory, speaker_ids=[speaker_id], wav_cache=wav_cache) if workers > 1 and not (stream or long_form) else None
+        # Disabled (no-op) unless an output is requested
+        tracer = Tracer(enabled=bool(trace_path or metrics_path), jsonl_path=trace_path)
+        startup.wait("ollama")
+        
+    except Exception as e:
+        print(f"Initialization failed: {e}")
+        return
+    print(f"[Init] Ready to generate after {time.perf_counter() - startup.t0:.2f}s")
+
+    # 2. Get Prompt
+    # Or asking user: user_input = input("You: ")
+    print(f"\n[Input] Prompt: {user_input}")
+
+    # 3. LLM Generation
+    print("[LLM] Generating text (with emotion analysis)...")
+    
+    mode = "stream" if stream else "long" if long_form else "batch"
+    trace = tracer.trace(mode=mode, model=model_name)
+    try:
+        if stream:
+            run_streaming(llm, mapper, dynamics, tts, speaker_id, model_name, user_input, output_file, trace)
+        elif long_form:
+            run_long_form(llm, mapper, dynamics, tts, speaker_id, model_name, user_input, output_file, trace)
+        else:
+            run_batch(llm, mapper, dynamics, tts, synthesizer, speaker_id, model_name, user_input, output_file, trace)
+    finally:
+        if synthesizer is not None:
+            synthesizer.close()
+        print("[Startup] Breakdown:")
+        for line in startup.report().splitlines():
+            print(f"[Startup]   {line}")
+        for name, step in startup.steps.items():
+            if step["duration"] is not None:
+                trace.record(f"startup_{name}", step["duration"])
+        report = tracer.finish(trace)
+        if report is not None:
+            print_trace(report)
+        if metrics_path:
+            tracer.write_prometheus(metrics_path)
+        save_reading_cache(tp)
+
+def print_trace(report):
+    print(f"[Trace] Request {report['request_id']}: {report['duration']:.3f}s")
+    for span in report["spans"]:
+        counts = ", ".join(f"{k}={v}" for k, v in span.items() if k not in ("name", "duration") and not k.endswith("_per_s"))
+        print(f"[Trace]   {span['name']:<16} {span['duration'] * 1000:9.1f}ms  {counts}")
+
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="LLM Emotional Talk Pipeline")
+    parser.add_argument("--stream", action="store_true",
+                        help="Speak each sentence while the LLM is still generating the next one")
+    parser.add_argument("--long", action="store_true",
+                        help="Long answers: synthesize in windows and write the audio incrementally (bounded memory)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Synthesize pause-separated parts of the answer in N worker processes")
+    parser.add_argument("--url", default="http://localhost:11434", help="Ollama server URL")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="Append per-step timings and counts of the request to a JSON lines file")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="Write per-step timings and counts as a Prometheus text dump")
+    parser.add_argument("--record", metavar="DIR",
+                        help="Save the LLM token stream (tokens, probabilities, timing) to DIR for replay")
+    parser.add_argument("--replay", metavar="PATH",
+                        help="Replay a recorded token stream (file or directory) at its original timing instead of asking Ollama")
+    args = parser.parse_args()
+    main(stream=args.stream, workers=args.workers, base_url=args.url,
+         trace_path=args.trace, metrics_path=args.metrics, long_form=args.long,
+         record_dir=args.record, replay_path=args.replay)
@@ -0,0 +1,75 @@
+from typing import Any
+
+from emotion_dynamics import EmotionDynamics
+from mora_emotions import MoraEmotions
+from mora_view import MoraView
+
+
+def get_attr(obj, key, default=None):
+    """
+    AudioQuery may be a Dict (JSON form) or an Object depending on binding.
+    """
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    else:
+        return getattr(obj, key, default)
+
+
+def set_attr(obj, key, val):
+    if isinstance(obj, dict):
+        obj[key] = val
+    else:
+        setattr(obj, key, val)
+
+
+def set_base_speed(audio_query: Any, speed: float) -> float:
+    """
+    Set the global speed of the query and return the previous value.
+    JSON form uses 'speedScale', the voicevox_core object uses 'speed_scale'.
+    """
+    if isinstance(audio_query, dict) or not hasattr(audio_query, "speed_scale"):
+        key = "speedScale"
+    else:
+        key = "speed_scale"
+    current = get_attr(audio_query, key, 1.0)
+    set_attr(audio_query, key, speed)
+    return current
+
+
+def apply_emotion_modulation(audio_query: Any, mora_emotions: MoraEmotions,
+                             dynamics: EmotionDynamics, verbose: bool = True,
+                             view: MoraView = None) -> int:
+    """
+    Run the emotion physics over the moras of audio_query (in place) and
+    apply the resulting pitch / length deltas.
+    mora_emotions must correspond 1-to-1 with the flattened moras
+    (see TokenMoraMapper.get_aligned_emotions).
+    The dynamics state is NOT reset here, so consecutive segments can be chained.
+    view: MoraView of audio_query, if the caller already has one (e.g. from alignment).
+    Returns the number of modulated moras.
+    """
+    if view is None:
+        view = MoraView(audio_query)
+    emotions = mora_emotions[:len(view)]
+
+    # Physics Update (whole sequence at once)
+    # In Phase 2: Confidence -> Pitch, Entropy -> Speed
+    confidence = emotions.confidence
+    entropy = emotions.entropy
+    state = dynamics.update_batch(confidence, entropy)
+
+    if verbose:
+        print("[Mod] applying emotional dynamics (Token-wise Log)...")
+        print(f"{'Token':<15} | {'Conf':<6} | {'Ent':<6} | {'Avg P-Delta':<11} | {'Avg S-Delta':<11}")
+        print("-" * 65)
+        for run in emotions.token_runs():
+            start, stop = run["start"], run["stop"]
+            p_txt = f"{state['pitch_delta'][start:stop].mean():+.4f}"
+            s_txt = f"{state['speed_delta'][start:stop].mean():+.4f}"
+            print(f"{run['token']:<15} | {confidence[start]:.2f}   | {entropy[start]:.2f}   | {p_txt:<11} | {s_txt:<11}")
+
+    # Pitch shifts voiced moras, entropy stretches the vowel (length should not be negative)
+    view.apply(state['pitch_delta'], state['speed_delta'], min_length=0.01)
+    view.write_back()
+
+    return len(view)
@@ -0,0 +1,216 @@
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+# Same definition as TextProcessor: small kana are part of the previous mora (small tsu is not)
+SMALL_KANA = set("ぁぃぅぇぉゃゅょゎァィゥェォャュョヮ")
+
+# AudioQuery mora texts are Katakana, TextProcessor readings are Hiragana
+_HIRA_TO_KATA = {c: c + 0x60 for c in range(ord("ぁ"), ord("ゖ") + 1)}
+
+_VOWEL_ROWS = {
+    "a": "アカガサザタダナハバパマヤラワャァヵ",
+    "i": "イキギシジチヂニヒビピミリヰィ",
+    "u": "ウクグスズツヅヌフブプムユルュゥヴ",
+    "e": "エケゲセゼテデネヘベペメレヱェヶ",
+    "o": "オコゴソゾトドノホボポモヨロヲョォ",
+}
+_VOWEL_OF = {c: v for v, row in _VOWEL_ROWS.items() for c in row}
+_VOWEL_OF.update({"ン": "N", "ッ": "Q"})
+_BARE_VOWEL = {"a": "ア", "i": "イ", "u": "ウ", "e": "エ", "o": "オ"}
+# Kana written one way but pronounced as a long vowel: おう -> オー, えい -> エー
+_LONG_AFTER = {("o", "ウ"), ("e", "イ")}
+
+# Estimated moras that are not kana (punctuation, unconverted latin, digits) usually
+# have no counterpart in the AudioQuery, so dropping them is cheap.
+NON_KANA_DELETE_COST = 0.2
+
+def split_moras(reading: str) -> List[str]:
+    """
+    Split a kana reading into Katakana moras ("ちょっと" -> ["チョ", "ッ", "ト"]).
+    Produces exactly TextProcessor.analyze()["mora_count"] moras.
+    """
+    moras = []
+    for c in reading.translate(_HIRA_TO_KATA):
+        if c in SMALL_KANA:
+            if moras:
+                moras[-1] += c
+            # A leading small kana is not a mora on its own
+        else:
+            moras.append(c)
+    return moras
+
+def mora_features(moras: Sequence[str]) -> Tuple[List[str], List[str]]:
+    """
+    Canonical form and vowel class of each Katakana mora, for matching.
+    Long vowels are spelled out as the vowel they extend ("キョ", "ー" / "キョ", "ウ" -> "キョ", "オ").
+    Non-kana symbols get a class of their own.
+    """
+    canonical = []
+    vowels = []
+    prev_vowel = None
+    for mora in moras:
+        vowel = _VOWEL_OF.get(mora[-1]) if mora else None
+        if prev_vowel in _BARE_VOWEL and (mora == "ー" or (prev_vowel, mora) in _LONG_AFTER):
+            mora, vowel = _BARE_VOWEL[prev_vowel], prev_vowel
+        canonical.append(mora)
+        vowels.append(vowel if vowel is not None else "?" + mora)
+        prev_vowel = vowel
+    return canonical, vowels
+
+def align_sequences(a: Sequence[int], b: Sequence[int], band: int = 32,
+                    a_groups: Sequence[int] = None, b_groups: Sequence[int] = None,
+                    a_delete_cost: Sequence[float] = None,
+                    gap_cost: float = 1.0, sub_cost: float = 1.0, similar_cost: float = 0.5) -> np.ndarray:
+    """
+    Monotonic (order preserving) edit-distance alignment of two symbol sequences,
+    restricted to a band of +/- `band` cells around the diagonal i * len(b) / len(a).
+    Each DP row is computed with NumPy (the within-row gap recurrence is a running minimum),
+    so the cost is O((len(a) + len(b)) * band).
+
+    a_groups / b_groups: substituting symbols of the same group costs similar_cost instead of sub_cost.
+    a_delete_cost: per-symbol cost of leaving a[i] unmatched (default gap_cost).
+
+    Returns, for every position of b, the aligned position in a (-1 if b[j] is an insertion).
+    """
+    a = np.asarray(a)
+    b = np.asarray(b)
+    n, m = len(a), len(b)
+    a_groups = a if a_groups is None else np.asarray(a_groups)
+    b_groups = b if b_groups is None else np.asarray(b_groups)
+    a_delete_cost = np.full(n, gap_cost) if a_delete_cost is None else np.asarray(a_delete_cost, dtype=np.float64)
+    result = np.full(m, -1, dtype=np.intp)
+    if n == 0 or m == 0:
+        return result
+
+    # The band must be wide enough for the ends to connect even when the lengths differ a lot
+    w = band + int(np.ceil(m / n))
+    centers = np.rint(np.arange(n + 1) * (m / n)).astype(np.intp)
+    lo = np.maximum(centers - w, 0)
+    hi = np.minimum(centers + w + 1, m + 1)
+
+    rows: List[np.ndarray] = []
+    pointers: List[np.ndarray] = []  # 0 = diagonal (match/substitute), 1 = up (delete a), 2 = left (insert b)
+
+    cols = np.arange(lo[0], hi[0])
+    rows.append(cols * gap_cost)
+    pointers.append(np.full(len(cols), 2, dtype=np.int8))
+
+    for i in range(1, n + 1):
+        prev, prev_lo = rows[-1], lo[i - 1]
+        cols = np.arange(lo[i], hi[i])
+
+        def prev_at(j):
+            idx = j - prev_lo
+            valid = (idx >= 0) & (idx < len(prev))
+            return np.where(valid, prev[np.clip(idx, 0, len(prev) - 1)], np.inf)
+
+        bj = np.maximum(cols - 1, 0)
+        cost = np.where(b[bj] == a[i - 1], 0.0, np.where(b_groups[bj] == a_groups[i - 1], similar_cost, sub_cost))
+        diag = prev_at(cols - 1) + cost
+        diag[cols == 0] = np.inf
+        up = prev_at(cols) + a_delete_cost[i - 1]
+
+        best = np.minimum(diag, up)
+        ptr = np.where(diag <= up, 0, 1).astype(np.int8)
+
+        # D[j] = min_k<=j (best[k] + gap * (j - k))
+        scanned = np.minimum.accumulate(best - gap_cost * cols) + gap_cost * cols
+        # (tolerance: the shift by gap * j is not exact in floating point)
+        left = scanned < best - 1e-9
+        ptr[left] = 2
+        rows.append(np.where(left, scanned, best))
+        pointers.append(ptr)
+
+    # Traceback from (n, m)
+    i, j = n, m
+    while i > 0 or j > 0:
+        move = pointers[i][j - lo[i]] if i > 0 else 2
+        if move == 0:
+            result[j - 1] = i - 1
+            i -= 1
+            j -= 1
+        elif move == 1:
+            i -= 1
+        else:
+            j -= 1
+    return result
+
+class MoraAlignment:
+    """
+    Token <-> AudioQuery mora index, built once per alignment.
+
+    query_token_index[j]: token of AudioQuery mora j (-1 if no token could be assigned).
+    token_ranges[t]: [start, stop) of the AudioQuery moras of token t ([-1, -1] if none).
+    """
+    __slots__ = ("query_token_index", "token_ranges", "matched")
+
+    def __init__(self, query_token_index: np.ndarray, n_tokens: int, matched: int):
+        self.query_token_index = query_token_index
+        self.matched = matched
+
+        self.token_ranges = np.full((n_tokens, 2), -1, dtype=np.intp)
+        assigned = np.flatnonzero(query_token_index >= 0)
+        if len(assigned):
+            tokens = query_token_index[assigned]
+            # query_token_index is monotonic, so the first/last occurrence gives the range
+            first = np.flatnonzero(np.r_[True, tokens[1:] != tokens[:-1]])
+            last = np.r_[first[1:], len(tokens)] - 1
+            self.token_ranges[tokens[first], 0] = assigned[first]
+            self.token_ranges[tokens[first], 1] = assigned[last] + 1
+
+    def moras_of_token(self, t: int) -> Tuple[int, int]:
+        start, stop = self.token_ranges[t]
+        return int(start), int(stop)
+
+def align_token_moras(token_readings: Sequence[str], token_index: np.ndarray,
+                      query_moras: Sequence[str], band: int = 32) -> MoraAlignment:
+    """
+    Align the estimated token mora stream to the AudioQuery mora texts.
+
+    :param token_readings: reading of every token (indexed by token_index).
+    :param token_index: token of each estimated mora (as in MoraEmotions.token_index).
+    :param query_moras: 'text' of every flattened AudioQuery mora.
+
+    AudioQuery moras left unmatched (insertions) take the token of the previous matched mora
+    (or of the next one at the start), so every mora gets a token as long as there is one.
+    """
+    # Estimated mora texts, token by token
+    a_text: List[str] = []
+    a_token: List[int] = []
+    prev = -1
+    for t in token_index.tolist():
+        if t != prev:
+            moras = split_moras(token_readings[t])
+            a_text.extend(moras)
+            a_token.extend([t] * len(moras))
+            prev = t
+
+    a_canonical, a_vowels = mora_features(a_text)
+    b_canonical, b_vowels = mora_features([s.translate(_HIRA_TO_KATA) for s in query_moras])
+
+    # Intern symbols to ints for vectorized comparison
+    symbols: Dict[str, int] = {}
+    a_ids = [symbols.setdefault(s, len(symbols)) for s in a_canonical]
+    b_ids = [symbols.setdefault(s, len(symbols)) for s in b_canonical]
+    a_groups = [symbols.setdefault(v, len(symbols)) for v in a_vowels]
+    b_groups = [symbols.setdefault(v, len(symbols)) for v in b_vowels]
+    a_delete = [NON_KANA_DELETE_COST if v.startswith("?") else 1.0 for v in a_vowels]
+
+    a_of_b = align_sequences(a_ids, b_ids, band=band, a_groups=a_groups, b_groups=b_groups, a_delete_cost=a_delete)
+    a_token_arr = np.asarray(a_token, dtype=np.intp)
+    matched_mask = a_of_b >= 0
+
+    query_token_index = np.full(len(query_moras), -1, dtype=np.intp)
+    query_token_index[matched_mask] = a_token_arr[a_of_b[matched_mask]]
+    matched = int(np.count_nonzero(matched_mask))
+
+    if matched:
+        # Forward fill, then backward fill the leading insertions
+        pos = np.where(matched_mask, np.arange(len(query_moras)), -1)
+        pos = np.maximum.accumulate(pos)
+        first = int(np.argmax(matched_mask))
+        pos[:first] = first
+        query_token_index = query_token_index[pos]
+
+    return MoraAlignment(query_token_index, len(token_readings), matched)
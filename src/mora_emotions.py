@@ -0,0 +1,172 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+PAD_TOKEN = "__PAD__"
+PAD_CONFIDENCE = 1.0
+PAD_ENTROPY = 0.0
+
+class MoraEmotions:
+    """
+    Emotion values per mora, stored as a struct of arrays instead of one dict per mora.
+
+    token_index[i] is the index into `tokens` (token texts) of the token mora i came from.
+    confidence / entropy are float64 arrays.
+    readings (optional) is the kana reading of each token, parallel to `tokens`.
+
+    The container may be longer than its data: moras past the data are padding
+    (PAD_TOKEN, confidence 1.0, entropy 0.0) and are not stored.
+    Slicing and padding return views sharing the same arrays (no copy).
+    """
+    __slots__ = ("token_index", "_confidence", "_entropy", "tokens", "readings", "_length")
+
+    def __init__(self, token_index: np.ndarray, confidence: np.ndarray, entropy: np.ndarray,
+                 tokens: Sequence[str], length: Optional[int] = None, readings: Optional[Sequence[str]] = None):
+        self.token_index = token_index
+        self._confidence = confidence
+        self._entropy = entropy
+        self.tokens = tokens
+        self.readings = readings
+        self._length = len(token_index) if length is None else length
+
+    @classmethod
+    def from_tokens(cls, texts: Sequence[str], confidence: Sequence[float], entropy: Sequence[float],
+                    mora_counts: Sequence[int], readings: Optional[Sequence[str]] = None) -> "MoraEmotions":
+        """
+        Expand per-token values to per-mora values (each token repeated mora_count times).
+        """
+        counts = np.asarray(mora_counts, dtype=np.intp)
+        return cls(
+            np.repeat(np.arange(len(counts), dtype=np.int32), counts),
+            np.repeat(np.asarray(confidence, dtype=np.float64), counts),
+            np.repeat(np.asarray(entropy, dtype=np.float64), counts),
+            list(texts),
+            readings=list(readings) if readings is not None else None
+        )
+
+    @classmethod
+    def empty(cls) -> "MoraEmotions":
+        return cls(np.empty(0, dtype=np.int32), np.empty(0), np.empty(0), [])
+
+    def token_values(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (confidence, entropy) per token (indexed like `tokens`). Tokens without moras get neutral values.
+        """
+        confidence = np.full(len(self.tokens), PAD_CONFIDENCE)
+        entropy = np.full(len(self.tokens), PAD_ENTROPY)
+        n = self.data_length
+        confidence[self.token_index[:n]] = self._confidence[:n]
+        entropy[self.token_index[:n]] = self._entropy[:n]
+        return confidence, entropy
+
+    def realigned(self, token_index: np.ndarray) -> "MoraEmotions":
+        """
+        New container with one mora per entry of token_index (indices into `tokens`),
+        taking each mora's values from its token.
+        """
+        confidence, entropy = self.token_values()
+        return MoraEmotions(
+            token_index.astype(np.int32),
+            confidence[token_index],
+            entropy[token_index],
+            self.tokens,
+            readings=self.readings
+        )
+
+    @property
+    def data_length(self) -> int:
+        """
+        Number of stored (non-padding) moras.
+        """
+        return min(len(self.token_index), self._length)
+
+    def __len__(self) -> int:
+        return self._length
+
+    def padded(self, length: int) -> "MoraEmotions":
+        """
+        View with exactly `length` moras: truncated, or padded at the end.
+        """
+        n = min(len(self.token_index), length)
+        return MoraEmotions(self.token_index[:n], self._confidence[:n], self._entropy[:n], self.tokens,
+                            length, self.readings)
+
+    def _padded_array(self, data: np.ndarray, pad_value: float) -> np.ndarray:
+        n = self.data_length
+        if n == self._length:
+            return data[:n]
+        return np.concatenate([data[:n], np.full(self._length - n, pad_value)])
+
+    @property
+    def confidence(self) -> np.ndarray:
+        """
+        Confidence per mora, including padding.
+        """
+        return self._padded_array(self._confidence, PAD_CONFIDENCE)
+
+    @property
+    def entropy(self) -> np.ndarray:
+        """
+        Entropy per mora, including padding.
+        """
+        return self._padded_array(self._entropy, PAD_ENTROPY)
+
+    def source_token(self, i: int) -> str:
+        if i < 0:
+            i += self._length
+        if not 0 <= i < self._length:
+            raise IndexError("mora index out of range")
+        if i >= self.data_length:
+            return PAD_TOKEN
+        return self.tokens[self.token_index[i]]
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(self._length)
+            if step != 1:
+                raise ValueError("MoraEmotions only supports contiguous slices")
+            stop = max(start, stop)
+            n = self.data_length
+            lo, hi = min(start, n), min(stop, n)
+            return MoraEmotions(self.token_index[lo:hi], self._confidence[lo:hi], self._entropy[lo:hi],
+                                self.tokens, stop - start, self.readings)
+
+        # Single mora as a dict, for inspection / logging
+        i = key + self._length if key < 0 else key
+        token = self.source_token(i)
+        if i >= self.data_length:
+            return {"source_token": token, "confidence": PAD_CONFIDENCE, "entropy": PAD_ENTROPY}
+        return {
+            "source_token": token,
+            "confidence": float(self._confidence[i]),
+            "entropy": float(self._entropy[i])
+        }
+
+    def __iter__(self):
+        for i in range(self._length):
+            yield self[i]
+
+    def token_runs(self) -> List[Dict[str, Any]]:
+        """
+        Consecutive moras coming from the same token (padding is one run):
+        [{"token", "start", "stop"}, ...]
+        """
+        n = self.data_length
+        runs = []
+        if n:
+            idx = self.token_index[:n]
+            bounds = np.flatnonzero(idx[1:] != idx[:-1]) + 1
+            starts = [0] + bounds.tolist()
+            stops = bounds.tolist() + [n]
+            for start, stop in zip(starts, stops):
+                runs.append({"token": self.tokens[idx[start]], "start": start, "stop": stop})
+        if self._length > n:
+            runs.append({"token": PAD_TOKEN, "start": n, "stop": self._length})
+        return runs
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Bytes used by the arrays (the token text table is shared and not counted).
+        """
+        return self.token_index.nbytes + self._confidence.nbytes + self._entropy.nbytes
@@ -0,0 +1,108 @@
+from typing import Any, List
+
+import numpy as np
+
+
+class MoraView:
+    """
+    The moras of an AudioQuery (dict / JSON form or voicevox_core object), flattened once
+    into arrays, so alignment and modulation do not walk accent_phrases / moras themselves.
+
+    Every phrase contributes its moras followed by its pause_mora (if any):
+        pitch, vowel_length, consonant_length  float arrays (NaN where the value is None)
+        pause                                  True for pause moras
+        texts                                  texts of the spoken (non-pause) moras
+    Deltas are applied to the spoken moras as array operations (apply) and written back
+    into the query objects in one pass (write_back).
+    """
+
+    def __init__(self, audio_query: Any):
+        self.audio_query = audio_query
+        self.is_dict = isinstance(audio_query, dict)
+        get = dict.get if self.is_dict else _getattr
+
+        moras: List[Any] = []
+        pauses: List[int] = []
+        texts: List[str] = []
+        for phrase in get(audio_query, "accent_phrases", None) or []:
+            phrase_moras = get(phrase, "moras", None) or []
+            moras.extend(phrase_moras)
+            texts.extend(self._field(phrase_moras, "text"))
+            pause_mora = get(phrase, "pause_mora", None)
+            if pause_mora is not None:
+                pauses.append(len(moras))
+                moras.append(pause_mora)
+
+        self.moras = moras
+        self.pause = np.zeros(len(moras), dtype=bool)
+        self.pause[pauses] = True
+        # One list per field converts fastest; None -> NaN
+        self.pitch = np.array(self._field(moras, "pitch"), dtype=np.float64)
+        self.vowel_length = np.array(self._field(moras, "vowel_length"), dtype=np.float64)
+        self.speech_index = np.flatnonzero(~self.pause)
+        self.texts = [t or "" for t in texts]
+        self._consonant_length = None
+        self._dirty = np.zeros(len(moras), dtype=bool)
+
+    @property
+    def consonant_length(self) -> np.ndarray:
+        # Not needed for modulation, so only read on demand
+        if self._consonant_length is None:
+            self._consonant_length = np.array(self._field(self.moras, "consonant_length"), dtype=np.float64)
+        return self._consonant_length
+
+    def _field(self, moras: List[Any], key: str) -> List[Any]:
+        if self.is_dict:
+            return [m.get(key) for m in moras]
+        return [getattr(m, key, None) for m in moras]
+
+    def __len__(self) -> int:
+        """
+        Number of spoken moras (what mora emotions are aligned to).
+        """
+        return len(self.speech_index)
+
+    def apply(self, pitch_delta, length_delta, min_length: float = 0.01) -> int:
+        """
+        Add per-spoken-mora deltas: pitch += pitch_delta (unvoiced moras, pitch 0,
+        stay unvoiced), vowel_length = max(min_length, vowel_length + length_delta).
+        Extra deltas are ignored; moras without values are skipped.
+        Returns the number of modulated moras.
+        """
+        n = min(len(self.speech_index), len(pitch_delta), len(length_delta))
+        index = self.speech_index[:n]
+        pitch = self.pitch[index]
+        length = self.vowel_length[index]
+        valid = ~(np.isnan(pitch) | np.isnan(length))
+
+        voiced = valid & (pitch != 0.0)
+        self.pitch[index[voiced]] = pitch[voiced] + np.asarray(pitch_delta[:n], dtype=np.float64)[voiced]
+        self.vowel_length[index[valid]] = np.maximum(
+            min_length, length[valid] + np.asarray(length_delta[:n], dtype=np.float64)[valid])
+        self._dirty[index[valid]] = True
+        return n
+
+    def write_back(self):
+        """
+        Store the modified values into the query's mora objects.
+        """
+        changed = np.flatnonzero(self._dirty).tolist()
+        pitches = self.pitch[changed].tolist()
+        lengths = self.vowel_length[changed].tolist()
+        moras = self.moras
+        if self.is_dict:
+            for i, pitch, length in zip(changed, pitches, lengths):
+                mora = moras[i]
+                mora["pitch"] = pitch
+                mora["vowel_length"] = length
+        else:
+            for i, pitch, length in zip(changed, pitches, lengths):
+                mora = moras[i]
+                mora.pitch = pitch
+                mora.vowel_length = length
+        self._dirty[:] = False
+
+
+def _getattr(obj, key, default):
+    return getattr(obj, key, default)
+
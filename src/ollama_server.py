@@ -0,0 +1,168 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlparse
+
+import requests
+
+class OllamaServer:
+    """
+    Starts `ollama serve` when it is not already running and waits until it answers.
+
+    The process is spawned without a shell, listening on the host/port of base_url
+    (OLLAMA_HOST). Readiness is probed on GET /api/version with exponential backoff
+    instead of fixed sleeps, and fails early if the process exits. warm() loads a model
+    with an empty generate so the first real request does not pay for it.
+    Timings are kept in self.metrics (ready_time, warm_time, probes, started).
+
+        server = OllamaServer("http://localhost:11434")
+        server.ensure_running()
+        server.warm("llama3")
+    """
+
+    def __init__(self, base_url: str = "http://localhost:11434",
+                 executable: Union[str, List[str]] = "ollama",
+                 start_timeout: float = 30.0, probe_timeout: float = 1.0, load_timeout: float = 300.0,
+                 initial_delay: float = 0.05, max_delay: float = 1.0,
+                 keep_alive: Optional[Union[str, int]] = "30m", log_path: Optional[str] = None):
+        """
+        :param executable: Ollama binary (looked up in PATH) or a full command prefix,
+            e.g. [sys.executable, "benchmarks/fake_ollama.py"]. "serve" is appended.
+        :param start_timeout: Seconds to wait for a started server to answer.
+        :param probe_timeout: Timeout of one readiness probe.
+        :param load_timeout: Seconds a model load (warm) may take.
+        :param initial_delay: First wait between probes; doubled up to max_delay.
+        :param keep_alive: 'keep_alive' sent when warming a model.
+        :param log_path: File for the server's output (default: discarded).
+        """
+        self.base_url = base_url.rstrip("/")
+        self.executable = executable
+        # Own session without retries: a failed probe must return at once, the backoff is ours
+        self.session = requests.Session()
+        self.start_timeout = start_timeout
+        self.probe_timeout = probe_timeout
+        self.load_timeout = load_timeout
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.keep_alive = keep_alive
+        self.log_path = log_path
+        self.process: Optional[subprocess.Popen] = None
+        self.metrics: Dict[str, Any] = {"started": False, "ready_time": None, "warm_time": None, "probes": 0}
+
+    def is_ready(self) -> bool:
+        self.metrics["probes"] += 1
+        try:
+            return self.session.get(f"{self.base_url}/api/version", timeout=self.probe_timeout).ok
+        except requests.exceptions.RequestException:
+            return False
+
+    def _command(self) -> List[str]:
+        if isinstance(self.executable, (list, tuple)):
+            return list(self.executable) + ["serve"]
+        path = shutil.which(self.executable)
+        if path is None:
+            raise FileNotFoundError(f"Ollama executable '{self.executable}' not found in PATH")
+        return [path, "serve"]
+
+    def _env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        url = urlparse(self.base_url)
+        env["OLLAMA_HOST"] = f"{url.hostname or '127.0.0.1'}:{url.port or 11434}"
+        return env
+
+    def start(self):
+        """
+        Spawn the server (does not wait, see wait_ready).
+        """
+        kwargs = {}
+        if sys.platform == "win32":
+            kwargs["creationflags"] = subprocess.CREATE_NO_WINDOW
+        else:
+            # Own process group: not killed by a Ctrl+C meant for us, like a service
+            kwargs["start_new_session"] = True
+        log = open(self.log_path, "ab") if self.log_path else subprocess.DEVNULL
+        try:
+            self.process = subprocess.Popen(self._command(), env=self._env(), stdin=subprocess.DEVNULL,
+                                            stdout=log, stderr=subprocess.STDOUT, **kwargs)
+        finally:
+            if self.log_path:
+                log.close()
+        self.metrics["started"] = True
+
+    def wait_ready(self, timeout: Optional[float] = None) -> float:
+        """
+        Probe until the server answers. Returns the seconds waited.
+        Raises RuntimeError if the spawned process exits or the timeout expires.
+        """
+        timeout = self.start_timeout if timeout is None else timeout
+        start = time.perf_counter()
+        delay = self.initial_delay
+        while True:
+            if self.is_ready():
+                return time.perf_counter() - start
+            if self.process is not None and self.process.poll() is not None:
+                raise RuntimeError(f"Ollama server exited with code {self.process.returncode}")
+            remaining = timeout - (time.perf_counter() - start)
+            if remaining <= 0:
+                raise RuntimeError(f"Ollama server not ready after {timeout:.1f}s")
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.max_delay)
+
+    def ensure_running(self) -> bool:
+        """
+        Start the server unless it already answers, and wait until it is ready.
+        Returns True if this call started it.
+        """
+        start = time.perf_counter()
+        if self.is_ready():
+            self.metrics["ready_time"] = time.perf_counter() - start
+            return False
+        self.start()
+        self.wait_ready()
+        self.metrics["ready_time"] = time.perf_counter() - start
+        return True
+
+    def warm(self, model: str) -> bool:
+        """
+        Load the model into the server's memory (an empty-prompt generate loads it
+        without generating anything).
+        """
+        payload = {"model": model, "prompt": "", "stream": False}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        start = time.perf_counter()
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json=payload,
+                                         timeout=(self.probe_timeout, self.load_timeout))
+        except requests.exceptions.RequestException as e:
+            print(f"Could not preload {model}: {e}")
+            return False
+        self.metrics["warm_time"] = time.perf_counter() - start
+        return response.ok
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stop the server if this object started it.
+        """
+        if self.process is None or self.process.poll() is not None:
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        self.ensure_running()
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+        self.close()
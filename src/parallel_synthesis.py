@@ -0,0 +1,138 @@
+import copy
+import io
+import wave
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Iterable, List
+
+from modulation import get_attr, set_attr
+from tts_engine import TTSEngine
+from wav_cache import WavCache
+
+def _length_keys(audio_query: Any):
+    """
+    JSON form uses 'prePhonemeLength', the voicevox_core object uses 'pre_phoneme_length'.
+    """
+    if isinstance(audio_query, dict) or not hasattr(audio_query, "pre_phoneme_length"):
+        return "prePhonemeLength", "postPhonemeLength"
+    return "pre_phoneme_length", "post_phoneme_length"
+
+def split_audio_query(audio_query: Any, min_moras: int = 8) -> List[Any]:
+    """
+    Split a (modulated) AudioQuery into sub-queries at accent phrases followed by a pause.
+    Chunks shorter than min_moras are merged with the next one.
+    Only the first chunk keeps the leading silence and only the last one the trailing silence,
+    so the concatenated audio has the same timing as the whole query.
+    """
+    phrases = list(get_attr(audio_query, "accent_phrases", []))
+    groups = []
+    current = []
+    moras = 0
+    for phrase in phrases:
+        current.append(phrase)
+        moras += len(get_attr(phrase, "moras", []))
+        if get_attr(phrase, "pause_mora") is not None and moras >= min_moras:
+            groups.append(current)
+            current = []
+            moras = 0
+    if current:
+        if groups and moras < min_moras:
+            groups[-1].extend(current)
+        else:
+            groups.append(current)
+
+    if len(groups) <= 1:
+        return [audio_query]
+
+    pre_key, post_key = _length_keys(audio_query)
+    chunks = []
+    for i, group in enumerate(groups):
+        chunk = copy.copy(audio_query)
+        set_attr(chunk, "accent_phrases", group)
+        if i > 0:
+            set_attr(chunk, pre_key, 0.0)
+        if i < len(groups) - 1:
+            set_attr(chunk, post_key, 0.0)
+        chunks.append(chunk)
+    return chunks
+
+def stitch_wavs(wavs: Iterable[bytes]) -> bytes:
+    """
+    Concatenate WAV files with identical format into one WAV.
+    """
+    out = io.BytesIO()
+    writer = None
+    for data in wavs:
+        with wave.open(io.BytesIO(data), "rb") as chunk:
+            if writer is None:
+                writer = wave.open(out, "wb")
+                writer.setparams(chunk.getparams())
+            writer.writeframes(chunk.readframes(chunk.getnframes()))
+    if writer is not None:
+        writer.close()
+    return out.getvalue()
+
+# --- Worker process side ---
+
+_worker_engine = None
+
+def _init_worker(core_dir: str, use_gpu: bool, core_factory, speaker_ids: List[int]):
+    global _worker_engine
+    _worker_engine = TTSEngine(core_dir, use_gpu=use_gpu, core_factory=core_factory)
+    for speaker_id in speaker_ids:
+        _worker_engine.load_speaker(speaker_id)
+
+def _synthesize(query: Any, speaker_id: int) -> bytes:
+    return _worker_engine.synthesis(query, speaker_id)
+
+class ParallelSynthesizer:
+    """
+    Synthesizes a long AudioQuery across a pool of worker processes.
+    Each worker owns its own VoicevoxCore (with its own copy of the models,
+    so memory grows with the number of workers) and preloads the given speakers.
+    """
+
+    def __init__(self, workers: int = 2, core_dir: str = "./voicevox_core", use_gpu: bool = False,
+                 core_factory=None, speaker_ids: Iterable[int] = (1,), min_moras: int = 8,
+                 wav_cache: WavCache = None):
+        """
+        :param workers: Number of worker processes.
+        :param core_factory: See TTSEngine. Must be picklable (module level callable) to reach the workers.
+        :param speaker_ids: Speakers loaded in every worker at startup.
+        :param min_moras: Minimum size of a sub-query (see split_audio_query).
+        :param wav_cache: Optional on-disk cache, checked for the whole query before splitting.
+        """
+        self.workers = workers
+        self.min_moras = min_moras
+        self.wav_cache = wav_cache
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(str(core_dir), use_gpu, core_factory, list(speaker_ids))
+        )
+
+    def synthesis(self, audio_query: Any, speaker_id: int) -> bytes:
+        """
+        Same result as TTSEngine.synthesis(): one WAV for the whole query.
+        """
+        key = None
+        if self.wav_cache is not None:
+            key = self.wav_cache.key(audio_query, speaker_id)
+            cached = self.wav_cache.get(key)
+            if cached is not None:
+                return cached
+
+        chunks = split_audio_query(audio_query, self.min_moras)
+        futures = [self._pool.submit(_synthesize, chunk, speaker_id) for chunk in chunks]
+        wav = stitch_wavs(f.result() for f in futures)
+        if key is not None:
+            self.wav_cache.put(key, wav)
+        return wav
+
+    def close(self):
+        self._pool.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
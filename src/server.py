@@ -0,0 +1,334 @@
+import argparse
+import asyncio
+import base64
+import json
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Optional
+
+# Add src to path if running from elsewhere
+sys.path.append(str(Path(__file__).parent))
+
+from aiohttp import web, WSMsgType
+
+from alignment import TokenMoraMapper
+from async_llm_client import AsyncOllamaClient
+from emotion_dynamics import TUNED_PARAMS, EmotionDynamics
+from llm_client import DEFAULT_MODEL
+from streaming import SentenceSegmenter, is_speakable, mora_metadata, speak_segment
+from text_processing import TextProcessor
+from think_filter import ThinkFilter
+from tts_engine import TTSEngine
+from wav_writer import split_wav
+
+
+class ServerBusy(Exception):
+    pass
+
+
+class SpeechServer:
+    """
+    Serves the pipeline to many clients over HTTP and WebSocket.
+
+    One warmed TextProcessor and TTSEngine are shared by all sessions; each session has
+    its own TokenMoraMapper and EmotionDynamics. Sentences are spoken as they are
+    generated (like StreamingPipeline), with mapping / synthesis on a thread pool.
+
+    Concurrency and backpressure:
+        max_sessions      sessions generating / synthesizing at the same time
+        max_queue         sessions waiting for a slot; beyond that requests get 503 / "busy"
+        segment_buffer    sentences a session may have generated ahead of synthesis; when
+                          full, the LLM stream is not read until one is spoken
+    A slow client is not buffered for either: each result is sent (and drained) before
+    the next sentence is synthesized.
+
+    Endpoints:
+        POST /speak   {"prompt", "speaker_id"?, "model"?, "system"?, "options"?, "format"?: "wav" | "pcm"}
+                      -> NDJSON: start, segment (audio base64 encoded), ..., done | error
+        GET  /ws      JSON requests as above, one at a time; per segment a JSON message
+                      followed by a binary message with its audio, then done | error
+        GET  /health  session counters
+
+        python src/server.py --port 8080 --url http://localhost:11434
+    """
+
+    def __init__(self, llm: AsyncOllamaClient, text_processor: TextProcessor, tts: TTSEngine,
+                 model: str = DEFAULT_MODEL, speaker_id: int = 1, max_sessions: int = 4,
+                 max_queue: int = 16, segment_buffer: int = 4, synth_workers: int = 1,
+                 base_speed: float = 1.2, options: Optional[Dict[str, Any]] = None):
+        """
+        :param synth_workers: Threads for mapping / synthesis. TTSEngine serializes the calls
+            into its core, so more workers only overlap the mapping / modulation around them.
+        :param options: Default Ollama options, merged with the request's.
+        """
+        self.llm = llm
+        self.tp = text_processor
+        self.tts = tts
+        self.model = model
+        self.speaker_id = speaker_id
+        self.max_sessions = max_sessions
+        self.max_queue = max_queue
+        self.segment_buffer = segment_buffer
+        self.base_speed = base_speed
+        self.options = options if options is not None else {"num_predict": 5000}
+        self.executor = ThreadPoolExecutor(synth_workers, thread_name_prefix="synth")
+        self.stats = {"active": 0, "waiting": 0, "served": 0, "rejected": 0, "failed": 0}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def warm_up(self):
+        """
+        Reading dictionary, scipy and the VOICEVOX core / default speaker, before the first request.
+        """
+        self.tp.warm_up()
+        EmotionDynamics().warm_up()
+        self.tts.warm_up([self.speaker_id])
+
+    async def _acquire(self):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_sessions)
+        if self._slots.locked() and self.stats["waiting"] >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise ServerBusy(f"{self.stats['active']} sessions active, {self.stats['waiting']} waiting")
+        self.stats["waiting"] += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.stats["waiting"] -= 1
+        self.stats["active"] += 1
+
+    def _release(self):
+        self.stats["active"] -= 1
+        self._slots.release()
+
+    async def _produce(self, segments: asyncio.Queue, model: str, prompt: str, system: str,
+                       options: Dict[str, Any], metrics: Dict[str, Any]):
+        segmenter = SentenceSegmenter()
+        think_filter = ThinkFilter()
+        stream = self.llm.generate_stream(model, prompt, system, options)
+        try:
+            async for chunk in stream:
+                if "error" in chunk:
+                    await segments.put(chunk)
+                    return
+                if chunk.get("token"):
+                    metrics["tokens"] += 1
+                for visible in think_filter.feed(chunk):
+                    for seg in segmenter.feed(visible):
+                        await segments.put(seg)  # waits while segment_buffer sentences are pending
+                if chunk.get("done", False):
+                    break
+            for visible in think_filter.flush():
+                for seg in segmenter.feed(visible):
+                    await segments.put(seg)
+            for seg in segmenter.flush():
+                await segments.put(seg)
+        except Exception as e:
+            await segments.put({"error": str(e)})
+        finally:
+            await stream.aclose()
+        await segments.put(None)  # not reached when cancelled (the session is gone)
+
+    async def speak(self, prompt: str, speaker_id: Optional[int] = None, model: Optional[str] = None,
+                    system: str = "", options: Optional[Dict[str, Any]] = None,
+                    audio_format: str = "wav") -> AsyncIterator[Dict[str, Any]]:
+        """
+        One session. Yields {"type": "segment", "index", "text", "moras", "audio"} per spoken
+        sentence, then {"type": "done", "metrics"} or {"type": "error", "error"}.
+        A sentence that fails to synthesize fails the session if it is the first one;
+        later ones are skipped (metrics["skipped"]). A session without audio fails.
+        Raises ServerBusy if the queue is full, ValueError / TypeError for invalid arguments.
+        """
+        if audio_format not in ("wav", "pcm"):
+            raise ValueError(f"Unknown audio format '{audio_format}'")
+        speaker_id = self.speaker_id if speaker_id is None else int(speaker_id)
+        options = {**self.options, **(options or {})}  # before a slot is taken
+        start = time.perf_counter()
+        await self._acquire()
+        metrics = {"tokens": 0, "segments": 0, "skipped": 0, "queue_wait": time.perf_counter() - start,
+                   "time_to_first_audio": None, "total_time": None}
+        producer = None
+        failed = False
+        try:
+            mapper = TokenMoraMapper(self.tp)
+            dynamics = EmotionDynamics(**TUNED_PARAMS)
+            segments = asyncio.Queue(maxsize=self.segment_buffer)
+            producer = asyncio.create_task(self._produce(
+                segments, model or self.model, prompt, system, options, metrics))
+            loop = asyncio.get_running_loop()
+            index = 0
+            while True:
+                seg = await segments.get()
+                if seg is None:
+                    break
+                if isinstance(seg, dict):
+                    failed = True
+                    yield {"type": "error", "error": seg["error"]}
+                    return
+
+                text = "".join(t.get("token", "") for t in seg)
+                if not is_speakable(text):
+                    continue
+                try:
+                    wav, view, emotions = await loop.run_in_executor(
+                        self.executor, speak_segment, seg, mapper, dynamics, self.tts, speaker_id, self.base_speed)
+                except Exception as e:
+                    if index == 0:
+                        failed = True
+                        yield {"type": "error", "error": f"synthesis failed: {e}"}
+                        return
+                    print(f"[Server] Warning: skipped segment '{text.strip()[:20]}': {e}")
+                    metrics["skipped"] += 1
+                    continue
+
+                result = {"type": "segment", "index": index, "text": text,
+                          "moras": mora_metadata(view, emotions)}
+                if audio_format == "pcm":
+                    (channels, sample_width, rate), pcm = split_wav(wav)
+                    result.update(audio=bytes(pcm), channels=channels, sample_width=sample_width, sample_rate=rate)
+                else:
+                    result["audio"] = bytes(wav)
+                if metrics["time_to_first_audio"] is None:
+                    metrics["time_to_first_audio"] = time.perf_counter() - start
+                metrics["segments"] += 1
+                index += 1
+                yield result  # the caller sends it before the next sentence is synthesized
+
+            if index == 0:
+                failed = True
+                yield {"type": "error", "error": "nothing to speak in the answer"}
+                return
+            metrics["total_time"] = time.perf_counter() - start
+            yield {"type": "done", "metrics": metrics}
+        finally:
+            if producer is not None:
+                producer.cancel()
+                try:
+                    await producer
+                except asyncio.CancelledError:
+                    pass
+            self.stats["failed" if failed else "served"] += 1
+            self._release()
+
+    @staticmethod
+    def _request_args(request: Dict[str, Any]) -> Dict[str, Any]:
+        if not isinstance(request, dict) or not isinstance(request.get("prompt"), str):
+            raise ValueError("'prompt' (string) is required")
+        speaker_id = request.get("speaker_id")
+        if speaker_id is not None and (not isinstance(speaker_id, int) or isinstance(speaker_id, bool)):
+            raise ValueError("'speaker_id' must be an integer")
+        if request.get("options") is not None and not isinstance(request["options"], dict):
+            raise ValueError("'options' must be an object")
+        return {
+            "prompt": request["prompt"],
+            "speaker_id": request.get("speaker_id"),
+            "model": request.get("model"),
+            "system": request.get("system", ""),
+            "options": request.get("options"),
+            "audio_format": request.get("format", "wav"),
+        }
+
+    async def handle_speak(self, request: web.Request) -> web.StreamResponse:
+        try:
+            args = self._request_args(await request.json())
+            session = self.speak(**args)
+            first = await session.__anext__()
+        except ServerBusy as e:
+            return web.json_response({"error": "busy", "detail": str(e)}, status=503, headers={"Retry-After": "1"})
+        except (ValueError, TypeError) as e:
+            return web.json_response({"error": str(e)}, status=400)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        try:
+            await response.write(self._ndjson({"type": "start", "session": uuid.uuid4().hex[:12]}))
+            result = first
+            while True:
+                await response.write(self._ndjson(result))  # waits for the client to drain
+                try:
+                    result = await session.__anext__()
+                except StopAsyncIteration:
+                    break
+        finally:
+            await session.aclose()
+        await response.write_eof()
+        return response
+
+    @staticmethod
+    def _ndjson(result: Dict[str, Any]) -> bytes:
+        if "audio" in result:
+            result = dict(result, audio=base64.b64encode(result["audio"]).decode("ascii"))
+        return (json.dumps(result, ensure_ascii=False) + "\n").encode("utf-8")
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                session = self.speak(**self._request_args(json.loads(msg.data)))
+                async for result in session:
+                    audio = result.pop("audio", None)
+                    if audio is not None:
+                        result["audio_bytes"] = len(audio)
+                    await ws.send_json(result)
+                    if audio is not None:
+                        await ws.send_bytes(audio)
+            except ServerBusy as e:
+                await ws.send_json({"type": "error", "error": "busy", "detail": str(e)})
+            except (ValueError, TypeError) as e:
+                await ws.send_json({"type": "error", "error": str(e)})
+        return ws
+
+    async def handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "max_sessions": self.max_sessions, "max_queue": self.max_queue})
+
+    async def _on_startup(self, app: web.Application):
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.warm_up)
+
+    async def _on_cleanup(self, app: web.Application):
+        await self.llm.close()
+        self.executor.shutdown(wait=False)
+
+    def app(self, warm_up: bool = True) -> web.Application:
+        app = web.Application()
+        app.add_routes([
+            web.post("/speak", self.handle_speak),
+            web.get("/ws", self.handle_ws),
+            web.get("/health", self.handle_health),
+        ])
+        if warm_up:
+            app.on_startup.append(self._on_startup)
+        app.on_cleanup.append(self._on_cleanup)
+        return app
+
+
+def main(argv=None, core_factory=None):
+    parser = argparse.ArgumentParser(description="LLM Emotional Talk server (HTTP / WebSocket)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--url", default="http://localhost:11434", help="Ollama server URL")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--speaker", type=int, default=1, help="Default speaker ID")
+    parser.add_argument("--max-sessions", type=int, default=4, help="Sessions served at the same time")
+    parser.add_argument("--max-queue", type=int, default=16, help="Sessions waiting before requests are rejected")
+    parser.add_argument("--synth-workers", type=int, default=1, help="Synthesis threads")
+    args = parser.parse_args(argv)
+
+    llm = AsyncOllamaClient(args.url, max_concurrency=args.max_sessions)
+    tp = TextProcessor(cache_path="reading_cache.json", kana_index_path="kana_index.bin")
+    tts = TTSEngine(core_factory=core_factory)
+    server = SpeechServer(llm, tp, tts, model=args.model, speaker_id=args.speaker,
+                          max_sessions=args.max_sessions, max_queue=args.max_queue,
+                          synth_workers=args.synth_workers)
+    try:
+        web.run_app(server.app(), host=args.host, port=args.port)
+    finally:
+        tp.save_cache()
+
+
+if __name__ == "__main__":
+    main()
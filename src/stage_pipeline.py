@@ -0,0 +1,329 @@
+import functools
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+BACKENDS = ("inline", "thread", "process")
+
+_END = object()
+
+
+class _Stopped(Exception):
+    pass
+
+
+def _call(fn: Callable, expand: bool, item: Any):
+    """
+    Runs fn in a pool worker. Returns (seconds, outputs); module level so that process
+    pools can pickle it (with fn, which must be picklable too).
+    """
+    start = time.perf_counter()
+    result = fn(item)
+    outputs = list(result) if expand else ([] if result is None else [result])
+    return time.perf_counter() - start, outputs
+
+
+class Stage:
+    """
+    One step of a StagePipeline.
+
+    fn(item) returns the item for the next stage, or None to drop it. With expand=True it
+    returns an iterable of any number of items instead (e.g. chunks -> sentences), and
+    flush() (if given) returns the items still buffered when the input ends.
+
+    Backends:
+        inline   runs on the thread of the stage before it, no queue in between
+        thread   own thread; with workers > 1 a thread pool (I/O bound work, e.g. HTTP)
+        process  process pool of `workers` (CPU bound work, e.g. synthesis). fn and the
+                 items must be picklable; initializer(*initargs) sets up each worker
+    Results leave a stage in input order whatever the backend, so stateful stages (e.g.
+    EmotionDynamics carried across sentences) only need workers=1.
+
+    queue_size bounds the queue in front of the stage (0 = unbounded): when it is full,
+    the stage before it waits (backpressure).
+    """
+
+    def __init__(self, name: str, fn: Callable[[Any], Any], backend: str = "inline", workers: int = 1,
+                 queue_size: int = 2, expand: bool = False, flush: Optional[Callable[[], Iterable[Any]]] = None,
+                 initializer: Optional[Callable] = None, initargs: tuple = ()):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown backend '{backend}' (one of {', '.join(BACKENDS)})")
+        if backend == "process" and flush is not None:
+            raise ValueError("flush() is not supported on the process backend")
+        if initializer is not None and backend != "process":
+            raise ValueError("initializer is only used by the process backend")
+        self.name = name
+        self.fn = fn
+        self.backend = backend
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.expand = expand
+        self.flush = flush
+        self.initializer = initializer
+        self.initargs = initargs
+
+    def __repr__(self):
+        return f"Stage({self.name!r}, backend={self.backend!r}, workers={self.workers})"
+
+
+class StagePipeline:
+    """
+    Runs a source iterable through stages connected by bounded queues, each stage on its
+    own backend (see Stage). The caller consumes the results:
+
+        pipeline = StagePipeline(llm.generate_stream(model, prompt), [
+            Stage("segment", segmenter.feed, expand=True, flush=segmenter.flush),
+            Stage("speak", speak, backend="thread", queue_size=0),
+        ])
+        for wav in pipeline.run():
+            ...
+        print(pipeline.report())
+
+    The source is iterated on a thread of its own, together with the inline stages that
+    follow it; every thread / process stage starts a new thread with the inline stages
+    after it. An exception in any stage (or the source) stops the pipeline and is
+    re-raised by run(); closing run() early stops it too.
+
+    Per stage metrics (self.metrics[name], "source" for the source):
+        items         items that went in
+        busy          seconds spent in fn / flush (summed over workers)
+        wait_input    seconds the stage's thread waited for input (starved)
+        wait_output   seconds it was blocked on the full queue of the next stage (stalled)
+        max_queue_depth / mean_queue_depth   of the queue in front of the stage
+    """
+
+    def __init__(self, source: Iterable[Any], stages: List[Stage], queue_size: int = 2):
+        """
+        :param queue_size: Bound of the queue between the last stage and the caller.
+        """
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names) or "source" in names:
+            raise ValueError("Stage names must be unique (and not 'source')")
+        self.source = source
+        self.stages = stages
+        self.queue_size = queue_size
+        self.metrics: Dict[str, Dict[str, Any]] = {}
+        self._stop = threading.Event()
+        self._error: Optional[BaseException] = None
+        self._lock = threading.Lock()
+
+    def _groups(self) -> List[List[Stage]]:
+        groups = [[]]
+        for stage in self.stages:
+            if stage.backend != "inline":
+                groups.append([])
+            groups[-1].append(stage)
+        return groups
+
+    def _reset_metrics(self):
+        self.metrics = {}
+        for name, backend, workers in [("source", "thread", 1)] + [(s.name, s.backend, s.workers) for s in self.stages]:
+            self.metrics[name] = {"backend": backend, "workers": workers, "items": 0, "busy": 0.0,
+                                  "wait_input": 0.0, "wait_output": 0.0, "max_queue_depth": 0,
+                                  "mean_queue_depth": 0.0}
+        self._depth_sums = {name: 0 for name in self.metrics}
+
+    # --- Queues ---
+
+    def _put(self, q: queue.Queue, item: Any, metrics: Dict[str, Any]):
+        start = time.perf_counter()
+        try:
+            while True:
+                try:
+                    q.put(item, timeout=0.05)
+                    break
+                except queue.Full:
+                    if self._stop.is_set():
+                        raise _Stopped()
+        finally:
+            metrics["wait_output"] += time.perf_counter() - start
+
+    def _get(self, q: queue.Queue, name: Optional[str]) -> Any:
+        if name is not None:
+            metrics = self.metrics[name]
+            depth = q.qsize()
+            metrics["max_queue_depth"] = max(metrics["max_queue_depth"], depth)
+            self._depth_sums[name] += depth
+        start = time.perf_counter()
+        while True:
+            try:
+                item = q.get(timeout=0.05)
+                break
+            except queue.Empty:
+                if self._stop.is_set():
+                    raise _Stopped()
+        if name is not None:
+            self.metrics[name]["wait_input"] += time.perf_counter() - start
+        return item
+
+    # --- Stage execution ---
+
+    def _apply(self, stages: List[Stage], item: Any) -> Iterator[Any]:
+        """
+        Runs item through consecutive inline stages.
+        """
+        if not stages:
+            yield item
+            return
+        stage, rest = stages[0], stages[1:]
+        metrics = self.metrics[stage.name]
+        metrics["items"] += 1
+        start = time.perf_counter()
+        result = stage.fn(item)
+        outputs = list(result) if stage.expand else ([] if result is None else [result])
+        metrics["busy"] += time.perf_counter() - start
+        for output in outputs:
+            yield from self._apply(rest, output)
+
+    def _flush(self, stages: List[Stage]) -> Iterator[Any]:
+        """
+        Items buffered in the given stages (in order), through the stages after them.
+        """
+        for i, stage in enumerate(stages):
+            if stage.flush is None:
+                continue
+            start = time.perf_counter()
+            outputs = list(stage.flush())
+            self.metrics[stage.name]["busy"] += time.perf_counter() - start
+            for output in outputs:
+                yield from self._apply(stages[i + 1:], output)
+
+    def _run_source(self, group: List[Stage], out: queue.Queue):
+        metrics = self.metrics["source"]
+        last = self.metrics[group[-1].name] if group else metrics
+        iterator = iter(self.source)
+        try:
+            while not self._stop.is_set():
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    metrics["busy"] += time.perf_counter() - start
+                metrics["items"] += 1
+                for output in self._apply(group, item):
+                    self._put(out, output, last)
+            for output in self._flush(group):
+                self._put(out, output, last)
+            self._put(out, _END, last)
+        finally:
+            close = getattr(iterator, "close", None)
+            if close is not None:
+                close()
+
+    def _run_group(self, group: List[Stage], inbox: queue.Queue, out: queue.Queue):
+        head, rest = group[0], group[1:]
+        metrics = self.metrics[head.name]
+        last = self.metrics[group[-1].name]
+
+        def emit(outputs):
+            for output in outputs:
+                for item in self._apply(rest, output):
+                    self._put(out, item, last)
+
+        if head.workers == 1 and head.backend == "thread":
+            while True:
+                item = self._get(inbox, head.name)
+                if item is _END:
+                    break
+                metrics["items"] += 1
+                seconds, outputs = _call(head.fn, head.expand, item)
+                metrics["busy"] += seconds
+                emit(outputs)
+        else:
+            if head.backend == "process":
+                pool = ProcessPoolExecutor(head.workers, initializer=head.initializer, initargs=head.initargs)
+            else:
+                pool = ThreadPoolExecutor(head.workers, thread_name_prefix=head.name)
+            call = functools.partial(_call, head.fn, head.expand)
+            pending = deque()
+            try:
+                while True:
+                    item = self._get(inbox, head.name)
+                    if item is _END:
+                        break
+                    metrics["items"] += 1
+                    pending.append(pool.submit(call, item))
+                    if len(pending) >= head.workers:  # keep every worker busy, emit in order
+                        seconds, outputs = pending.popleft().result()
+                        metrics["busy"] += seconds
+                        emit(outputs)
+                while pending:
+                    seconds, outputs = pending.popleft().result()
+                    metrics["busy"] += seconds
+                    emit(outputs)
+            finally:
+                for future in pending:
+                    future.cancel()
+                pool.shutdown(wait=False)
+
+        if head.flush is not None:
+            start = time.perf_counter()
+            outputs = list(head.flush())
+            metrics["busy"] += time.perf_counter() - start
+            emit(outputs)
+        for item in self._flush(rest):
+            self._put(out, item, last)
+        self._put(out, _END, last)
+
+    def _guard(self, target: Callable, *args):
+        try:
+            target(*args)
+        except _Stopped:
+            pass
+        except BaseException as e:
+            with self._lock:
+                if self._error is None:
+                    self._error = e
+            self._stop.set()
+
+    def run(self) -> Iterator[Any]:
+        """
+        Generator of the results of the last stage, in source order.
+        """
+        self._reset_metrics()
+        self._stop.clear()
+        self._error = None
+        groups = self._groups()
+        queues = [queue.Queue(maxsize=group[0].queue_size) for group in groups[1:]]
+        queues.append(queue.Queue(maxsize=self.queue_size))
+
+        threads = [threading.Thread(target=self._guard, args=(self._run_source, groups[0], queues[0]),
+                                    name="source", daemon=True)]
+        for group, inbox, out in zip(groups[1:], queues, queues[1:]):
+            threads.append(threading.Thread(target=self._guard, args=(self._run_group, group, inbox, out),
+                                            name=group[0].name, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            while True:
+                try:
+                    item = self._get(queues[-1], None)
+                except _Stopped:
+                    break
+                if item is _END:
+                    break
+                yield item
+        finally:
+            # Threads blocked on a queue notice within 50ms; a source blocked on I/O
+            # (e.g. a silent LLM stream) is not waited for
+            self._stop.set()
+            for name, total in self._depth_sums.items():
+                items = self.metrics[name]["items"]
+                self.metrics[name]["mean_queue_depth"] = total / items if items else 0.0
+        if self._error is not None:
+            raise self._error
+
+    def report(self) -> str:
+        lines = [f"{'Stage':<12} {'Backend':<10} {'Items':>6} {'Busy':>8} {'Starved':>8} {'Stalled':>8} {'Queue max/mean':>15}"]
+        for name, m in self.metrics.items():
+            backend = m["backend"] if m["workers"] == 1 else f"{m['backend']}x{m['workers']}"
+            depth = f"{m['max_queue_depth']}/{m['mean_queue_depth']:.1f}"
+            lines.append(f"{name:<12} {backend:<10} {m['items']:>6} {m['busy']:>7.2f}s {m['wait_input']:>7.2f}s "
+                         f"{m['wait_output']:>7.2f}s {depth:>15}")
+        return "\n".join(lines)
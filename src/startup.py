@@ -0,0 +1,87 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+class Startup:
+    """
+    Timed startup steps. Steps started with background=True run on daemon threads,
+    so loading the reading dictionary, the VOICEVOX core / speaker and the Ollama model
+    overlap with each other and with LLM generation instead of all preceding it.
+
+        startup = Startup()
+        startup.run("tts", tts.warm_up, [speaker_id], background=True)
+        ...
+        startup.wait("tts")  # re-raises the step's exception, if any
+        print(startup.report())
+    """
+
+    def __init__(self):
+        self.t0 = time.perf_counter()
+        # name -> {"start": offset from t0, "duration": seconds or None while running, "background", "error"}
+        self.steps: Dict[str, Dict[str, Any]] = {}
+        self._threads: Dict[str, threading.Thread] = {}
+        self._errors: Dict[str, BaseException] = {}
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration: float):
+        """
+        Adds a step measured elsewhere (e.g. module imports).
+        """
+        with self._lock:
+            self.steps[name] = {"start": 0.0, "duration": duration, "background": False, "error": None}
+
+    def _run(self, name: str, fn: Callable, args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        except BaseException as e:
+            with self._lock:
+                self._errors[name] = e
+                self.steps[name]["error"] = str(e)
+            raise
+        finally:
+            with self._lock:
+                self.steps[name]["duration"] = time.perf_counter() - start
+
+    def run(self, name: str, fn: Callable, *args, background: bool = False):
+        """
+        Runs fn(*args) as step `name`. In the foreground the result is returned
+        (and exceptions raised); in the background use wait().
+        """
+        with self._lock:
+            self.steps[name] = {"start": time.perf_counter() - self.t0, "duration": None,
+                                "background": background, "error": None}
+        if not background:
+            return self._run(name, fn, args)
+
+        def target():
+            try:
+                self._run(name, fn, args)
+            except BaseException:
+                pass  # kept for wait()
+        thread = threading.Thread(target=target, name=f"startup-{name}", daemon=True)
+        self._threads[name] = thread
+        thread.start()
+
+    def wait(self, name: str, timeout: Optional[float] = None):
+        thread = self._threads.get(name)
+        if thread is not None:
+            thread.join(timeout)
+        error = self._errors.get(name)
+        if error is not None:
+            raise error
+
+    def report(self) -> str:
+        """
+        One line per step: when it started (relative to Startup()), how long it took,
+        and whether it ran in the background (or is still running).
+        """
+        with self._lock:
+            steps = {name: dict(step) for name, step in self.steps.items()}
+        lines = []
+        for name, step in steps.items():
+            duration = "running" if step["duration"] is None else f"{step['duration']:.2f}s"
+            where = " (background)" if step["background"] else ""
+            error = f" FAILED: {step['error']}" if step["error"] else ""
+            lines.append(f"{name:<14} +{step['start']:.2f}s  {duration}{where}{error}")
+        return "\n".join(lines)
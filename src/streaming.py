@@ -0,0 +1,323 @@
+import math
+import re
+import time
+from typing import Any, Dict, Generator, List
+
+from alignment import TokenMoraMapper
+from emotion_dynamics import EmotionDynamics
+from modulation import apply_emotion_modulation, set_base_speed
+from mora_emotions import MoraEmotions
+from mora_view import MoraView
+from stage_pipeline import Stage, StagePipeline
+from think_filter import ThinkFilter
+from tracing import NULL_TRACE
+
+# Sentence terminators.
+# Japanese ones always end a sentence, ASCII ones only when followed by whitespace
+# (so that "3.14" or "e.g." inside a word does not split).
+STRONG_TERMINATORS = set("。！？．…\n")
+ASCII_TERMINATORS = set(".!?")
+# Closing brackets/quotes that belong to the sentence they close: 「そうだ。」
+CLOSERS = set("」』）)］]】〉》\"'”’")
+
+# Segments without any word character (e.g. "---", "##") are not spoken.
+_SPEAKABLE = re.compile(r"\w")
+
+
+def is_speakable(text: str) -> bool:
+    return _SPEAKABLE.search(text) is not None
+
+
+class SentenceSegmenter:
+    """
+    Cuts a stream of normalized LLM chunks into sentence segments.
+    A segment is a list of chunks. If a sentence ends in the middle of a token,
+    the token is split and both halves keep the token's emotion values.
+    """
+
+    def __init__(self, max_tokens: int = None):
+        """
+        :param max_tokens: Cut sentences longer than this at a token boundary
+            (bounds the memory held for text without terminators).
+        """
+        self.max_tokens = max_tokens
+        self._tokens: List[Dict[str, Any]] = []
+        # Boundary seen at the very end of the previous token: None / "strong" / "ascii"
+        self._pending = None
+
+    def _append(self, chunk: Dict[str, Any], text: str):
+        if text:
+            if text == chunk.get("token", ""):
+                self._tokens.append(chunk)
+            else:
+                self._tokens.append(dict(chunk, token=text))
+
+    def _emit(self, segments: List[List[Dict[str, Any]]]):
+        if self._tokens:
+            segments.append(self._tokens)
+        self._tokens = []
+
+    def feed(self, chunk: Dict[str, Any]) -> List[List[Dict[str, Any]]]:
+        """
+        Feed one chunk. Returns the segments completed by this chunk (maybe empty).
+        """
+        text = chunk.get("token", "")
+        segments = []
+        start = 0
+        i = 0
+
+        if self._pending:
+            # Trailing closers still belong to the previous sentence
+            while i < len(text) and text[i] in CLOSERS:
+                i += 1
+            if i == len(text):
+                self._append(chunk, text)
+                return segments
+            if self._pending == "strong" or text[i].isspace():
+                self._append(chunk, text[:i])
+                self._emit(segments)
+                start = i
+            self._pending = None
+
+        while i < len(text):
+            c = text[i]
+            if c not in STRONG_TERMINATORS and c not in ASCII_TERMINATORS:
+                i += 1
+                continue
+
+            # Consume runs like "!?", "...", "。」"
+            kind = "ascii"
+            j = i
+            while j < len(text) and (text[j] in STRONG_TERMINATORS or text[j] in ASCII_TERMINATORS or text[j] in CLOSERS):
+                if text[j] in STRONG_TERMINATORS:
+                    kind = "strong"
+                j += 1
+
+            if j == len(text):
+                # Decide when the next token arrives
+                self._pending = kind
+                break
+
+            if kind == "strong" or text[j].isspace():
+                self._append(chunk, text[start:j])
+                self._emit(segments)
+                start = j
+            i = j
+
+        self._append(chunk, text[start:])
+        if self.max_tokens and len(self._tokens) >= self.max_tokens and not self._pending:
+            self._emit(segments)
+        return segments
+
+    def flush(self) -> List[List[Dict[str, Any]]]:
+        """
+        Returns the remaining (unterminated) segment, if any.
+        """
+        segments = []
+        self._emit(segments)
+        self._pending = None
+        return segments
+
+
+def prepare_segment(tokens: List[Dict[str, Any]], mapper: TokenMoraMapper, dynamics: EmotionDynamics, tts,
+                    speaker_id: int, base_speed: float = 1.2, trace=NULL_TRACE):
+    """
+    Map, query, align and modulate one segment of tokens (everything but synthesis).
+    dynamics state carries over from the previous segment.
+    Returns (modulated AudioQuery, its MoraView, MoraEmotions aligned to its moras).
+    """
+    text = "".join(t.get("token", "") for t in tokens)
+    with trace.span("mapping", tokens=len(tokens)) as span:
+        aligned_values = mapper.map_tokens_to_moras(tokens)
+        span.count(moras=len(aligned_values))
+    with trace.span("audio_query"):
+        audio_query = tts.generate_audio_query(text, speaker_id)
+    set_base_speed(audio_query, base_speed)
+    with trace.span("alignment"):
+        view = MoraView(audio_query)
+        mora_emotions = mapper.get_aligned_emotions(audio_query, aligned_values, view)
+    with trace.span("modulation") as span:
+        span.count(moras=apply_emotion_modulation(audio_query, mora_emotions, dynamics, verbose=False, view=view))
+    return audio_query, view, mora_emotions
+
+
+def speak_segment(tokens: List[Dict[str, Any]], mapper: TokenMoraMapper, dynamics: EmotionDynamics, tts,
+                  speaker_id: int, base_speed: float = 1.2, trace=NULL_TRACE):
+    """
+    prepare_segment() and synthesis.
+    Returns (wav, MoraView of the modulated AudioQuery, MoraEmotions aligned to its moras).
+    """
+    audio_query, view, mora_emotions = prepare_segment(tokens, mapper, dynamics, tts, speaker_id, base_speed, trace)
+    with trace.span("synthesis") as span:
+        wav = tts.synthesis(audio_query, speaker_id)
+        span.count(bytes=len(wav))
+    return wav, view, mora_emotions
+
+
+def mora_metadata(view: MoraView, emotions: MoraEmotions) -> List[Dict[str, Any]]:
+    """
+    Per spoken mora: text, source token, emotion values and the modulated prosody
+    (JSON serializable; None where a value is missing).
+    """
+    n = len(view)
+    index = view.speech_index
+    pitch = view.pitch[index].tolist()
+    length = view.vowel_length[index].tolist()
+    confidence = emotions.confidence[:n].tolist()
+    entropy = emotions.entropy[:n].tolist()
+    return [{
+        "text": view.texts[i],
+        "token": emotions.source_token(i) if i < len(emotions) else None,
+        "confidence": confidence[i] if i < len(confidence) else None,
+        "entropy": entropy[i] if i < len(entropy) else None,
+        "pitch": None if math.isnan(pitch[i]) else pitch[i],
+        "vowel_length": None if math.isnan(length[i]) else length[i],
+    } for i in range(n)]
+
+
+class StreamingPipeline:
+    """
+    Speaks sentence N while the LLM is still generating sentence N+1.
+
+    A two stage StagePipeline: the source thread reads OllamaClient.generate_stream(),
+    drops <think> reasoning (ThinkFilter) and cuts the token stream into sentences; the
+    "speak" stage maps, modulates and synthesizes each finished sentence in order while
+    generation continues. EmotionDynamics state is carried across
+    sentences so the emotional flow does not restart at every boundary.
+    Step timings go to `trace` (see tracing.Tracer), one set of spans per sentence;
+    queue depths and stalls of the stages to metrics["stages"].
+    """
+
+    def __init__(self, llm, mapper: TokenMoraMapper, dynamics: EmotionDynamics, tts,
+                 speaker_id: int = 1, base_speed: float = 1.2, verbose: bool = True, trace=NULL_TRACE):
+        self.llm = llm
+        self.mapper = mapper
+        self.dynamics = dynamics
+        self.tts = tts
+        self.speaker_id = speaker_id
+        self.base_speed = base_speed
+        self.verbose = verbose
+        self.trace = trace
+        self.metrics: Dict[str, Any] = {}
+
+    def _segments(self, start: float, model: str, prompt: str, system: str, options: Dict[str, Any],
+                  max_tokens: int = None) -> Generator[Any, None, None]:
+        """
+        Sentence segments of the answer as the LLM generates it (or an error dict, last).
+        """
+        segmenter = SentenceSegmenter(max_tokens)
+        # Reasoning never reaches the segmenter; the first sentence of the answer
+        # is cut (and spoken) as soon as it is complete
+        think_filter = ThinkFilter(on_visible=lambda chunk: self._visible(start))
+        try:
+            for chunk in self.llm.generate_stream(model, prompt, system, options):
+                if "error" in chunk:
+                    yield chunk
+                    return
+                if chunk.get("token"):
+                    if self.metrics["tokens"] == 0:
+                        self.metrics["time_to_first_token"] = time.perf_counter() - start
+                        self.trace.record("llm_first_token", self.metrics["time_to_first_token"])
+                    self.metrics["tokens"] += 1
+                for visible in think_filter.feed(chunk):
+                    yield from segmenter.feed(visible)
+                if chunk.get("done", False):
+                    break
+            for visible in think_filter.flush():
+                yield from segmenter.feed(visible)
+            yield from segmenter.flush()
+        finally:
+            self.metrics["think_tokens"] = think_filter.think_tokens
+            self.metrics["generation_time"] = time.perf_counter() - start
+            self.trace.record("llm", self.metrics["generation_time"], tokens=self.metrics["tokens"])
+
+    def _reset_metrics(self):
+        self.metrics = {
+            "tokens": 0,
+            "segments": 0,
+            "time_to_first_token": None,
+            "time_to_first_visible": None,
+            "think_tokens": 0,
+            "time_to_first_audio": None,
+            "generation_time": None,
+            "total_time": None,
+            "stages": {},
+        }
+
+    def _source(self, start: float, model: str, prompt: str, system: str, options: Dict[str, Any]):
+        try:
+            yield from self._segments(start, model, prompt, system, options)
+        except Exception as e:
+            yield {"error": str(e)}
+
+    def _visible(self, start: float):
+        self.metrics["time_to_first_visible"] = time.perf_counter() - start
+        self.trace.record("llm_first_visible", self.metrics["time_to_first_visible"])
+        if self.verbose:
+            print(f"[Stream] Answer started after {self.metrics['time_to_first_visible']:.2f}s")
+
+    def _speak(self, tokens: List[Dict[str, Any]]):
+        wav, view, _ = speak_segment(tokens, self.mapper, self.dynamics, self.tts, self.speaker_id,
+                                     self.base_speed, self.trace)
+        return wav, len(view)
+
+    def _speak_item(self, seg):
+        """
+        The "speak" stage: (segment, text, wav, mora count), or None if nothing was spoken.
+        """
+        if isinstance(seg, dict):
+            return seg  # LLM error, for the caller
+        text = "".join(t.get("token", "") for t in seg)
+        if not is_speakable(text):
+            return None
+        try:
+            wav, mora_count = self._speak(seg)
+        except Exception as e:
+            print(f"[Stream] Warning: skipped segment '{text.strip()[:20]}': {e}")
+            return None
+        return seg, text, wav, mora_count
+
+    def run(self, model: str, prompt: str, system: str = "",
+            options: Dict[str, Any] = None) -> Generator[Dict[str, Any], None, None]:
+        """
+        Generator that yields one result per spoken sentence, in order:
+        {"index", "text", "wav", "mora_count", "elapsed"}
+        On LLM failure yields {"error": ...} and stops.
+        Metrics (time_to_first_token / time_to_first_audio / ...) are in self.metrics.
+        """
+        start = time.perf_counter()
+        self._reset_metrics()
+        self.dynamics.reset()
+
+        # Sentences wait unbounded (the LLM stream is never held up); at most one spoken
+        # sentence waits for the caller
+        pipeline = StagePipeline(self._source(start, model, prompt, system, options), [
+            Stage("speak", self._speak_item, backend="thread", queue_size=0),
+        ], queue_size=1)
+        try:
+            index = 0
+            for item in pipeline.run():
+                if isinstance(item, dict):
+                    yield item
+                    break
+                seg, text, wav, mora_count = item
+
+                elapsed = time.perf_counter() - start
+                if self.metrics["time_to_first_audio"] is None:
+                    self.metrics["time_to_first_audio"] = elapsed
+                self.metrics["segments"] += 1
+
+                if self.verbose:
+                    print(f"[Stream] #{index:03d} ({elapsed:.2f}s, {mora_count} moras): '{text.strip()[:40]}'")
+
+                yield {
+                    "index": index,
+                    "text": text,
+                    "wav": wav,
+                    "mora_count": mora_count,
+                    "elapsed": elapsed,
+                }
+                index += 1
+        finally:
+            self.metrics["stages"] = pipeline.metrics
+            self.metrics["total_time"] = time.perf_counter() - start
@@ -1,10 +1,87 @@
 import re
-import alkana
-import pykakasi
+import json
+import os
+import threading
+from typing import List, Tuple
+
+from atomic_file import atomic_open
+from kana_index import shared_index
+from lru_cache import LRUCache
+
+_ENGLISH = re.compile(r'[a-zA-Z]+')
+# pykakasi's convert() slows down superlinearly with the input length, and readings only
+# depend on context within a sentence, so long texts are converted sentence by sentence
+_SENTENCE_END = re.compile(r'(?<=[。．！？!?\n])')
+# analyze_tokens() results are cached for token sequences up to this length (sentences);
+# longer ones (whole answers in batch mode) rarely recur
+SEGMENT_CACHE_TOKENS = 64
+# Small kana are part of the previous mora; small tsu (ッ/っ) is not in this set, it counts as 1
+_SMALL_KANA = set("ぁぃぅぇぉゃゅょゎァィゥェォャュョヮ")
+
+def _count_moras(reading: str) -> int:
+    return sum(1 for c in reading if c not in _SMALL_KANA)
+
+_KATA_TO_HIRA = {c: c - 0x60 for c in range(ord("ァ"), ord("ヶ") + 1)}
+
+def _split_reading(reading: str) -> List[str]:
+    """
+    Split a reading into moras, keeping its characters ("ちょっと" -> ["ちょ", "っ", "と"]).
+    """
+    moras = []
+    for c in reading:
+        if c in _SMALL_KANA and moras:
+            moras[-1] += c
+        else:
+            moras.append(c)
+    return moras
+
+def _divide_reading(orig: str, hira: str) -> List[Tuple[int, str]]:
+    """
+    Pieces of the reading hira of orig, each with the offset in orig it belongs to.
+    Kana written in orig as well (okurigana, particles) keep their own position;
+    the rest of the reading (the kanji part) is divided mora by mora in proportion
+    to its characters.
+    """
+    if len(hira) == len(orig):
+        return list(enumerate(hira))
+    plain = orig.translate(_KATA_TO_HIRA)
+    limit = min(len(plain), len(hira))
+    head = 0
+    while head < limit and plain[head] == hira[head]:
+        head += 1
+    tail = 0
+    while tail < limit - head and plain[-1 - tail] == hira[-1 - tail]:
+        tail += 1
+
+    pieces = [(j, hira[j]) for j in range(head)]
+    middle = _split_reading(hira[head:len(hira) - tail])
+    width = len(orig) - head - tail
+    for j, mora in enumerate(middle):
+        pieces.append((head + (2 * j + 1) * width // (2 * len(middle)) if width else max(head - 1, 0), mora))
+    pieces.extend((len(orig) - tail + j, hira[len(hira) - tail + j]) for j in range(tail))
+    return pieces
 
 class TextProcessor:
-    def __init__(self):
-        self.kks = pykakasi.kakasi()
+    def __init__(self, cache_size: int = 4096, cache_path: str = None, kana_index_path: str = None):
+        """
+        :param cache_size: Max number of memoized analyze() results (LRU). 0 disables the cache.
+        :param cache_path: Optional JSON file to pre-warm the cache from (see save_cache).
+        :param kana_index_path: English -> kana index file (see KanaIndex), built from alkana
+            when missing. None: built in memory.
+        """
+        # pykakasi is imported and the kakasi dictionary (~0.4s) is built on first use,
+        # or ahead of time by warm_up() (e.g. on a background thread). Same for the kana index.
+        self._kks = None
+        self._kana_index = None
+        self.kana_index_path = kana_index_path
+        self._init_lock = threading.Lock()
+        # LLM output repeats the same sub-word tokens (particles, punctuation, "です", "the")
+        # and short sentences (greetings, fillers), so analyze() results are memoized by token
+        # text and analyze_tokens() results by the tuple of token texts.
+        self.cache = LRUCache(cache_size) if cache_size > 0 else None
+        self.cache_path = cache_path
+        if cache_path and os.path.exists(cache_path):
+            self.load_cache(cache_path)
         # New API doesn't use setMode or getConverter in the same way for simple conversion?
         # Actually proper usage of 2.x+ is:
         # kks = pykakasi.kakasi()
@@ -12,22 +89,41 @@ class TextProcessor:
         # result is a list of dicts.
         pass
 
+    @property
+    def kks(self):
+        if self._kks is None:
+            with self._init_lock:
+                if self._kks is None:
+                    import pykakasi
+                    self._kana_index = shared_index(self.kana_index_path)
+                    self._kks = pykakasi.kakasi()
+        return self._kks
+
+    def warm_up(self):
+        """
+        Import the converters and build the dictionary now instead of on the first analyze().
+        """
+        self.kks
+
     def get_kana(self, text: str) -> str:
         """
         Convert mixed text (English/Japanese) to Katakana/Hiragana reading.
-        English words are converted to Katakana via alkana.
+        English words are converted to Katakana via the kana index (alkana vocabulary
+        plus spelling rules for acronyms, camelCase and plurals).
         """
-        def replace_eng(match):
-            word = match.group(0)
-            kana = alkana.get_kana(word.lower())
-            if kana:
-                return kana
-            return word
+        kks = self.kks
 
-        text_with_kana = re.sub(r'[a-zA-Z]+', replace_eng, text)
+        parts = []
+        pos = 0
+        for (start, end), kana in self._english_readings(text):
+            parts.append(text[pos:start])
+            parts.append(kana)
+            pos = end
+        parts.append(text[pos:])
+        text_with_kana = "".join(parts)
         
         # Use pykakasi new API
-        converted = self.kks.convert(text_with_kana)
+        converted = kks.convert(text_with_kana)
         # converted is list of items: [{'orig': '...', 'hira': '...', 'kana': '...', 'hepburn': '...', 'kunrei': '...', 'passport': '...'}]
         # We want 'hira' (Hiragana) or 'kana' (Katakana). Let's use Hiragana for reading.
         
@@ -37,6 +133,17 @@ class TextProcessor:
             
         return result_str
 
+    def _english_readings(self, text: str) -> List[Tuple[Tuple[int, int], str]]:
+        """
+        (span, Katakana) of every English word in text that has a reading,
+        all words resolved in one index lookup.
+        """
+        matches = list(_ENGLISH.finditer(text))
+        if not matches:
+            return []
+        readings = self._kana_index.resolve([m.group(0) for m in matches])
+        return [(m.span(), kana) for m, kana in zip(matches, readings) if kana]
+
     def count_moras(self, text: str) -> int:
         """
         Estimate the number of moras in the text.
@@ -95,27 +202,146 @@ class TextProcessor:
         return mora_count
 
     def analyze(self, text: str) -> dict:
+        if self.cache is None:
+            return self._analyze(text)
+
+        cached = self.cache.get(text)
+        if cached is None:
+            result = self._analyze(text)
+            self.cache.put(text, (result["reading"], result["mora_count"]))
+            return result
+
+        return {
+            "original": text,
+            "reading": cached[0],
+            "mora_count": cached[1]
+        }
+
+    def load_cache(self, path: str) -> int:
+        """
+        Pre-warm the cache from a JSON file written by save_cache() (or the older
+        {text: [reading, mora_count]} form, tokens only).
+        Returns the number of loaded entries.
+        """
+        if self.cache is None:
+            return 0
+        with open(path, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if isinstance(entries.get("tokens"), dict):
+            tokens, segments = entries["tokens"], entries.get("segments", [])
+        else:
+            tokens, segments = entries, []
+        for text, (reading, mora_count) in tokens.items():
+            self.cache.put(text, (reading, mora_count))
+        for texts, values in segments:
+            self.cache.put(tuple(texts), tuple((reading, mora_count) for reading, mora_count in values))
+        return len(tokens) + len(segments)
+
+    def save_cache(self, path: str = None):
+        """
+        Persist the cache as JSON: {"tokens": {text: [reading, mora_count]},
+        "segments": [[[token texts], [[reading, mora_count], ...]], ...]}.
+        """
+        path = path or self.cache_path
+        if self.cache is None or not path:
+            return
+        entries = {"tokens": {}, "segments": []}
+        for key, value in self.cache.items():
+            if isinstance(key, tuple):
+                entries["segments"].append([list(key), [list(pair) for pair in value]])
+            else:
+                entries["tokens"][key] = list(value)
+        with atomic_open(path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, ensure_ascii=False)
+
+    def _analyze(self, text: str) -> dict:
         reading = self.get_kana(text)
-        mora_count = 0
-        
-        # Refined mora counting logic
-        # Count all chars first
-        # Subtract 1 for each Cy/Cw/V combinations (small chars)
-        # But keep small tsu (ッ/っ) as 1 mora.
-        
-        small_kana = set("ぁぃぅぇぉゃゅょゎァィゥェォャュョヮ")
-        # ッ/っ is NOT in this set, so it counts as 1.
-        
-        for c in reading:
-            if c not in small_kana:
-                mora_count += 1
-                
+        # Count all chars except small kana (Cy/Cw/V combinations); small tsu counts as 1 mora.
         return {
             "original": text,
             "reading": reading,
-            "mora_count": mora_count
+            "mora_count": _count_moras(reading)
         }
 
+    def analyze_tokens(self, texts: List[str]) -> List[dict]:
+        """
+        Batch analysis of a whole response: the concatenated token texts are converted
+        (one kakasi call per sentence) and the readings are projected back onto the tokens
+        by character offset.
+        Unlike analyze() per token, words split across tokens ("東" + "京", "Py" + "thon")
+        are read in context.
+
+        A reading that spans several tokens is divided between them by character offset
+        (see _divide_reading).
+        Tokens the converter output cannot be matched to fall back to analyze().
+        Returns one analyze()-style dict per token.
+        Sequences of up to SEGMENT_CACHE_TOKENS tokens are cached (see analyze()).
+        """
+        key = tuple(texts) if self.cache is not None and len(texts) <= SEGMENT_CACHE_TOKENS else None
+        if key is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return [{"original": token_text, "reading": reading, "mora_count": mora_count}
+                        for token_text, (reading, mora_count) in zip(texts, cached)]
+        results = self._analyze_tokens(texts)
+        if key is not None:
+            self.cache.put(key, tuple((r["reading"], r["mora_count"]) for r in results))
+        return results
+
+    def _analyze_tokens(self, texts: List[str]) -> List[dict]:
+        kks = self.kks
+        text = "".join(texts)
+        # owner[i]: index of the token character i of text came from
+        owner = []
+        for index, token_text in enumerate(texts):
+            owner.extend([index] * len(token_text))
+
+        # English words -> kana (as get_kana), keeping the original offset of every character
+        parts = []
+        origin = []
+        pos = 0
+        for (start, end), kana in self._english_readings(text):
+            parts.append(text[pos:start])
+            origin.extend(range(pos, start))
+            parts.append(kana)
+            origin.extend(start + j * (end - start) // len(kana) for j in range(len(kana)))
+            pos = end
+        parts.append(text[pos:])
+        origin.extend(range(pos, len(text)))
+        converted = "".join(parts)
+
+        readings = [[] for _ in texts]
+        cursor = 0
+        items = (item for sentence in _SENTENCE_END.split(converted) if sentence
+                 for item in kks.convert(sentence))
+        for item in items:
+            orig, hira = item["orig"], item["hira"]
+            if not orig or not converted.startswith(orig, cursor):
+                # pykakasi occasionally repeats an item (e.g. around line breaks)
+                continue
+            start, cursor = cursor, cursor + len(orig)
+            first, last = owner[origin[start]], owner[origin[cursor - 1]]
+            if first == last:
+                readings[first].append(hira)
+            else:
+                for offset, piece in _divide_reading(orig, hira):
+                    readings[owner[origin[start + offset]]].append(piece)
+
+        # Text the converter output did not cover: per-token analysis
+        fallback = owner[origin[cursor]] if cursor < len(converted) else len(texts)
+        results = []
+        for index, token_text in enumerate(texts):
+            if index >= fallback and token_text:
+                results.append(self.analyze(token_text))
+                continue
+            reading = "".join(readings[index])
+            results.append({
+                "original": token_text,
+                "reading": reading,
+                "mora_count": _count_moras(reading)
+            })
+        return results
+
 if __name__ == "__main__":
     tp = TextProcessor()
     samples = [
@@ -0,0 +1,149 @@
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+
+class ThinkFilter:
+    """
+    Drops <think>...</think> reasoning from a stream of normalized LLM chunks, token by token.
+
+    Tags may be split across any number of tokens ("<th", "ink", ">"): a token suffix that
+    could still become a tag is held back until the next token decides it. Tokens that
+    straddle a tag are split, and both halves keep the token's emotion values
+    (like SentenceSegmenter). Whitespace before the first visible character is dropped.
+    An unclosed <think> at the end of the stream is dropped as well.
+
+    on_visible (if given) is called once, with the first visible chunk, as soon as the
+    answer proper starts - so TTS can start right away instead of after generation.
+    """
+
+    def __init__(self, open_tag: str = OPEN_TAG, close_tag: str = CLOSE_TAG,
+                 starts_in_think: bool = False, on_visible: Optional[Callable[[Dict[str, Any]], None]] = None):
+        """
+        :param starts_in_think: The stream begins inside a think block (chat templates that put
+            the opening tag in the prompt, so the model only emits the closing one).
+        """
+        self.open_tag = open_tag
+        self.close_tag = close_tag
+        self.in_think = starts_in_think
+        self.on_visible = on_visible
+        self.visible_started = False
+        self.visible_time: Optional[float] = None  # perf_counter() of the first visible chunk
+        self.think_chars = 0
+        self.think_tokens = 0
+        # Text held back because it may be the start of a tag: [(chunk, text), ...]
+        self._held: List[Tuple[Dict[str, Any], str]] = []
+
+    def _take(self, n: int) -> List[Tuple[Dict[str, Any], str]]:
+        """
+        Removes the first n held characters, keeping track of the chunk they came from.
+        """
+        taken = []
+        while n > 0 and self._held:
+            chunk, text = self._held[0]
+            if len(text) <= n:
+                taken.append((chunk, text))
+                self._held.pop(0)
+                n -= len(text)
+            else:
+                taken.append((chunk, text[:n]))
+                self._held[0] = (chunk, text[n:])
+                n = 0
+        return taken
+
+    def _emit(self, pieces: List[Tuple[Dict[str, Any], str]], out: List[Dict[str, Any]]):
+        for chunk, text in pieces:
+            if self.in_think:
+                self.think_chars += len(text)
+                continue
+            if not self.visible_started:
+                text = text.lstrip()
+                if not text:
+                    continue
+            piece = chunk if text == chunk.get("token", "") else dict(chunk, token=text)
+            if not self.visible_started:
+                self.visible_started = True
+                self.visible_time = time.perf_counter()
+                if self.on_visible is not None:
+                    self.on_visible(piece)
+            out.append(piece)
+
+    @staticmethod
+    def _partial_suffix(text: str, tag: str) -> int:
+        """
+        Length of the longest suffix of text that is a proper prefix of tag.
+        """
+        for n in range(min(len(text), len(tag) - 1), 0, -1):
+            if tag.startswith(text[-n:]):
+                return n
+        return 0
+
+    def feed(self, chunk: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Feed one chunk. Returns the visible chunks (maybe empty, maybe parts of this
+        and earlier chunks). Chunks without text (e.g. the final done chunk) pass through.
+        A done chunk flushes the held text.
+        """
+        text = chunk.get("token", "")
+        if not text:
+            out = self.flush() if chunk.get("done") else []
+            out.append(chunk)
+            return out
+        out = self._feed(chunk, text)
+        if chunk.get("done"):
+            out.extend(self.flush())
+        return out
+
+    def _feed(self, chunk: Dict[str, Any], text: str) -> List[Dict[str, Any]]:
+        out: List[Dict[str, Any]] = []
+        # Tokens that are (partly) reasoning or tags
+        thinking = self.in_think
+        if not self._held and "<" not in text:
+            # Common case: nothing pending and no tag can start in this token
+            self._emit([(chunk, text)], out)
+            self.think_tokens += thinking
+            return out
+        self._held.append((chunk, text))
+        buffer = "".join(t for _, t in self._held)
+        while True:
+            tag = self.close_tag if self.in_think else self.open_tag
+            i = buffer.find(tag)
+            if i < 0:
+                keep = self._partial_suffix(buffer, tag)
+                self._emit(self._take(len(buffer) - keep), out)
+                self.think_tokens += thinking
+                return out
+            thinking = True
+            self._emit(self._take(i), out)
+            self._take(len(tag))
+            buffer = buffer[i + len(tag):]
+            self.in_think = not self.in_think
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """
+        End of stream: held text that never became a tag is visible (or dropped, inside think).
+        """
+        out: List[Dict[str, Any]] = []
+        self._emit(self._take(sum(len(t) for _, t in self._held)), out)
+        return out
+
+    def filter(self, chunks: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """
+        Filtering stage over a chunk iterable (e.g. OllamaClient.generate_stream()).
+        Error chunks pass through unchanged.
+        """
+        for chunk in chunks:
+            if "error" in chunk:
+                yield chunk
+                return
+            yield from self.feed(chunk)
+        yield from self.flush()
+
+
+def strip_think(tokens: List[Dict[str, Any]], **kwargs) -> List[Dict[str, Any]]:
+    """
+    Non-streaming use: the visible tokens of a complete response.
+    """
+    return list(ThinkFilter(**kwargs).filter(tokens))
@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+def logprob_matrix(top_logprobs: Sequence[Sequence[float]]) -> np.ndarray:
+    """
+    Pack ragged per-token top_logprobs into an (n_tokens, k) matrix, padded with -inf
+    (probability 0), without a per-token Python loop over the matrix.
+    """
+    lengths = np.fromiter((len(row) for row in top_logprobs), dtype=np.intp, count=len(top_logprobs))
+    k = int(lengths.max()) if len(lengths) else 0
+    matrix = np.full((len(lengths), k), -np.inf)
+    if k:
+        flat = np.fromiter((lp for row in top_logprobs for lp in row), dtype=np.float64, count=int(lengths.sum()))
+        rows = np.repeat(np.arange(len(lengths)), lengths)
+        starts = np.cumsum(lengths) - lengths
+        cols = np.arange(len(flat)) - np.repeat(starts, lengths)
+        matrix[rows, cols] = flat
+    return matrix
+
+def compute_token_metrics(logprobs: Sequence[Optional[float]],
+                          top_logprobs: Sequence[Sequence[float]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Batched confidence / entropy for a sequence of tokens.
+
+    :param logprobs: log probability of each sampled token (None = unknown -> confidence 1.0).
+    :param top_logprobs: per token, the log probabilities of the top-k candidates.
+    :return: (confidence, entropy) arrays.
+        confidence = exp(logprob) of the sampled token.
+        entropy = Shannon entropy (nats) of the top-k distribution, renormalized to sum to 1
+        (the tail beyond k is unknown). 0.0 when no candidates are given.
+    """
+    lp = np.array([np.nan if v is None else v for v in logprobs], dtype=np.float64)
+    confidence = np.where(np.isnan(lp), 1.0, np.exp(lp))
+
+    matrix = logprob_matrix(top_logprobs)
+    if matrix.shape[1] == 0:
+        return confidence, np.zeros(len(lp))
+
+    # Softmax over the known candidates (shifted by the row max for stability)
+    row_max = matrix.max(axis=1, keepdims=True)
+    row_max[~np.isfinite(row_max)] = 0.0
+    p = np.exp(matrix - row_max)
+    mass = p.sum(axis=1, keepdims=True)
+    p = np.divide(p, mass, out=np.zeros_like(p), where=mass > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plogp = np.where(p > 0, p * np.log(p), 0.0)
+    entropy = np.maximum(-plogp.sum(axis=1), 0.0)
+    return confidence, entropy
+
+def apply_token_metrics(tokens: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Fill 'prob' / 'entropy' (in place) for normalized tokens that carry
+    'logprob' / 'top_logprobs'. Tokens without logprobs are left untouched.
+    """
+    indices = [i for i, t in enumerate(tokens) if "logprob" in t]
+    if not indices:
+        return tokens
+    confidence, entropy = compute_token_metrics(
+        [tokens[i]["logprob"] for i in indices],
+        [[lp for _, lp in tokens[i].get("top_logprobs", [])] for i in indices]
+    )
+    for i, c, e in zip(indices, confidence.tolist(), entropy.tolist()):
+        tokens[i]["prob"] = c
+        tokens[i]["entropy"] = e
+    return tokens
@@ -0,0 +1,333 @@
+import glob
+import json
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Generator, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+from atomic_file import write_atomic
+
+_MAGIC = b"TOKREC01"
+_HEADER = struct.Struct("<8sIIIII")  # magic, chunk count, top-k width, string count, meta bytes, string bytes
+_ALIGN = 8
+NO_STRING = 0xFFFFFFFF
+EXTENSION = ".tokrec"
+
+
+def _pad(size: int) -> bytes:
+    return b"\0" * (-size % _ALIGN)
+
+
+class TokenRecording:
+    """
+    A recorded LLM token stream (normalized chunks of OllamaClient.generate_stream()),
+    in a compact binary file that is memory-mapped instead of parsed:
+
+        header    magic, counts (_HEADER)
+        meta      UTF-8 JSON: model, prompt, system, options, recorded_at, error
+        strings   <u4 byte offsets + UTF-8 blob; every distinct token / candidate text once
+        arrays    token (<u4 string id), time (<f4 seconds since the request), prob, entropy,
+                  logprob (<f4, NaN = no logprobs), done (u1),
+                  top_ids (<u4, n x k, NO_STRING = none), top_logprobs (<f4, n x k)
+    Sections start at multiples of 8 bytes. The arrays are read-only views into the file,
+    so scanning the prob / entropy of thousands of recordings reads only those pages.
+    Floats are stored as float32 (prob / entropy differ from the live values by < 1e-7).
+
+        with TokenRecording.load("rec/session.tokrec") as rec:
+            rec.entropy.mean(), rec.text
+            for chunk in rec.chunks(): ...
+    """
+
+    def __init__(self, buffer, source: Optional[mmap.mmap] = None):
+        magic, n, k, n_strings, meta_size, strings_size = _HEADER.unpack_from(buffer)
+        if magic != _MAGIC:
+            raise ValueError("Not a token recording")
+        self.k = k
+        pos = _HEADER.size + len(_pad(_HEADER.size))
+        self.meta: Dict[str, Any] = json.loads(bytes(buffer[pos:pos + meta_size]).decode("utf-8"))
+        pos += meta_size + len(_pad(meta_size))
+        self._string_offsets = np.frombuffer(buffer, dtype="<u4", count=n_strings + 1, offset=pos)
+        pos += 4 * (n_strings + 1)
+        self._strings_at = pos
+        pos += strings_size + len(_pad(pos + strings_size))
+
+        def array(dtype, count):
+            nonlocal pos
+            a = np.frombuffer(buffer, dtype=dtype, count=count, offset=pos)
+            pos += a.nbytes + len(_pad(a.nbytes))
+            return a
+
+        self.token_ids = array("<u4", n)
+        self.times = array("<f4", n)
+        self.prob = array("<f4", n)
+        self.entropy = array("<f4", n)
+        self.logprob = array("<f4", n)
+        self.done = array("u1", n)
+        self.top_ids = array("<u4", n * k).reshape(n, k)
+        self.top_logprobs = array("<f4", n * k).reshape(n, k)
+        self._buffer = buffer
+        self._mmap = source
+        self._strings: Optional[List[str]] = None
+
+    @staticmethod
+    def serialize(chunks: Sequence[Dict[str, Any]], times: Optional[Sequence[float]] = None,
+                  meta: Optional[Dict[str, Any]] = None) -> bytes:
+        """
+        The file contents for normalized chunks ({"token", "done", "prob", "entropy",
+        "logprob"?, "top_logprobs"?}) and their arrival times (seconds since the request).
+        """
+        table: Dict[str, int] = {}
+
+        def intern(s: str) -> int:
+            i = table.get(s)
+            if i is None:
+                i = table[s] = len(table)
+            return i
+
+        n = len(chunks)
+        k = max((len(c.get("top_logprobs") or ()) for c in chunks), default=0)
+        token_ids = np.fromiter((intern(c.get("token", "")) for c in chunks), dtype="<u4", count=n)
+        prob = np.fromiter((c.get("prob", 1.0) for c in chunks), dtype="<f4", count=n)
+        entropy = np.fromiter((c.get("entropy", 0.0) for c in chunks), dtype="<f4", count=n)
+        logprob = np.fromiter((c.get("logprob", np.nan) for c in chunks), dtype="<f4", count=n)
+        done = np.fromiter((bool(c.get("done", False)) for c in chunks), dtype="u1", count=n)
+        top_ids = np.full((n, k), NO_STRING, dtype="<u4")
+        top_logprobs = np.full((n, k), -np.inf, dtype="<f4")
+        for i, chunk in enumerate(chunks):
+            for j, (text, lp) in enumerate(chunk.get("top_logprobs") or ()):
+                top_ids[i, j] = intern(text)
+                top_logprobs[i, j] = lp
+        stamps = np.zeros(n, dtype="<f4") if times is None else np.asarray(times, dtype="<f4")
+
+        encoded = [s.encode("utf-8") for s in table]
+        offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        meta_bytes = json.dumps(meta or {}, ensure_ascii=False).encode("utf-8")
+        blob = b"".join(encoded)
+
+        parts = [_HEADER.pack(_MAGIC, n, k, len(encoded), len(meta_bytes), len(blob)), _pad(_HEADER.size),
+                 meta_bytes, _pad(len(meta_bytes)), offsets.tobytes(), blob]
+        size = sum(map(len, parts))
+        parts.append(_pad(size))
+        for a in (token_ids, stamps, prob, entropy, logprob, done, top_ids, top_logprobs):
+            parts += [a.tobytes(), _pad(a.nbytes)]
+        return b"".join(parts)
+
+    @classmethod
+    def from_chunks(cls, chunks: Sequence[Dict[str, Any]], times: Optional[Sequence[float]] = None,
+                    meta: Optional[Dict[str, Any]] = None) -> "TokenRecording":
+        return cls(cls.serialize(chunks, times, meta))
+
+    @classmethod
+    def load(cls, path: str) -> "TokenRecording":
+        """
+        Memory-map a recording file.
+        """
+        with open(path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            return cls(mm, source=mm)
+        except (ValueError, struct.error):
+            mm.close()
+            raise ValueError(f"{path} is not a token recording")
+
+    def save(self, path: str):
+        write_atomic(path, self._buffer[:])
+
+    def close(self):
+        if self._mmap is not None:
+            # Drop the arrays first, an mmap with exported buffers cannot be closed
+            self.token_ids = self.times = self.prob = self.entropy = self.logprob = None
+            self.done = self.top_ids = self.top_logprobs = self._string_offsets = self._buffer = None
+            try:
+                self._mmap.close()
+            except BufferError:
+                pass  # arrays kept by the caller; unmapped when the last one goes
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.token_ids)
+
+    @property
+    def strings(self) -> List[str]:
+        # Decoded once on first use; scans of the numeric arrays never need them
+        if self._strings is None:
+            offsets = self._string_offsets.tolist()
+            blob = bytes(self._buffer[self._strings_at:self._strings_at + offsets[-1]])
+            self._strings = [blob[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+        return self._strings
+
+    @property
+    def tokens(self) -> List[str]:
+        strings = self.strings
+        return [strings[i] for i in self.token_ids.tolist()]
+
+    @property
+    def text(self) -> str:
+        return "".join(self.tokens)
+
+    def chunks(self) -> Iterator[Dict[str, Any]]:
+        """
+        The normalized chunks as recorded (the format of generate_stream()).
+        """
+        strings = self.strings
+        columns = zip(self.token_ids.tolist(), self.done.tolist(), self.prob.tolist(), self.entropy.tolist(),
+                      self.logprob.tolist(), self.top_ids.tolist(), self.top_logprobs.tolist())
+        for token, done, prob, entropy, logprob, top_ids, top_logprobs in columns:
+            chunk = {"token": strings[token], "done": bool(done), "prob": prob, "entropy": entropy}
+            if logprob == logprob:  # not NaN
+                chunk["logprob"] = logprob
+                chunk["top_logprobs"] = [[strings[i], lp] for i, lp in zip(top_ids, top_logprobs) if i != NO_STRING]
+            yield chunk
+
+
+def recording_paths(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, f"*{EXTENSION}")))
+
+
+def scan_recordings(paths: Iterable[str], fields: Sequence[str] = ("prob", "entropy")) -> Iterator[Dict[str, Any]]:
+    """
+    {"path", "meta", <field>: array copy, ...} per recording, mapping and unmapping one
+    file at a time (only the pages of the requested arrays are read).
+    """
+    for path in paths:
+        with TokenRecording.load(path) as rec:
+            result = {"path": path, "meta": rec.meta}
+            for field in fields:
+                result[field] = np.array(getattr(rec, field))
+        yield result
+
+
+class RecordingClient:
+    """
+    Wraps an OllamaClient: generate_stream() passes the chunks through unchanged and
+    saves them, with their arrival times, as a TokenRecording in directory (one file
+    per generation, also when the consumer stops early). self.last_path is the newest file.
+    """
+
+    def __init__(self, client, directory: str):
+        self.client = client
+        self.directory = directory
+        self.last_path: Optional[str] = None
+        os.makedirs(directory, exist_ok=True)
+
+    def __getattr__(self, name):
+        # ensure_running / preload / close / ... of the wrapped client
+        return getattr(self.client, name)
+
+    def generate_stream(self, model: str, prompt: str, system: str = "",
+                        options: Dict[str, Any] = None) -> Generator[Dict[str, Any], None, None]:
+        chunks, times = [], []
+        meta = {"model": model, "prompt": prompt, "system": system, "options": options,
+                "recorded_at": time.time()}
+        start = time.perf_counter()
+        try:
+            for chunk in self.client.generate_stream(model, prompt, system, options):
+                if "error" in chunk:
+                    meta["error"] = chunk["error"]
+                else:
+                    chunks.append(chunk)
+                    times.append(time.perf_counter() - start)
+                yield chunk
+        finally:
+            path = os.path.join(self.directory, f"{time.strftime('%Y%m%d-%H%M%S')}-{time.time_ns() % 10**9:09d}{EXTENSION}")
+            TokenRecording.from_chunks(chunks, times, meta).save(path)
+            self.last_path = path
+
+    def generate(self, model: str, prompt: str, system: str = "", options: Dict[str, Any] = None) -> Dict[str, Any]:
+        return _collect(self.generate_stream(model, prompt, system, options))
+
+
+class ReplayClient:
+    """
+    Stands in for OllamaClient, replaying recordings instead of generating: each call of
+    generate_stream() / generate() replays the next recording (cycling), whatever the
+    prompt. realtime=True reproduces the recorded arrival times (divided by speed);
+    otherwise chunks come as fast as they are consumed.
+
+        llm = ReplayClient(recording_paths("recordings"))
+    """
+
+    def __init__(self, recordings: Union[str, TokenRecording, Sequence[Union[str, TokenRecording]]],
+                 realtime: bool = False, speed: float = 1.0):
+        if isinstance(recordings, (str, TokenRecording)):
+            recordings = [recordings]
+        if not recordings:
+            raise ValueError("No recordings to replay")
+        self.recordings = list(recordings)
+        self.realtime = realtime
+        self.speed = speed
+        self.calls = 0
+
+    def ensure_running(self):
+        pass
+
+    def preload(self, model: str) -> bool:
+        return True
+
+    def is_running(self) -> bool:
+        return True
+
+    def close(self):
+        pass
+
+    def _next(self):
+        item = self.recordings[self.calls % len(self.recordings)]
+        self.calls += 1
+        if isinstance(item, str):
+            return TokenRecording.load(item), True
+        return item, False
+
+    def generate_stream(self, model: str = "", prompt: str = "", system: str = "",
+                        options: Dict[str, Any] = None) -> Generator[Dict[str, Any], None, None]:
+        recording, owned = self._next()
+        try:
+            times = recording.times.tolist()
+            start = time.perf_counter()
+            for chunk, at in zip(recording.chunks(), times):
+                if self.realtime:
+                    delay = at / self.speed - (time.perf_counter() - start)
+                    if delay > 0:
+                        time.sleep(delay)
+                yield chunk
+            if "error" in recording.meta:
+                yield {"error": recording.meta["error"]}
+        finally:
+            if owned:
+                recording.close()
+
+    def generate(self, model: str = "", prompt: str = "", system: str = "",
+                 options: Dict[str, Any] = None) -> Dict[str, Any]:
+        return _collect(self.generate_stream(model, prompt, system, options))
+
+
+def _collect(stream: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    OllamaClient.generate()'s result from a chunk stream.
+    """
+    tokens = []
+    start = time.perf_counter()
+    first_token_time = None
+    for chunk in stream:
+        if "error" in chunk:
+            return chunk
+        if first_token_time is None and chunk["token"]:
+            first_token_time = time.perf_counter() - start
+        tokens.append(chunk)
+        if chunk["done"]:
+            break
+    return {
+        "response": "".join(t["token"] for t in tokens),
+        "tokens": tokens,
+        "first_token_time": first_token_time,
+        "generation_time": time.perf_counter() - start,
+    }
@@ -0,0 +1,191 @@
+import json
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from atomic_file import write_atomic
+
+class Span:
+    """
+    One timed step of a request. Counts (tokens, moras, bytes, ...) are added
+    with count() while the step runs.
+
+        with trace.span("mapping") as span:
+            values = mapper.map_tokens_to_moras(tokens)
+            span.count(tokens=len(tokens), moras=len(values))
+    """
+    __slots__ = ("name", "start", "duration", "counts")
+
+    def __init__(self, name: str, counts: Dict[str, int]):
+        self.name = name
+        self.start = 0.0
+        self.duration = 0.0
+        self.counts = counts
+
+    def count(self, **counts):
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.duration = time.perf_counter() - self.start
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = {"name": self.name, "duration": self.duration}
+        d.update(self.counts)
+        if self.duration > 0:
+            for key, value in self.counts.items():
+                d[f"{key}_per_s"] = value / self.duration
+        return d
+
+class Trace:
+    """
+    The spans of one request (one prompt -> one answer).
+    Spans with the same name (e.g. per-sentence synthesis in streaming mode) are all kept.
+    """
+
+    def __init__(self, request_id: str, attrs: Dict[str, Any]):
+        self.request_id = request_id
+        self.attrs = attrs
+        self.start = time.perf_counter()
+        self.wall_start = time.time()
+        self.duration = None
+        self.spans: List[Span] = []
+
+    def span(self, name: str, **counts) -> Span:
+        span = Span(name, counts)
+        self.spans.append(span)
+        return span
+
+    def record(self, name: str, duration: float, **counts):
+        """
+        Adds a span measured elsewhere (e.g. time to first token).
+        """
+        span = Span(name, counts)
+        span.duration = duration
+        self.spans.append(span)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "request_id": self.request_id,
+            "timestamp": self.wall_start,
+            "duration": self.duration,
+            **self.attrs,
+            "spans": [s.to_dict() for s in self.spans],
+        }
+
+class _NullSpan:
+    __slots__ = ()
+
+    def count(self, **counts):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+class _NullTrace:
+    """
+    What a disabled Tracer hands out: every call is a no-op on shared objects.
+    """
+    __slots__ = ()
+    request_id = None
+    spans = ()
+
+    def span(self, name: str, **counts) -> _NullSpan:
+        return _NULL_SPAN
+
+    def record(self, name: str, duration: float, **counts):
+        pass
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {}
+
+_NULL_SPAN = _NullSpan()
+NULL_TRACE = _NullTrace()
+
+class Tracer:
+    """
+    Per-request step timings and counts.
+
+    Finished traces are appended to a JSON lines file (one request per line) and
+    aggregated per step for a Prometheus text dump (prometheus_text()).
+    When disabled, trace() returns NULL_TRACE and instrumented code costs one
+    no-op method call per step.
+    """
+
+    def __init__(self, enabled: bool = True, jsonl_path: Optional[str] = None, prefix: str = "llm_talk"):
+        """
+        :param jsonl_path: File finished traces are appended to (None: not written).
+        :param prefix: Prometheus metric name prefix.
+        """
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.prefix = prefix
+        self.requests = 0
+        # step -> {"count", "seconds", <count name>: total}
+        self._steps: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    def trace(self, request_id: Optional[str] = None, **attrs):
+        if not self.enabled:
+            return NULL_TRACE
+        return Trace(request_id or uuid.uuid4().hex[:12], attrs)
+
+    def finish(self, trace) -> Optional[Dict[str, Any]]:
+        """
+        Closes a trace: aggregates its spans and writes it to the JSON lines file.
+        Returns the trace as a dict (None for NULL_TRACE).
+        """
+        if trace is NULL_TRACE:
+            return None
+        trace.duration = time.perf_counter() - trace.start
+        data = trace.to_dict()
+        with self._lock:
+            self.requests += 1
+            for span in trace.spans:
+                step = self._steps.setdefault(span.name, {"count": 0, "seconds": 0.0})
+                step["count"] += 1
+                step["seconds"] += span.duration
+                for key, value in span.counts.items():
+                    step[key] = step.get(key, 0) + value
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(data, ensure_ascii=False) + "\n")
+        return data
+
+    def prometheus_text(self) -> str:
+        p = self.prefix
+        with self._lock:
+            steps = {name: dict(step) for name, step in self._steps.items()}
+            requests = self.requests
+        lines = [
+            f"# HELP {p}_requests_total Finished requests.",
+            f"# TYPE {p}_requests_total counter",
+            f"{p}_requests_total {requests}",
+            f"# HELP {p}_step_seconds Time spent per pipeline step.",
+            f"# TYPE {p}_step_seconds summary",
+        ]
+        for name, step in sorted(steps.items()):
+            lines.append(f'{p}_step_seconds_sum{{step="{name}"}} {step["seconds"]:.6f}')
+            lines.append(f'{p}_step_seconds_count{{step="{name}"}} {step["count"]}')
+        units = sorted({key for step in steps.values() for key in step if key not in ("count", "seconds")})
+        for unit in units:
+            lines.append(f"# HELP {p}_{unit}_total {unit.capitalize()} processed per pipeline step.")
+            lines.append(f"# TYPE {p}_{unit}_total counter")
+            for name, step in sorted(steps.items()):
+                if unit in step:
+                    lines.append(f'{p}_{unit}_total{{step="{name}"}} {step[unit]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """
+        Writes prometheus_text() (e.g. for the node_exporter textfile collector).
+        """
+        write_atomic(path, self.prometheus_text())
@@ -1,30 +1,65 @@
 from pathlib import Path
-from voicevox_core import VoicevoxCore, AccelerationMode
 # import simpleaudio as sa # Use simpleaudio or similar if needed, or just return bytes.
 # Plan says pyaudio for playback, but Voicevox generates wav bytes.
 # We will focus on generation first.
 
 import os
+import copy
+import re
+import threading
+import unicodedata
+
+from lru_cache import LRUCache
+from wav_cache import WavCache
+
+def create_voicevox_core(dict_dir: str, use_gpu: bool):
+    """
+    Default core factory. voicevox_core is imported here so that a fake core
+    (see benchmarks/fake_voicevox.py) can be used where the DLLs are not available.
+    """
+    from voicevox_core import VoicevoxCore, AccelerationMode
+
+    acceleration_mode = AccelerationMode.GPU if use_gpu else AccelerationMode.CPU
+    return VoicevoxCore(
+        acceleration_mode=acceleration_mode,
+        open_jtalk_dict_dir=dict_dir
+    )
 
 class TTSEngine:
-    def __init__(self, core_dir: str = "./voicevox_core", use_gpu: bool = False):
+    def __init__(self, core_dir: str = "./voicevox_core", use_gpu: bool = False, core_factory=None,
+                 query_cache_size: int = 256, query_cache_bytes: int = 32 * 1024 * 1024,
+                 wav_cache: WavCache = None):
+        """
+        :param core_factory: callable(open_jtalk_dict_dir, use_gpu) -> core object with the
+            VoicevoxCore interface (audio_query / synthesis / load_model / is_model_loaded).
+            Defaults to the real VoicevoxCore.
+        :param query_cache_size: Max number of cached AudioQueries (LRU). 0 disables the cache.
+        :param query_cache_bytes: Memory cap of the AudioQuery cache.
+        :param wav_cache: Optional on-disk cache of synthesized audio, keyed by the final AudioQuery.
+        """
         self.core_dir = Path(core_dir).absolute()
         self.dict_dir = self.core_dir / "open_jtalk_dic_utf_8-1.11"
+        self.use_gpu = use_gpu
+        self.core_factory = core_factory
         
-        if not self.dict_dir.exists():
-            raise FileNotFoundError(f"OpenJTalk dictionary not found at {self.dict_dir}")
-        
-        # Add core_dir to PATH for DLL loading
-        if str(self.core_dir) not in os.environ["PATH"]:
-            os.environ["PATH"] = str(self.core_dir) + os.pathsep + os.environ["PATH"]
+        if core_factory is None:
+            if not self.dict_dir.exists():
+                raise FileNotFoundError(f"OpenJTalk dictionary not found at {self.dict_dir}")
             
-        acceleration_mode = AccelerationMode.GPU if use_gpu else AccelerationMode.CPU
+            # Add core_dir to PATH for DLL loading
+            if str(self.core_dir) not in os.environ["PATH"]:
+                os.environ["PATH"] = str(self.core_dir) + os.pathsep + os.environ["PATH"]
+            core_factory = create_voicevox_core
         
-        # Initialize Core
-        self.core = VoicevoxCore(
-            acceleration_mode=acceleration_mode,
-            open_jtalk_dict_dir=str(self.dict_dir)
-        )
+        # The core (OpenJTalk dictionary + voicevox_core import) is created on first use,
+        # or ahead of time by warm_up() - typically on a background thread while the LLM generates.
+        # VOICEVOX core is not documented as thread-safe: every call into it (creation, model
+        # loading, audio_query, synthesis) holds this lock, so pipeline stages and server
+        # threads sharing one engine take turns. Parallel synthesis needs separate cores
+        # (ParallelSynthesizer / worker processes).
+        self._core_factory = core_factory
+        self._core = None
+        self._core_lock = threading.RLock()
         
         # Load model is not needed for VoicevoxCore 0.15+? 
         # Typically needed to load speaker model.
@@ -32,20 +67,85 @@ class TTSEngine:
         # Let's check documentation or assume 0.15+ style:
         # core.load_model(speaker_id) is required.
         self._loaded_speakers = set()
+        
+        # Greetings, fillers and catchphrases recur, so OpenJTalk analysis is cached
+        # per (normalized text, speaker).
+        self.query_cache = LRUCache(query_cache_size, max_bytes=query_cache_bytes) if query_cache_size > 0 else None
+        self.wav_cache = wav_cache
+
+    @staticmethod
+    def normalize_text(text: str) -> str:
+        """
+        Cache key form of a text: NFKC, surrounding whitespace removed, inner whitespace collapsed.
+        """
+        return re.sub(r"\s+", " ", unicodedata.normalize("NFKC", text)).strip()
+
+    @property
+    def core(self):
+        if self._core is None:
+            with self._core_lock:
+                if self._core is None:
+                    self._core = self._core_factory(str(self.dict_dir), self.use_gpu)
+        return self._core
+
+    def warm_up(self, speaker_ids=()):
+        """
+        Create the core and load the given speakers now. Safe to run on a background thread:
+        callers that need the core meanwhile wait for it instead of loading it twice.
+        """
+        self.core
+        for speaker_id in speaker_ids:
+            self.load_speaker(speaker_id)
 
     def load_speaker(self, speaker_id: int):
         if speaker_id not in self._loaded_speakers:
-            if not self.core.is_model_loaded(speaker_id):
-                self.core.load_model(speaker_id)
-            self._loaded_speakers.add(speaker_id)
+            with self._core_lock:
+                if speaker_id not in self._loaded_speakers:
+                    if not self.core.is_model_loaded(speaker_id):
+                        self.core.load_model(speaker_id)
+                    self._loaded_speakers.add(speaker_id)
 
     def generate_audio_query(self, text: str, speaker_id: int):
-        self.load_speaker(speaker_id)
-        return self.core.audio_query(text, speaker_id)
+        """
+        Returns a fresh AudioQuery the caller may modify in place
+        (cached queries are deep-copied in and out).
+        The core gets the normalized text (the cache key), so texts sharing a key get
+        the same query whichever came first, with or without the cache.
+        """
+        text = self.normalize_text(text)
+        if self.query_cache is None:
+            self.load_speaker(speaker_id)
+            with self._core_lock:
+                return self.core.audio_query(text, speaker_id)
+        
+        key = (text, speaker_id)
+        cached = self.query_cache.get(key)
+        if cached is None:
+            self.load_speaker(speaker_id)
+            with self._core_lock:
+                query = self.core.audio_query(text, speaker_id)
+            self.query_cache.put(key, copy.deepcopy(query))
+            return query
+        return copy.deepcopy(cached)
 
     def synthesis(self, query, speaker_id: int) -> bytes:
+        """
+        Returns WAV data (bytes, or a read-only memory map when served from the wav_cache).
+        """
+        if self.wav_cache is None:
+            self.load_speaker(speaker_id)
+            with self._core_lock:
+                return self.core.synthesis(query, speaker_id)
+        
+        key = self.wav_cache.key(query, speaker_id)
+        cached = self.wav_cache.get(key)
+        if cached is not None:
+            return cached
         self.load_speaker(speaker_id)
-        return self.core.synthesis(query, speaker_id)
+        with self._core_lock:
+            wav = self.core.synthesis(query, speaker_id)
+        self.wav_cache.put(key, wav)
+        return wav
 
 if __name__ == "__main__":
     # Test
@@ -0,0 +1,262 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent))
+
+from atomic_file import write_atomic
+from think_filter import ThinkFilter
+from token_recording import TokenRecording, recording_paths
+
+PARAMETERS = ("decay_rate", "pitch_sensitivity", "speed_sensitivity")
+
+# Statistics of the delta curves over all (mora) positions of all sequences:
+#   pitch_std / pitch_mean        of the pitch deltas
+#   pitch_clip_rate               share of |pitch delta| > pitch_limit
+#   mean_slowdown / slowdown_std  of the length deltas (seconds added to each vowel)
+#   length_clip_rate              share of |length delta| > length_limit
+STATISTICS = ("pitch_std", "pitch_mean", "pitch_clip_rate", "mean_slowdown", "slowdown_std", "length_clip_rate")
+
+# {statistic: (target, tolerance)}; score = sum(((value - target) / tolerance) ** 2), lower is better
+DEFAULT_TARGETS = {
+    "pitch_std": (0.15, 0.05),
+    "pitch_clip_rate": (0.0, 0.02),
+    "mean_slowdown": (0.03, 0.01),
+    "length_clip_rate": (0.0, 0.02),
+}
+
+# VOICEVOX pitch is log F0 (about 5.0-6.5), vowel_length in seconds (about 0.05-0.15)
+PITCH_LIMIT = 0.3
+LENGTH_LIMIT = 0.15
+
+
+def load_sequences(paths: Iterable[str], mapper=None, strip_think: bool = True) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """
+    (confidence, entropy) arrays per recorded session (see token_recording), in the form
+    EmotionDynamics sees them: without the <think> block (strip_think) and, if a
+    TokenMoraMapper is given, one value per estimated mora instead of per token.
+    """
+    sequences = []
+    for path in paths:
+        with TokenRecording.load(path) as rec:
+            if strip_think or mapper is not None:
+                chunks = [{"token": token, "prob": prob, "entropy": entropy}
+                          for token, prob, entropy in zip(rec.tokens, rec.prob.tolist(), rec.entropy.tolist())]
+                if strip_think:
+                    chunks = list(ThinkFilter().filter(chunks))
+                if mapper is not None:
+                    emotions = mapper.map_tokens_to_moras(chunks)
+                    sequences.append((emotions.confidence.copy(), emotions.entropy.copy()))
+                else:
+                    sequences.append((np.array([c["prob"] for c in chunks]), np.array([c["entropy"] for c in chunks])))
+            else:
+                sequences.append((rec.prob.astype(np.float64), rec.entropy.astype(np.float64)))
+    return sequences
+
+
+def _pad(sequences: Sequence[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (sequences x longest) confidence / entropy matrices and the mask of real values.
+    Padding comes after the values, so it does not change the filtered curves.
+    """
+    length = max((len(c) for c, _ in sequences), default=0)
+    confidence = np.ones((len(sequences), length))
+    entropy = np.zeros((len(sequences), length))
+    mask = np.zeros((len(sequences), length), dtype=bool)
+    for i, (c, e) in enumerate(sequences):
+        confidence[i, :len(c)] = c
+        entropy[i, :len(e)] = e
+        mask[i, :len(c)] = True
+    return confidence, entropy, mask
+
+
+def _clip_rates(values: np.ndarray, sensitivities: np.ndarray, limit: float) -> np.ndarray:
+    """
+    Share of |s * values| > limit for every sensitivity s, from one sort of |values|.
+    """
+    if len(values) == 0:
+        return np.zeros(len(sensitivities))
+    magnitudes = np.sort(np.abs(values))
+    with np.errstate(divide="ignore"):
+        thresholds = limit / np.abs(sensitivities)  # s = 0 -> inf, never clipped
+    return (len(magnitudes) - np.searchsorted(magnitudes, thresholds, side="right")) / len(magnitudes)
+
+
+def _decay_statistics(decay_rate: float, confidence: np.ndarray, entropy: np.ndarray, mask: np.ndarray,
+                      pitch_sensitivities: np.ndarray, speed_sensitivities: np.ndarray,
+                      pitch_limit: float, length_limit: float) -> Dict[str, np.ndarray]:
+    """
+    The statistics for one decay rate and every sensitivity.
+
+    The curves of EmotionDynamics.update_batch() (from a reset state) are linear in the
+    sensitivities, pitch = pitch_sensitivity * P and length = speed_sensitivity * L with
+    P, L filtered once per decay rate for all sequences at once. So mean / std scale with
+    the sensitivity and clip rates are looked up in the sorted |P|, |L|.
+    """
+    from scipy.signal import lfilter
+
+    a = [1.0, -decay_rate]
+    pitch = lfilter([1.0], a, -(1.0 - confidence), axis=1)[mask]
+    length = lfilter([1.0], a, entropy, axis=1)[mask]
+    p, s = pitch_sensitivities, speed_sensitivities
+    return {
+        "pitch_std": np.abs(p) * (pitch.std() if len(pitch) else 0.0),
+        "pitch_mean": p * (pitch.mean() if len(pitch) else 0.0),
+        "pitch_clip_rate": _clip_rates(pitch, p, pitch_limit),
+        "mean_slowdown": s * (length.mean() if len(length) else 0.0),
+        "slowdown_std": np.abs(s) * (length.std() if len(length) else 0.0),
+        "length_clip_rate": _clip_rates(length, s, length_limit),
+    }
+
+
+# Per worker process: the padded sequences, sent once by the pool initializer
+_worker_data = None
+
+
+def _init_worker(confidence: np.ndarray, entropy: np.ndarray, mask: np.ndarray):
+    global _worker_data
+    _worker_data = (confidence, entropy, mask)
+
+
+def _worker_statistics(decay_rate: float, *args) -> Dict[str, np.ndarray]:
+    return _decay_statistics(decay_rate, *_worker_data, *args)
+
+
+def sweep(sequences: Sequence[Tuple[np.ndarray, np.ndarray]], decay_rates: Sequence[float],
+          pitch_sensitivities: Sequence[float], speed_sensitivities: Sequence[float],
+          targets: Optional[Dict[str, Tuple[float, float]]] = None, workers: int = 1,
+          pitch_limit: float = PITCH_LIMIT, length_limit: float = LENGTH_LIMIT) -> Dict[str, Any]:
+    """
+    Evaluates every (decay_rate, pitch_sensitivity, speed_sensitivity) combination over
+    the sequences (each starting from a reset EmotionDynamics) and scores it against
+    targets ({statistic: (target, tolerance)}, see STATISTICS).
+
+    Decay rates are spread over `workers` processes; the sensitivities of one decay rate
+    are evaluated together (see _decay_statistics).
+
+    Returns {"decay_rate", "pitch_sensitivity", "speed_sensitivity": the axes,
+             statistic: ndarray (decays x pitch x speed) for each of STATISTICS,
+             "score": ndarray (decays x pitch x speed)}
+    """
+    targets = DEFAULT_TARGETS if targets is None else targets
+    unknown = set(targets) - set(STATISTICS)
+    if unknown:
+        raise ValueError(f"Unknown statistics {sorted(unknown)} (one of {', '.join(STATISTICS)})")
+    decays = np.asarray(decay_rates, dtype=np.float64)
+    p = np.asarray(pitch_sensitivities, dtype=np.float64)
+    s = np.asarray(speed_sensitivities, dtype=np.float64)
+    confidence, entropy, mask = _pad(sequences)
+    args = (p, s, pitch_limit, length_limit)
+
+    if workers > 1 and len(decays) > 1:
+        with ProcessPoolExecutor(min(workers, len(decays)), initializer=_init_worker,
+                                 initargs=(confidence, entropy, mask)) as pool:
+            per_decay = list(pool.map(_worker_statistics, decays.tolist(), *([a] * len(decays) for a in args)))
+    else:
+        per_decay = [_decay_statistics(d, confidence, entropy, mask, *args) for d in decays.tolist()]
+
+    # Pitch statistics only depend on (decay, pitch), length statistics on (decay, speed):
+    # broadcast both to the full grid
+    shape = (len(decays), len(p), len(s))
+    result: Dict[str, Any] = {"decay_rate": decays, "pitch_sensitivity": p, "speed_sensitivity": s}
+    for name in STATISTICS:
+        values = np.stack([stats[name] for stats in per_decay]) if per_decay else np.empty((0, 0))
+        values = values[:, :, None] if name.startswith("pitch") else values[:, None, :]
+        result[name] = np.broadcast_to(values, shape)
+    score = np.zeros(shape)
+    for name, (target, tolerance) in targets.items():
+        score = score + ((result[name] - target) / tolerance) ** 2
+    result["score"] = score
+    return result
+
+
+def best(result: Dict[str, Any], top: int = 10) -> List[Dict[str, Any]]:
+    """
+    The `top` lowest scoring configurations of a sweep() result, best first.
+    """
+    score = result["score"]
+    order = np.argsort(score, axis=None, kind="stable")[:top]
+    rows = []
+    for flat in order.tolist():
+        i, j, k = np.unravel_index(flat, score.shape)
+        row = {"decay_rate": float(result["decay_rate"][i]),
+               "pitch_sensitivity": float(result["pitch_sensitivity"][j]),
+               "speed_sensitivity": float(result["speed_sensitivity"][k]),
+               "score": float(score[i, j, k])}
+        row.update({name: float(result[name][i, j, k]) for name in STATISTICS})
+        rows.append(row)
+    return rows
+
+
+def _values(text: str) -> np.ndarray:
+    """
+    "start:stop:count" (inclusive, evenly spaced) or "a,b,c".
+    """
+    if ":" in text:
+        start, stop, count = text.split(":")
+        return np.linspace(float(start), float(stop), int(count))
+    return np.array([float(v) for v in text.split(",")])
+
+
+def _target(text: str) -> Tuple[str, Tuple[float, float]]:
+    """
+    "statistic=target:tolerance"
+    """
+    name, value = text.split("=")
+    target, tolerance = value.split(":")
+    return name, (float(target), float(tolerance))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grid search of EmotionDynamics parameters over recorded sessions")
+    parser.add_argument("recordings", nargs="+", help="Token recordings (.tokrec files or directories, see --record of main.py)")
+    parser.add_argument("--decay", type=_values, default=_values("0.5:0.95:10"), help="decay_rate values (default 0.5:0.95:10)")
+    parser.add_argument("--pitch", type=_values, default=_values("0:1:21"), help="pitch_sensitivity values (default 0:1:21)")
+    parser.add_argument("--speed", type=_values, default=_values("0:0.3:16"), help="speed_sensitivity values (default 0:0.3:16)")
+    parser.add_argument("--target", type=_target, action="append", metavar="STAT=TARGET:TOLERANCE",
+                        help=f"Replaces the default targets; statistics: {', '.join(STATISTICS)}")
+    parser.add_argument("--pitch-limit", type=float, default=PITCH_LIMIT, help="|pitch delta| counted as clipped")
+    parser.add_argument("--length-limit", type=float, default=LENGTH_LIMIT, help="|length delta| (s) counted as clipped")
+    parser.add_argument("--moras", action="store_true",
+                        help="Expand tokens to moras as the pipeline does (reads the dictionary, slower)")
+    parser.add_argument("--keep-think", action="store_true", help="Keep the <think> block in the sequences")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes for the sweep")
+    parser.add_argument("--top", type=int, default=10, help="Configurations to print")
+    parser.add_argument("--json", metavar="FILE", help="Also write the best configurations as JSON")
+    args = parser.parse_args(argv)
+
+    paths = []
+    for item in args.recordings:
+        paths.extend(recording_paths(item) if os.path.isdir(item) else [item])
+    mapper = None
+    if args.moras:
+        from alignment import TokenMoraMapper
+        from text_processing import TextProcessor
+        mapper = TokenMoraMapper(TextProcessor())
+    sequences = load_sequences(paths, mapper=mapper, strip_think=not args.keep_think)
+    targets = dict(args.target) if args.target else DEFAULT_TARGETS
+
+    result = sweep(sequences, args.decay, args.pitch, args.speed, targets=targets, workers=args.workers,
+                   pitch_limit=args.pitch_limit, length_limit=args.length_limit)
+    rows = best(result, args.top)
+    print(f"{len(sequences)} sessions, {sum(len(c) for c, _ in sequences)} values, "
+          f"{result['score'].size} configurations")
+    print("Targets: " + ", ".join(f"{name} {target}±{tolerance}" for name, (target, tolerance) in targets.items()))
+    print(f"{'decay':>6} {'pitch':>6} {'speed':>6} | {'score':>8} | {'p_std':>6} {'p_clip':>6} {'slow':>7} {'l_clip':>6}")
+    for row in rows:
+        print(f"{row['decay_rate']:>6.3f} {row['pitch_sensitivity']:>6.3f} {row['speed_sensitivity']:>6.3f} | "
+              f"{row['score']:>8.3f} | {row['pitch_std']:>6.3f} {row['pitch_clip_rate']:>6.1%} "
+              f"{row['mean_slowdown']:>6.3f}s {row['length_clip_rate']:>6.1%}")
+    if args.json:
+        write_atomic(args.json, json.dumps({"targets": targets, "best": rows}, ensure_ascii=False, indent=2))
+    return rows
+
+
+if __name__ == "__main__":
+    main()
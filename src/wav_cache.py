@@ -0,0 +1,139 @@
+import hashlib
+import json
+import mmap
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from atomic_file import write_atomic
+
+# Bump when the key derivation changes, so old entries are never returned for new keys
+KEY_VERSION = 1
+
+def _canonical(obj: Any, tolerance: float) -> Any:
+    """
+    JSON-serializable form of an AudioQuery (dict or voicevox_core object)
+    with every float quantized to a multiple of `tolerance`.
+    """
+    if isinstance(obj, bool) or obj is None or isinstance(obj, (str, int)):
+        return obj
+    if isinstance(obj, float):
+        return round(obj / tolerance)
+    if isinstance(obj, dict):
+        return {str(k): _canonical(v, tolerance) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_canonical(v, tolerance) for v in obj]
+    if hasattr(obj, "__dict__"):
+        return _canonical(vars(obj), tolerance)
+    return str(obj)
+
+class WavCache:
+    """
+    Content-addressed on-disk cache of synthesized WAVs.
+
+    The key is a hash of the final (modulated) AudioQuery, quantized to `tolerance`,
+    plus the speaker. Files are written atomically (temp file + rename), evicted in LRU
+    order (by file mtime, refreshed on hit) once the directory exceeds max_bytes, and
+    returned as read-only memory maps (bytes-like) instead of being read into memory.
+    """
+
+    def __init__(self, directory: str = "wav_cache", max_bytes: int = 512 * 1024 * 1024, tolerance: float = 1e-3):
+        """
+        :param max_bytes: Size budget of the directory.
+        :param tolerance: Float values closer than this hash to the same key (seconds / pitch units).
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._index: "OrderedDict[str, int]" = OrderedDict()  # key -> size, oldest first
+        self._lock = threading.Lock()
+        self._scan()
+
+    def _scan(self):
+        files = []
+        for path in self.directory.glob("*/*.wav"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            files.append((st.st_mtime, path.stem, st.st_size))
+        for _, key, size in sorted(files):
+            self._index[key] = size
+            self.nbytes += size
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.wav"
+
+    def key(self, audio_query: Any, speaker_id: int) -> str:
+        canonical = {
+            "v": KEY_VERSION,
+            "speaker": speaker_id,
+            "tolerance": self.tolerance,
+            "query": _canonical(audio_query, self.tolerance),
+        }
+        data = json.dumps(canonical, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[mmap.mmap]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            os.utime(path)
+        except (OSError, ValueError):
+            # Missing (evicted by another process) or empty file
+            with self._lock:
+                self.misses += 1
+                if key in self._index:
+                    self.nbytes -= self._index.pop(key)
+            return None
+        with self._lock:
+            self.hits += 1
+            if key in self._index:
+                self._index.move_to_end(key)
+            else:
+                self._index[key] = len(data)
+                self.nbytes += len(data)
+        return data
+
+    def put(self, key: str, wav: bytes):
+        path = self._path(key)
+        path.parent.mkdir(exist_ok=True)
+        write_atomic(path, wav)
+        with self._lock:
+            self.nbytes += len(wav) - self._index.pop(key, 0)
+            self._index[key] = len(wav)
+            self._evict()
+
+    def _evict(self):
+        while self.nbytes > self.max_bytes and len(self._index) > 1:
+            key, size = self._index.popitem(last=False)
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            except OSError:
+                # Still mapped (Windows) - keep it, retry on a later eviction
+                self._index[key] = size
+                break
+            self.nbytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
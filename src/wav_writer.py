@@ -0,0 +1,106 @@
+import struct
+from typing import Optional, Tuple
+
+_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")  # RIFF / WAVE / fmt (PCM) / data: 44 bytes
+
+
+def split_wav(wav: bytes) -> Tuple[Tuple[int, int, int], memoryview]:
+    """
+    ((channels, sample width, frame rate), PCM data) of a WAV file in memory.
+    The data is a view into wav, nothing is copied.
+    """
+    view = memoryview(wav)
+    if len(view) < 12 or bytes(view[:4]) != b"RIFF" or bytes(view[8:12]) != b"WAVE":
+        raise ValueError("Not a WAV file")
+    params = None
+    pos = 12
+    while pos + 8 <= len(view):
+        chunk_id = bytes(view[pos:pos + 4])
+        size, = struct.unpack_from("<I", view, pos + 4)
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            _, channels, framerate, _, _, bits = struct.unpack_from("<HHIIHH", view, body)
+            params = (channels, bits // 8, framerate)
+        elif chunk_id == b"data":
+            if params is None:
+                raise ValueError("WAV data chunk before fmt chunk")
+            return params, view[body:body + size]
+        pos = body + size + (size & 1)
+    raise ValueError("WAV file without data chunk")
+
+
+class WavWriter:
+    """
+    Appends PCM frames to a WAV file as they are synthesized, instead of joining all of
+    the audio in memory first. A header with zero sizes is written up front and the
+    RIFF / data sizes are patched in on close(), so memory use does not depend on the
+    length of the audio.
+
+        with WavWriter("out.wav") as out:
+            for wav in wavs:
+                out.write_wav(wav)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.params: Optional[Tuple[int, int, int]] = None
+        self.data_bytes = 0
+        self._file = None
+
+    @property
+    def frames(self) -> int:
+        if self.params is None:
+            return 0
+        channels, sample_width, _ = self.params
+        return self.data_bytes // (channels * sample_width)
+
+    @property
+    def duration(self) -> float:
+        return self.frames / self.params[2] if self.params else 0.0
+
+    def _header(self) -> bytes:
+        channels, sample_width, framerate = self.params
+        block_align = channels * sample_width
+        return _HEADER.pack(b"RIFF", 36 + self.data_bytes + (self.data_bytes & 1), b"WAVE", b"fmt ", 16, 1, channels, framerate,
+                            framerate * block_align, block_align, sample_width * 8, b"data", self.data_bytes)
+
+    def write_wav(self, wav: bytes) -> int:
+        """
+        Append the frames of a complete WAV (e.g. TTSEngine.synthesis() output).
+        All parts must have the same format. Returns the number of bytes appended.
+        """
+        params, pcm = split_wav(wav)
+        if self.params is None:
+            self.params = params
+        elif params != self.params:
+            raise ValueError(f"WAV format changed from {self.params} to {params}")
+        return self.write_frames(pcm)
+
+    def write_frames(self, pcm) -> int:
+        if self.params is None:
+            raise ValueError("Format unknown: write a WAV first")
+        if self._file is None:
+            self._file = open(self.path, "wb")
+            self._file.write(self._header())
+        self._file.write(pcm)
+        self.data_bytes += len(pcm)
+        return len(pcm)
+
+    def close(self):
+        """
+        Patch the header sizes and close. Nothing is created if nothing was written.
+        """
+        if self._file is None:
+            return
+        if self.data_bytes & 1:
+            self._file.write(b"\0")  # chunks are word aligned; the pad byte is not data
+        self._file.seek(0)
+        self._file.write(self._header())
+        self._file.close()
+        self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
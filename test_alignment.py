@@ -5,8 +5,12 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent / "src"))
 
 from alignment import TokenMoraMapper
+from mora_alignment import align_sequences, split_moras
 from text_processing import TextProcessor
 
+def make_query(*phrases):
+    return {"accent_phrases": [{"moras": [{"text": t, "pitch": 5.0, "vowel_length": 0.1} for t in p]} for p in phrases]}
+
 class TestAlignment(unittest.TestCase):
     def setUp(self):
         self.tp = TextProcessor()
@@ -49,5 +53,50 @@ class TestAlignment(unittest.TestCase):
         self.assertTrue("_emotion_confidence" in mora0)
         self.assertEqual(mora0["_emotion_confidence"], 0.5)
 
+class TestMonotonicAlignment(unittest.TestCase):
+    def setUp(self):
+        self.mapper = TokenMoraMapper(TextProcessor())
+
+    def align(self, tokens, query):
+        aligned_vals = self.mapper.map_tokens_to_moras([{"token": t, "prob": 0.5} for t in tokens])
+        emotions = self.mapper.get_aligned_emotions(query, aligned_vals)
+        return [m["source_token"] for m in emotions]
+
+    def test_punctuation_does_not_shift(self):
+        # "、" and "。" count as moras in the estimate but are not AudioQuery moras,
+        # "は" is read "ワ", "今日" is "キョ", "ー"
+        tokens = ["今日", "は", "、", "いい", "天気", "です", "ね", "。"]
+        query = make_query(["キョ", "ー", "ワ"], ["イ", "イ", "テ", "ン", "キ", "デ", "ス", "ネ"])
+        self.assertEqual(self.align(tokens, query),
+                         ["今日", "今日", "は", "いい", "いい", "天気", "天気", "天気", "です", "です", "ね"])
+        self.assertEqual(self.mapper.last_alignment.moras_of_token(4), (5, 8))
+        self.assertEqual(self.mapper.last_alignment.moras_of_token(2), (-1, -1))
+
+    def test_query_longer_than_estimate(self):
+        # "90" is estimated as 2 moras, the AudioQuery reads it "キュー ジュー"
+        tokens = ["90", "点", "です"]
+        query = make_query(["キュ", "ウ", "ジュ", "ウ", "テ", "ン"], ["デ", "ス"])
+        result = self.align(tokens, query)
+        self.assertEqual(result[-2:], ["です", "です"])
+        self.assertEqual(result[4:6], ["点", "点"])
+        self.assertNotIn("__PAD__", result)
+
+    def test_english(self):
+        tokens = ["Hello", "、", "ちょっと", "待って"]
+        query = make_query(["ハ", "ロ", "ー"], ["チョ", "ッ", "ト"], ["マ", "ッ", "テ"])
+        self.assertEqual(self.align(tokens, query),
+                         ["Hello"] * 3 + ["ちょっと"] * 3 + ["待って"] * 3)
+
+    def test_split_moras(self):
+        self.assertEqual(split_moras("ちょっと"), ["チョ", "ッ", "ト"])
+        self.assertEqual(len(split_moras("ふぁいる")), TextProcessor().analyze("ファイル")["mora_count"])
+
+    def test_banded_dp_long_sequence(self):
+        # 3000 symbols with a deletion every 100 -> every remaining symbol is found
+        a = list(range(3000))
+        b = [x for x in a if x % 100 != 50]
+        a_of_b = align_sequences(a, b, band=8)
+        self.assertEqual(a_of_b.tolist(), b)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import sys
+import asyncio
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from async_llm_client import AsyncOllamaClient
+from stub_ollama import StubOllamaServer
+
+class TestAsyncOllamaClient(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.server = StubOllamaServer(["こんにちは", "。"]).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    async def test_generate_same_format_as_sync(self):
+        async with AsyncOllamaClient(self.server.url) as client:
+            self.assertTrue(await client.is_running())
+            res = await client.generate("stub", "hi")
+        self.assertEqual(res["response"], "こんにちは。")
+        self.assertEqual(res["tokens"][0], {"token": "こんにちは", "done": False, "prob": 1.0, "entropy": 0.0})
+        self.assertEqual(self.server.requests[0]["keep_alive"], "30m")
+
+    async def test_concurrency_limit(self):
+        self.server.delay = 0.05
+        async with AsyncOllamaClient(self.server.url, max_concurrency=4) as client:
+            results = await asyncio.gather(*(client.generate("stub", f"q{i}") for i in range(20)))
+        self.assertTrue(all(r["response"] == "こんにちは。" for r in results))
+        self.assertEqual(len(self.server.requests), 20)
+        self.assertLessEqual(self.server.max_in_flight, 4)
+        self.assertGreater(self.server.max_in_flight, 1)
+
+    async def test_cancellation_frees_slot(self):
+        self.server.delay = 0.5
+        async with AsyncOllamaClient(self.server.url, max_concurrency=1) as client:
+            task = asyncio.create_task(client.generate("stub", "slow"))
+            await asyncio.sleep(0.1)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+            self.server.delay = 0.0
+            res = await asyncio.wait_for(client.generate("stub", "next"), timeout=2.0)
+        self.assertEqual(res["response"], "こんにちは。")
+
+    async def test_connection_error(self):
+        url = self.server.url
+        self.server.stop()
+        async with AsyncOllamaClient(url) as client:
+            self.assertFalse(await client.is_running())
+            res = await client.generate("stub", "hi")
+        self.assertIn("error", res)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from atomic_file import atomic_open, write_atomic
+
+
+class TestAtomicFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "index.bin")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_write(self):
+        write_atomic(self.path, b"\x00\x01")
+        write_atomic(Path(self.path), "テキスト")
+        with open(self.path, encoding="utf-8") as f:
+            self.assertEqual(f.read(), "テキスト")
+        self.assertEqual(os.listdir(self.tmp.name), ["index.bin"])
+
+    def test_error_keeps_old_file(self):
+        write_atomic(self.path, b"old")
+        with self.assertRaises(RuntimeError):
+            with atomic_open(self.path) as f:
+                f.write(b"partial")
+                raise RuntimeError("interrupted")
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(), b"old")
+        self.assertEqual(os.listdir(self.tmp.name), ["index.bin"])
+
+    def test_concurrent_writers(self):
+        # Writers of the same path never share a temporary file: the result is one complete version
+        barrier = threading.Barrier(8)
+
+        def writer(i):
+            data = bytes([i]) * 200_000
+            barrier.wait()
+            with atomic_open(self.path) as f:
+                for start in range(0, len(data), 4096):
+                    f.write(data[start:start + 4096])
+
+        threads = [threading.Thread(target=writer, args=(i,)) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self.assertEqual(len(data), 200_000)
+        self.assertEqual(len(set(data)), 1)
+        self.assertEqual(os.listdir(self.tmp.name), ["index.bin"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+import wave
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from alignment import TokenMoraMapper
+from batch import BatchPipeline
+from emotion_dynamics import EmotionDynamics
+from fake_voicevox import FakeVoicevoxCore
+from llm_client import OllamaClient
+from stub_ollama import StubOllamaServer
+from text_processing import TextProcessor
+from tts_engine import TTSEngine
+
+TOKENS = ["<think>", "考え中", "</think>", "今日", "は", "いい", "天気", "です", "ね", "。"]
+
+
+def write_jsonl(path, lines):
+    with open(path, "w", encoding="utf-8") as f:
+        for line in lines:
+            f.write((line if isinstance(line, str) else json.dumps(line, ensure_ascii=False)) + "\n")
+
+
+class TestBatchPipeline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mapper = TokenMoraMapper(TextProcessor())
+
+    def setUp(self):
+        self.server = StubOllamaServer(TOKENS).start()
+        self.llm = OllamaClient(self.server.url, auto_start=False)
+        self.dir = tempfile.TemporaryDirectory()
+        self.input = os.path.join(self.dir.name, "prompts.jsonl")
+        self.out = os.path.join(self.dir.name, "out")
+
+    def tearDown(self):
+        self.llm.close()
+        self.server.stop()
+        self.dir.cleanup()
+
+    def pipeline(self, synth_delay=0.0, **kwargs):
+        tts = TTSEngine(core_factory=lambda *a, **k: FakeVoicevoxCore(*a, synth_delay=synth_delay, **k))
+        return BatchPipeline(self.llm, self.mapper, EmotionDynamics(), tts, self.out, model="stub",
+                             verbose=False, **kwargs)
+
+    def test_outputs_per_line(self):
+        write_jsonl(self.input, [{"prompt": "天気は？", "id": "weather"}, "", {"prompt": "もう一度", "speaker_id": 3}])
+        metrics = self.pipeline().run(self.input)
+        self.assertEqual((metrics["prompts"], metrics["done"], metrics["failed"]), (2, 2, []))
+        self.assertEqual(sorted(os.listdir(self.out)), ["00003.json", "00003.wav", "weather.json", "weather.wav"])
+
+        with open(os.path.join(self.out, "weather.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        self.assertEqual(meta["text"], "今日はいい天気ですね。")
+        self.assertEqual(meta["think_tokens"], 3)
+        self.assertEqual(meta["moras"][0]["token"], "今日")
+        self.assertEqual(set(meta["timings"]), {"generate", "prepare", "synthesize"})
+        with wave.open(os.path.join(self.out, "weather.wav"), "rb") as w:
+            self.assertAlmostEqual(w.getnframes() / w.getframerate(), meta["audio_seconds"])
+        self.assertAlmostEqual(metrics["audio_seconds"], 2 * meta["audio_seconds"], places=3)
+        self.assertGreater(metrics["prompts_per_min"], 0)
+        self.assertGreater(metrics["audio_per_wall_second"], 0)
+
+    def test_resume(self):
+        write_jsonl(self.input, [{"prompt": f"q{i}"} for i in range(3)])
+        self.pipeline().run(self.input)
+        os.remove(os.path.join(self.out, "00002.json"))  # interrupted before its metadata was written
+        self.server.requests.clear()
+        metrics = self.pipeline().run(self.input)
+        self.assertEqual((metrics["done"], metrics["skipped"]), (1, 2))
+        self.assertEqual([r["prompt"] for r in self.server.requests], ["q1"])
+
+    def test_failures_do_not_stop_the_batch(self):
+        write_jsonl(self.input, ["not json", {"text": "no prompt"}, {"prompt": "a", "id": "../x"},
+                                 {"prompt": "b", "id": "same"}, {"prompt": "c", "id": "same"},
+                                 {"prompt": "d", "speaker_id": "x"}, {"prompt": "e", "options": ["temperature"]}])
+        metrics = self.pipeline().run(self.input)
+        self.assertEqual(metrics["done"], 1)
+        self.assertEqual([f["line"] for f in metrics["failed"]], [1, 2, 3, 5, 6, 7])
+        self.assertTrue(all(f["error"].startswith("invalid line") for f in metrics["failed"][-2:]))
+        self.assertEqual(sorted(os.listdir(self.out)), ["same.json", "same.wav"])
+
+    def test_process_synthesis(self):
+        write_jsonl(self.input, [{"prompt": f"q{i}", "id": f"p{i}"} for i in range(4)])
+        tts = TTSEngine(core_factory=FakeVoicevoxCore)  # picklable, for the workers
+        pipeline = BatchPipeline(self.llm, self.mapper, EmotionDynamics(), tts, self.out, model="stub",
+                                 synth_backend="process", synth_workers=2, verbose=False)
+        metrics = pipeline.run(self.input)
+        self.assertEqual((metrics["done"], metrics["failed"]), (4, []))
+        self.assertEqual(metrics["stages"]["synthesize"]["backend"], "process")
+        self.assertEqual(tts.core.calls["synthesis"], 0)  # all synthesized by the workers
+        with wave.open(os.path.join(self.out, "p3.wav"), "rb") as w:
+            self.assertGreater(w.getnframes(), 0)
+
+    def test_stages_overlap(self):
+        n, delay = 6, 0.15
+        self.server.delay = delay
+        write_jsonl(self.input, [{"prompt": f"q{i}"} for i in range(n)])
+        start = time.perf_counter()
+        metrics = self.pipeline(synth_delay=delay).run(self.input)
+        elapsed = time.perf_counter() - start
+        self.assertEqual(metrics["done"], n)
+        # Sequentially at least 2 * n * delay; overlapped about (n + 1) * delay
+        self.assertLess(elapsed, 2 * n * delay * 0.8)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from llm_client import OllamaClient
+from run_benchmarks import compare, run_suite
+from stub_ollama import StubOllamaServer
+from token_streams import save_stream, stream_tokens, synthetic_stream
+
+class TestBenchmarks(unittest.TestCase):
+    def test_synthetic_stream(self):
+        chunks = synthetic_stream(120)
+        self.assertEqual(stream_tokens(chunks), 120)
+        self.assertTrue(chunks[-1]["done"])
+        self.assertEqual(chunks, synthetic_stream(120))  # deterministic
+
+    def test_replay_recording(self):
+        chunks = synthetic_stream(40)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "rec.ndjson")
+            save_stream(chunks, path)
+            with StubOllamaServer.from_recording(path) as server:
+                with OllamaClient(server.url, auto_start=False) as client:
+                    res = client.generate(model="m", prompt="p")
+        self.assertEqual(res["response"], "".join(c["response"] for c in chunks))
+        self.assertEqual(len(res["tokens"]), 41)
+        self.assertLess(res["tokens"][0]["prob"], 1.0)
+
+    def test_suite_and_compare(self):
+        report = run_suite({"tiny": synthetic_stream(60)}, repeat=1)
+        result = report["results"]["tiny"]
+        self.assertEqual(result["tokens"], 60)
+        self.assertGreater(result["moras"], 0)
+        for stage in ("llm_generate", "text_processing", "mapping", "alignment", "synthesis", "main", "main_stream"):
+            self.assertGreater(result["stages"][stage]["median_s"], 0.0)
+
+        slower = {"results": {"tiny": {"stages": {
+            name: dict(s, median_s=s["median_s"] * 2) for name, s in result["stages"].items()}}}}
+        rows = compare(slower, report, threshold=1.5)
+        self.assertEqual(len(rows), len(result["stages"]))
+        self.assertTrue(all(r["regression"] for r in rows))
+        self.assertFalse(any(r["regression"] for r in compare(report, report)))
+
+if __name__ == '__main__':
+    unittest.main()
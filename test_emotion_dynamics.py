@@ -1,5 +1,6 @@
 import unittest
 import sys
+import random
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent / "src"))
@@ -42,5 +43,43 @@ class TestEmotionDynamics(unittest.TestCase):
         self.assertEqual(res["pitch_delta"], -5.0) # Decay 1.0 so no change from prev
         self.assertEqual(res["speed_delta"], 0.5)
 
+    def test_batch_matches_scalar(self):
+        rng = random.Random(0)
+        conf = [rng.random() for _ in range(2000)]
+        ent = [rng.random() * 3.0 for _ in range(2000)]
+
+        scalar = EmotionDynamics(decay_rate=0.7, pitch_sensitivity=0.2, speed_sensitivity=0.1)
+        scalar.pitch_val = 0.3
+        expected = [scalar.update(c, e) for c, e in zip(conf, ent)]
+
+        batch = EmotionDynamics(decay_rate=0.7, pitch_sensitivity=0.2, speed_sensitivity=0.1)
+        res = batch.update_batch(conf, ent, initial_state=(0.3, 0.0))
+
+        # Bit-for-bit, not approximately
+        self.assertEqual(res["pitch_delta"].tolist(), [r["pitch_delta"] for r in expected])
+        self.assertEqual(res["speed_delta"].tolist(), [r["speed_delta"] for r in expected])
+        self.assertEqual(res["final_state"], (scalar.pitch_val, scalar.speed_val))
+
+    def test_batch_chaining(self):
+        conf = [0.2, 0.9, 0.5, 0.4, 1.0]
+        ent = [0.1, 0.0, 2.0, 0.3, 0.5]
+
+        whole = EmotionDynamics(decay_rate=0.8)
+        full = whole.update_batch(conf, ent)
+
+        chained = EmotionDynamics(decay_rate=0.8)
+        first = chained.update_batch(conf[:2], ent[:2])
+        second = chained.update_batch(conf[2:], ent[2:])
+
+        self.assertEqual(first["pitch_delta"].tolist() + second["pitch_delta"].tolist(), full["pitch_delta"].tolist())
+        self.assertEqual((chained.pitch_val, chained.speed_val), full["final_state"])
+
+    def test_batch_empty(self):
+        ed = EmotionDynamics()
+        ed.pitch_val = -1.0
+        res = ed.update_batch([], [])
+        self.assertEqual(len(res["pitch_delta"]), 0)
+        self.assertEqual(res["final_state"], (-1.0, 0.0))
+
 if __name__ == '__main__':
     unittest.main()
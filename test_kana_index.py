@@ -0,0 +1,89 @@
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from kana_index import KanaIndex, spell
+from text_processing import TextProcessor
+
+VOCABULARY = {
+    "python": "パイソン",
+    "server": "サーバー",
+    "hub": "ハブ",
+    "token": "トウクン",
+    "app": "アップ",
+    "box": "ボックス",
+    "get": "ゲット",
+    "you're": "ユーア",
+}
+
+
+class TestKanaIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = KanaIndex.from_vocabulary(VOCABULARY)
+
+    def test_lookup(self):
+        self.assertEqual(self.index.lookup(["Python", "SERVER", "numpy"]), ["パイソン", "サーバー", None])
+        # Only [a-zA-Z]+ words can be looked up
+        self.assertEqual(len(self.index), 7)
+
+    def test_batch_lookup_matches_single(self):
+        words = ["hub", "get", "gets", "a", "zzz", "toolongforthekeywidthofthisindex"] * 5
+        self.assertEqual(self.index.lookup(words), [self.index.lookup([w])[0] for w in words])
+        self.assertIsNone(self.index.lookup(["serverserver"])[0])
+
+    def test_fallback_rules(self):
+        resolved = self.index.resolve(["GPU", "http", "PythonServer", "HTTPServer", "tokens", "apps", "boxes", "numpy"])
+        self.assertEqual(resolved, [
+            "ジーピーユー",
+            "エイチティーティーピー",
+            "パイソンサーバー",
+            "エイチティーティーピーサーバー",
+            "トウクンズ",
+            "アップス",
+            "ボックスイズ",
+            None,
+        ])
+        self.assertEqual(spell("Ai"), "エーアイ")
+
+    def test_compound_needs_every_part(self):
+        self.assertIsNone(self.index.resolve(["getKana"])[0])
+
+    def test_save_and_mmap_load(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "kana_index.bin")
+            self.index.save(path)
+            loaded = KanaIndex.load(path)
+            try:
+                words = list(VOCABULARY) + ["missing"]
+                self.assertEqual(loaded.lookup(words), self.index.lookup(words))
+            finally:
+                loaded.close()
+
+    def test_open_rebuilds_invalid_file(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "kana_index.bin")
+            with open(path, "wb") as f:
+                f.write(b"garbage")
+            index = KanaIndex.open(path)
+            self.assertEqual(index.lookup(["hello"]), ["ハロー"])
+            # ... and saved again
+            loaded = KanaIndex.load(path)
+            self.assertEqual(len(loaded), len(index))
+            loaded.close()
+
+
+class TestTextProcessorEnglish(unittest.TestCase):
+    def test_get_kana_uses_fallbacks(self):
+        tp = TextProcessor()
+        self.assertEqual(tp.get_kana("GPUで"), "じーぴーゆーで")
+        self.assertEqual(tp.get_kana("Hello world"), tp.get_kana("Hello") + " " + tp.get_kana("world"))
+        readings = [a["reading"] for a in tp.analyze_tokens(["GP", "U"])]
+        self.assertEqual("".join(readings), "じーぴーゆー")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import sys
+import math
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from llm_client import OllamaClient
+from stub_ollama import StubOllamaServer
+
+class TestOllamaClient(unittest.TestCase):
+    def setUp(self):
+        self.server = StubOllamaServer(["こんにちは", "。"]).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+    def test_generate(self):
+        with OllamaClient(self.server.url, auto_start=False) as client:
+            res = client.generate("stub", "hi")
+        self.assertEqual(res["response"], "こんにちは。")
+        self.assertEqual(len(res["tokens"]), 3)  # 2 tokens + done
+
+    def test_connections_are_reused(self):
+        with OllamaClient(self.server.url) as client:  # health check + 5 generations
+            for _ in range(5):
+                client.generate("stub", "hi")
+        # one for the health check, one for the API
+        self.assertLessEqual(self.server.connections, 2)
+
+    def test_keep_alive_in_payload(self):
+        with OllamaClient(self.server.url, keep_alive="10m", auto_start=False) as client:
+            client.generate("stub", "hi")
+        with OllamaClient(self.server.url, keep_alive=None, auto_start=False) as client:
+            client.generate("stub", "hi")
+        self.assertEqual(self.server.requests[0]["keep_alive"], "10m")
+        self.assertNotIn("keep_alive", self.server.requests[1])
+
+    def test_logprobs(self):
+        def entry(token, dist):
+            return {"logprobs": [{
+                "token": token,
+                "logprob": math.log(dist[0]),
+                "top_logprobs": [{"token": f"c{i}", "logprob": math.log(p)} for i, p in enumerate(dist)]
+            }]}
+
+        self.server.chunk_extras = [entry("こんにちは", [0.25] * 4), entry("。", [1.0])]
+        with OllamaClient(self.server.url, top_logprobs=4, auto_start=False) as client:
+            tokens = client.generate("stub", "hi")["tokens"]
+            streamed = list(client.generate_stream("stub", "hi"))
+
+        self.assertTrue(self.server.requests[0]["logprobs"])
+        self.assertEqual(self.server.requests[0]["top_logprobs"], 4)
+        for toks in (tokens, streamed):
+            self.assertAlmostEqual(toks[0]["prob"], 0.25)
+            self.assertAlmostEqual(toks[0]["entropy"], math.log(4))
+            self.assertAlmostEqual(toks[1]["prob"], 1.0)
+            self.assertAlmostEqual(toks[1]["entropy"], 0.0)
+            # done chunk without logprobs keeps the neutral defaults
+            self.assertEqual((toks[2]["prob"], toks[2]["entropy"]), (1.0, 0.0))
+
+    def test_logprobs_disabled(self):
+        with OllamaClient(self.server.url, top_logprobs=0, auto_start=False) as client:
+            client.generate("stub", "hi")
+        self.assertNotIn("logprobs", self.server.requests[0])
+
+    def test_connection_error(self):
+        url = self.server.url
+        self.server.stop()
+        with OllamaClient(url, retries=1, backoff_factor=0.0, auto_start=False) as client:
+            res = client.generate("stub", "hi")
+        self.assertIn("error", res)
+
+if __name__ == '__main__':
+    unittest.main()
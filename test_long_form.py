@@ -0,0 +1,136 @@
+import io
+import itertools
+import os
+import sys
+import tempfile
+import tracemalloc
+import unittest
+import wave
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from alignment import TokenMoraMapper
+from emotion_dynamics import EmotionDynamics
+from fake_voicevox import FakeVoicevoxCore
+from long_form import LongFormPipeline
+from text_processing import TextProcessor
+from tts_engine import TTSEngine
+from wav_writer import WavWriter, split_wav
+
+TOKENS = ["昔々", "、", "ある", "村", "に", "勇敢", "な", "猫", "が", "住んで", "いました", "。",
+          " The", " cat", " loved", " Python", ".", " 毎日", "魚", "を", "食べ", "ました", "！"]
+
+
+def make_wav(frames: bytes, channels=1, sample_width=2, rate=24000) -> bytes:
+    buf = io.BytesIO()
+    with wave.open(buf, "wb") as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(rate)
+        w.writeframes(frames)
+    return buf.getvalue()
+
+
+class LazyLLM:
+    """Yields n tokens without ever holding them (a long answer)."""
+
+    def __init__(self, n, think=False):
+        self.n = n
+        self.think = think
+
+    def generate_stream(self, model, prompt, system="", options=None):
+        if self.think:
+            yield {"token": "<think>考え中</think>", "done": False, "prob": 0.5, "entropy": 0.2}
+        for t in itertools.islice(itertools.cycle(TOKENS), self.n):
+            yield {"token": t, "done": False, "prob": 0.5, "entropy": 0.2}
+        yield {"token": "", "done": True, "prob": 1.0, "entropy": 0.0}
+
+
+class TestWavWriter(unittest.TestCase):
+    def test_matches_wave_module(self):
+        parts = [bytes(range(200)), bytes(100), b"\x01\x02" * 333]
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "out.wav")
+            with WavWriter(path) as out:
+                for part in parts:
+                    out.write_wav(make_wav(part))
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), make_wav(b"".join(parts)))
+            self.assertEqual(out.frames, sum(len(p) for p in parts) // 2)
+
+    def test_odd_size_is_padded(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "out.wav")
+            with WavWriter(path) as out:
+                out.write_wav(make_wav(b"abc", sample_width=1))
+            with wave.open(path, "rb") as w:
+                self.assertEqual(w.readframes(10), b"abc")
+            self.assertEqual(os.path.getsize(path), 44 + 4)
+
+    def test_format_change_rejected(self):
+        with tempfile.TemporaryDirectory() as d:
+            with WavWriter(os.path.join(d, "out.wav")) as out:
+                out.write_wav(make_wav(bytes(4)))
+                with self.assertRaises(ValueError):
+                    out.write_wav(make_wav(bytes(4), rate=48000))
+
+    def test_nothing_written(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "out.wav")
+            WavWriter(path).close()
+            self.assertFalse(os.path.exists(path))
+
+    def test_split_wav(self):
+        params, pcm = split_wav(make_wav(b"\x10\x00\x20\x00", channels=2))
+        self.assertEqual(params, (2, 2, 24000))
+        self.assertEqual(bytes(pcm), b"\x10\x00\x20\x00")
+        with self.assertRaises(ValueError):
+            split_wav(b"not a wav file")
+
+
+class TestLongFormPipeline(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.mapper = TokenMoraMapper(TextProcessor())
+        # No AudioQuery cache: it would keep (bounded, but large) queries around
+        cls.tts = TTSEngine(core_factory=FakeVoicevoxCore, query_cache_size=0)
+
+    def run_pipeline(self, n, directory, **kwargs):
+        pipeline = LongFormPipeline(LazyLLM(n, **kwargs), self.mapper, EmotionDynamics(), self.tts,
+                                    window_tokens=40, verbose=False)
+        path = os.path.join(directory, f"{n}.wav")
+        return pipeline.run("model", "prompt", path), path
+
+    def test_output_is_valid_wav(self):
+        with tempfile.TemporaryDirectory() as d:
+            metrics, path = self.run_pipeline(100, d, think=True)
+            self.assertNotIn("error", metrics)
+            self.assertEqual(metrics["tokens"], 101)
+            self.assertEqual(metrics["think_tokens"], 1)
+            self.assertGreater(metrics["windows"], 2)
+            with wave.open(path, "rb") as w:
+                self.assertEqual(w.getnframes() * 2, metrics["bytes"])
+                self.assertAlmostEqual(w.getnframes() / w.getframerate(), metrics["audio_seconds"])
+
+    def test_peak_memory_does_not_grow_with_length(self):
+        with tempfile.TemporaryDirectory() as d:
+            self.run_pipeline(100, d)  # converters, dictionaries, caches
+            tracemalloc.start()
+            try:
+                tracemalloc.reset_peak()
+                self.run_pipeline(300, d)
+                short_peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.reset_peak()
+                _, path = self.run_pipeline(1200, d)
+                long_peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+            # 4x the answer, same peak (one window); far below the audio of the answer
+            self.assertLess(long_peak, short_peak * 1.2)
+            self.assertLess(long_peak, os.path.getsize(path) / 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import sys
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from mora_emotions import MoraEmotions, PAD_TOKEN
+
+class TestMoraEmotions(unittest.TestCase):
+    def setUp(self):
+        # "こん"(2 moras) "、"(0) "にちは"(3)
+        self.emo = MoraEmotions.from_tokens(["こん", "、", "にちは"], [0.5, 0.9, 0.8], [0.1, 0.0, 0.3], [2, 0, 3])
+
+    def test_expand(self):
+        self.assertEqual(len(self.emo), 5)
+        self.assertEqual(self.emo.token_index.tolist(), [0, 0, 2, 2, 2])
+        self.assertEqual(self.emo.confidence.tolist(), [0.5, 0.5, 0.8, 0.8, 0.8])
+        self.assertEqual(self.emo[2], {"source_token": "にちは", "confidence": 0.8, "entropy": 0.3})
+
+    def test_padding_is_virtual(self):
+        padded = self.emo.padded(7)
+        self.assertEqual(len(padded), 7)
+        self.assertTrue(np.shares_memory(padded.token_index, self.emo.token_index))
+        self.assertEqual(padded.confidence.tolist()[-2:], [1.0, 1.0])
+        self.assertEqual(padded.entropy.tolist()[-2:], [0.0, 0.0])
+        self.assertEqual(padded[-1]["source_token"], PAD_TOKEN)
+
+    def test_truncate_and_slice_share_memory(self):
+        self.assertEqual(len(self.emo.padded(3)), 3)
+        part = self.emo[1:4]
+        self.assertEqual(part.confidence.tolist(), [0.5, 0.8, 0.8])
+        self.assertTrue(np.shares_memory(part.confidence, self.emo.confidence))
+        # Slice reaching into the padding
+        tail = self.emo.padded(7)[4:7]
+        self.assertEqual([m["source_token"] for m in tail], ["にちは", PAD_TOKEN, PAD_TOKEN])
+
+    def test_token_runs(self):
+        runs = self.emo.padded(6).token_runs()
+        self.assertEqual([(r["token"], r["start"], r["stop"]) for r in runs],
+                         [("こん", 0, 2), ("にちは", 2, 5), (PAD_TOKEN, 5, 6)])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import unittest
+import sys
+import copy
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from emotion_dynamics import EmotionDynamics
+from modulation import apply_emotion_modulation
+from mora_emotions import MoraEmotions
+from mora_view import MoraView
+
+def mora(text, pitch=5.0, vowel_length=0.1, consonant_length=None):
+    return {"text": text, "consonant": None, "consonant_length": consonant_length,
+            "vowel": "a", "vowel_length": vowel_length, "pitch": pitch}
+
+def dict_query():
+    pause = {"text": "、", "consonant": None, "consonant_length": None, "vowel": "pau", "vowel_length": 0.3, "pitch": 0.0}
+    return {"accent_phrases": [
+        {"moras": [mora("コ", consonant_length=0.05), mora("ン"), mora("ニ")], "accent": 1, "pause_mora": pause},
+        {"moras": [mora("チ", pitch=0.0), mora("ワ", vowel_length=0.02)], "accent": 1, "pause_mora": None},
+    ], "speedScale": 1.0}
+
+def to_objects(obj):
+    if isinstance(obj, dict):
+        return SimpleNamespace(**{k: to_objects(v) for k, v in obj.items()})
+    if isinstance(obj, list):
+        return [to_objects(v) for v in obj]
+    return obj
+
+class TestMoraView(unittest.TestCase):
+    def test_flatten(self):
+        view = MoraView(dict_query())
+        self.assertEqual(len(view), 5)
+        self.assertEqual(view.texts, ["コ", "ン", "ニ", "チ", "ワ"])
+        self.assertEqual(view.pause.tolist(), [False, False, False, True, False, False])
+        self.assertEqual(view.speech_index.tolist(), [0, 1, 2, 4, 5])
+        self.assertAlmostEqual(view.consonant_length[0], 0.05)
+        self.assertTrue(np.isnan(view.consonant_length[1]))
+
+    def test_apply_and_write_back(self):
+        for query in (dict_query(), to_objects(dict_query())):
+            view = MoraView(query)
+            n = view.apply(np.array([0.5, -0.5, 0.0, 1.0, 0.1]), np.array([0.0, 0.05, 0.0, 0.0, -0.5]))
+            self.assertEqual(n, 5)
+            view.write_back()
+            flat = MoraView(query)
+            # unvoiced (pitch 0) stays unvoiced, lengths are clamped, the pause is untouched
+            np.testing.assert_allclose(flat.pitch, [5.5, 4.5, 5.0, 0.0, 0.0, 5.1])
+            np.testing.assert_allclose(flat.vowel_length, [0.1, 0.15, 0.1, 0.3, 0.1, 0.01])
+
+    def test_missing_values_skipped(self):
+        query = dict_query()
+        query["accent_phrases"][0]["moras"][1]["pitch"] = None
+        view = MoraView(query)
+        view.apply(np.ones(5), np.zeros(5))
+        view.write_back()
+        self.assertIsNone(query["accent_phrases"][0]["moras"][1]["pitch"])
+        self.assertEqual(query["accent_phrases"][0]["moras"][0]["pitch"], 6.0)
+
+    def test_short_deltas(self):
+        view = MoraView(dict_query())
+        self.assertEqual(view.apply([1.0, 1.0], [0.0, 0.0]), 2)
+        np.testing.assert_allclose(view.pitch[view.speech_index], [6.0, 6.0, 5.0, 0.0, 5.0])
+
+    def test_modulation_matches_per_mora_loop(self):
+        query = dict_query()
+        expected = copy.deepcopy(query)
+        emotions = MoraEmotions.from_tokens(["a", "b"], [0.3, 0.9], [1.0, 0.2], [3, 2])
+        dynamics = EmotionDynamics(decay_rate=0.7, pitch_sensitivity=0.2, speed_sensitivity=0.1)
+
+        state = EmotionDynamics(decay_rate=0.7, pitch_sensitivity=0.2, speed_sensitivity=0.1).update_batch(
+            emotions.confidence, emotions.entropy)
+        moras = [m for p in expected["accent_phrases"] for m in p["moras"]]
+        for m, dp, ds in zip(moras, state["pitch_delta"], state["speed_delta"]):
+            if m["pitch"] != 0.0:
+                m["pitch"] += dp
+            m["vowel_length"] = max(0.01, m["vowel_length"] + ds)
+
+        self.assertEqual(apply_emotion_modulation(query, emotions, dynamics, verbose=False), 5)
+        got = [m for p in query["accent_phrases"] for m in p["moras"]]
+        for g, e in zip(got, moras):
+            self.assertAlmostEqual(g["pitch"], e["pitch"])
+            self.assertAlmostEqual(g["vowel_length"], e["vowel_length"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import sys
+import os
+import socket
+import time
+from pathlib import Path
+from unittest import mock
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from ollama_server import OllamaServer
+from stub_ollama import StubOllamaServer
+
+FAKE_OLLAMA = [sys.executable, str(Path(__file__).parent / "benchmarks" / "fake_ollama.py")]
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+class TestOllamaServer(unittest.TestCase):
+    def test_already_running(self):
+        with StubOllamaServer() as stub:
+            server = OllamaServer(stub.url, executable="does-not-exist")
+            self.assertFalse(server.ensure_running())
+            self.assertIsNone(server.process)
+            self.assertEqual(server.metrics["probes"], 1)
+            server.close()
+
+    def test_start_probe_and_warm(self):
+        url = f"http://127.0.0.1:{free_port()}"
+        with mock.patch.dict(os.environ, {"FAKE_OLLAMA_STARTUP_DELAY": "0.3"}):
+            server = OllamaServer(url, executable=FAKE_OLLAMA, start_timeout=10)
+            try:
+                self.assertTrue(server.ensure_running())
+                self.assertTrue(server.is_ready())
+                self.assertTrue(server.warm("m"))
+            finally:
+                server.stop()
+                server.close()
+        self.assertGreaterEqual(server.metrics["ready_time"], 0.3)
+        self.assertLess(server.metrics["ready_time"], 5.0)
+        self.assertGreater(server.metrics["probes"], 2)  # backoff, not one long sleep
+        self.assertIsNotNone(server.metrics["warm_time"])
+        self.assertIsNotNone(server.process.poll())
+
+    def test_process_exit_fails_fast(self):
+        url = f"http://127.0.0.1:{free_port()}"
+        with mock.patch.dict(os.environ, {"FAKE_OLLAMA_EXIT_CODE": "3"}):
+            server = OllamaServer(url, executable=FAKE_OLLAMA, start_timeout=30)
+            start = time.perf_counter()
+            with self.assertRaisesRegex(RuntimeError, "code 3"):
+                server.ensure_running()
+            server.close()
+        self.assertLess(time.perf_counter() - start, 10)
+
+    def test_missing_executable(self):
+        server = OllamaServer(f"http://127.0.0.1:{free_port()}", executable="no-such-ollama-binary")
+        with self.assertRaises(FileNotFoundError):
+            server.ensure_running()
+        server.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+import sys
+import functools
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from fake_voicevox import FakeVoicevoxCore
+from parallel_synthesis import ParallelSynthesizer, split_audio_query
+from tts_engine import TTSEngine
+
+TEXT = "あいうえおかきくけこ、さしすせそたちつてと。なにぬねのはひふへほ！まみむめもやゆよ、らりるれろわをん。"
+
+class TestParallelSynthesis(unittest.TestCase):
+    def setUp(self):
+        self.tts = TTSEngine(core_factory=FakeVoicevoxCore)
+        self.query = self.tts.generate_audio_query(TEXT, 1)
+        # Modulated values must survive the split
+        for i, mora in enumerate(m for p in self.query["accent_phrases"] for m in p["moras"]):
+            mora["pitch"] += i * 0.01
+            mora["vowel_length"] += i * 0.001
+
+    def test_split_at_pauses(self):
+        chunks = split_audio_query(self.query, min_moras=8)
+        self.assertEqual(len(chunks), 5)
+        self.assertEqual(chunks[0]["prePhonemeLength"], 0.1)
+        self.assertEqual(chunks[0]["postPhonemeLength"], 0.0)
+        self.assertEqual(chunks[-1]["prePhonemeLength"], 0.0)
+        self.assertEqual(chunks[-1]["postPhonemeLength"], 0.1)
+        self.assertEqual(sum(len(c["accent_phrases"]) for c in chunks), len(self.query["accent_phrases"]))
+
+    def test_short_query_not_split(self):
+        query = self.tts.generate_audio_query("あい、う", 1)
+        self.assertEqual(split_audio_query(query, min_moras=8), [query])
+
+    def test_stitched_equals_serial(self):
+        serial = self.tts.synthesis(self.query, 1)
+        core = functools.partial(FakeVoicevoxCore, synth_delay=0.01)
+        with ParallelSynthesizer(workers=3, core_factory=core, min_moras=8) as pool:
+            parallel = pool.synthesis(self.query, 1)
+        self.assertEqual(parallel, serial)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+import asyncio
+import base64
+import io
+import json
+import sys
+import unittest
+import wave
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from aiohttp import WSMsgType
+from aiohttp.test_utils import TestClient, TestServer
+
+from async_llm_client import AsyncOllamaClient
+from fake_voicevox import FakeVoicevoxCore
+from server import SpeechServer
+from stub_ollama import StubOllamaServer
+from text_processing import TextProcessor
+from tts_engine import TTSEngine
+
+TOKENS = ["<think>", "考え中", "</think>", "今日", "は", "いい", "天気", "です", "ね", "。",
+          "猫", "が", "好き", "です", "！"]
+
+
+class FailingCore(FakeVoicevoxCore):
+    """
+    Speaker 99 is unknown; for speaker 98 the second synthesis fails.
+    """
+
+    def synthesis(self, query, speaker_id):
+        if speaker_id == 99:
+            raise RuntimeError("unknown speaker 99")
+        wav = super().synthesis(query, speaker_id)
+        if speaker_id == 98 and self.calls["synthesis"] == 2:
+            raise RuntimeError("synthesis failed")
+        return wav
+
+
+class TestSpeechServer(unittest.IsolatedAsyncioTestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tp = TextProcessor()
+        cls.tts = TTSEngine(core_factory=FakeVoicevoxCore)
+
+    def setUp(self):
+        self.ollama = StubOllamaServer(TOKENS).start()
+
+    def tearDown(self):
+        self.ollama.stop()
+
+    async def client(self, tts=None, **kwargs) -> TestClient:
+        server = SpeechServer(AsyncOllamaClient(self.ollama.url), self.tp, tts or self.tts, **kwargs)
+        client = TestClient(TestServer(server.app()))
+        await client.start_server()
+        self.addAsyncCleanup(client.close)
+        return client
+
+    async def post(self, client, **request):
+        response = await client.post("/speak", json={"prompt": "天気は？", **request})
+        if response.status != 200:
+            return response, []
+        return response, [json.loads(line) for line in (await response.text()).splitlines()]
+
+    async def test_http_segments(self):
+        client = await self.client()
+        response, messages = await self.post(client)
+        self.assertEqual(response.status, 200)
+        self.assertEqual([m["type"] for m in messages], ["start", "segment", "segment", "done"])
+        first = messages[1]
+        self.assertEqual(first["text"], "今日はいい天気ですね。")
+        self.assertTrue(first["moras"])
+        self.assertTrue({"text", "token", "confidence", "entropy", "pitch", "vowel_length"} <= set(first["moras"][0]))
+        self.assertEqual(first["moras"][0]["token"], "今日")
+        with wave.open(io.BytesIO(base64.b64decode(first["audio"])), "rb") as w:
+            self.assertGreater(w.getnframes(), 0)
+        self.assertEqual(messages[-1]["metrics"]["segments"], 2)
+        self.assertNotIn("考え中", "".join(m.get("text", "") for m in messages))
+
+    async def test_pcm_format(self):
+        client = await self.client()
+        _, messages = await self.post(client, format="pcm")
+        segment = messages[1]
+        self.assertEqual((segment["channels"], segment["sample_width"], segment["sample_rate"]), (1, 2, 24000))
+        self.assertFalse(base64.b64decode(segment["audio"]).startswith(b"RIFF"))
+
+    async def test_bad_request(self):
+        client = await self.client()
+        response = await client.post("/speak", json={"text": "no prompt"})
+        self.assertEqual(response.status, 400)
+        response, _ = await self.post(client, format="mp3")
+        self.assertEqual(response.status, 400)
+
+    async def test_bad_request_holds_no_slot(self):
+        client = await self.client(max_sessions=1, max_queue=0)
+        for bad in ({"options": [1, 2]}, {"speaker_id": "x"}, {"options": "temperature"}):
+            response, _ = await self.post(client, **bad)
+            self.assertEqual(response.status, 400)
+        health = await (await client.get("/health")).json()
+        self.assertEqual((health["active"], health["waiting"]), (0, 0))
+        response, messages = await self.post(client)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(messages[-1]["type"], "done")
+
+    async def test_synthesis_failure(self):
+        client = await self.client(tts=TTSEngine(core_factory=FailingCore))
+        _, messages = await self.post(client, speaker_id=99)
+        self.assertEqual([m["type"] for m in messages], ["start", "error"])
+        self.assertIn("unknown speaker", messages[-1]["error"])
+        # A later sentence that fails is skipped and reported
+        _, messages = await self.post(client, speaker_id=98)
+        self.assertEqual([m["type"] for m in messages], ["start", "segment", "done"])
+        self.assertEqual((messages[-1]["metrics"]["segments"], messages[-1]["metrics"]["skipped"]), (1, 1))
+        health = await (await client.get("/health")).json()
+        self.assertEqual((health["served"], health["failed"], health["active"]), (1, 1, 0))
+
+    async def test_nothing_to_speak(self):
+        self.ollama.tokens = ["<think>", "考え中", "</think>", "---"]
+        client = await self.client()
+        _, messages = await self.post(client)
+        self.assertEqual(messages[-1]["type"], "error")
+
+    async def test_websocket(self):
+        client = await self.client()
+        async with client.ws_connect("/ws") as ws:
+            for _ in range(2):  # several requests on one connection
+                await ws.send_json({"prompt": "天気は？", "speaker_id": 3})
+                kinds = []
+                while True:
+                    msg = await ws.receive()
+                    if msg.type == WSMsgType.BINARY:
+                        self.assertEqual(len(msg.data), kinds[-1]["audio_bytes"])
+                        kinds.append("audio")
+                        continue
+                    data = json.loads(msg.data)
+                    kinds.append(data)
+                    if data["type"] in ("done", "error"):
+                        break
+                self.assertEqual([k if k == "audio" else k["type"] for k in kinds],
+                                 ["segment", "audio", "segment", "audio", "done"])
+
+    async def test_busy_rejected(self):
+        self.ollama.delay = 0.5
+        client = await self.client(max_sessions=1, max_queue=0)
+        first = asyncio.create_task(self.post(client))
+        await asyncio.sleep(0.2)
+        response, _ = await self.post(client)
+        self.assertEqual(response.status, 503)
+        self.assertIn("Retry-After", response.headers)
+        response, messages = await first
+        self.assertEqual(messages[-1]["type"], "done")
+        health = await (await client.get("/health")).json()
+        self.assertEqual((health["served"], health["rejected"], health["active"]), (1, 1, 0))
+
+    async def test_sessions_queue(self):
+        self.ollama.delay = 0.1
+        client = await self.client(max_sessions=2, max_queue=8)
+        results = await asyncio.gather(*(self.post(client) for _ in range(6)))
+        self.assertTrue(all(messages[-1]["type"] == "done" for _, messages in results))
+        self.assertLessEqual(self.ollama.max_in_flight, 2)
+        self.assertEqual(len(self.ollama.requests), 6)
+
+    async def test_llm_error(self):
+        url = self.ollama.url
+        self.ollama.stop()
+        server = SpeechServer(AsyncOllamaClient(url), self.tp, self.tts)
+        client = TestClient(TestServer(server.app(warm_up=False)))
+        await client.start_server()
+        try:
+            _, messages = await self.post(client)
+        finally:
+            await client.close()
+            self.ollama = StubOllamaServer(TOKENS).start()
+        self.assertEqual(messages[-1]["type"], "error")
+        self.assertEqual(server.stats["failed"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+import os
+import sys
+import threading
+import time
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from stage_pipeline import Stage, StagePipeline
+
+
+def square(x):
+    return x * x
+
+
+def pid(x):
+    return os.getpid()
+
+
+class TestStagePipeline(unittest.TestCase):
+    def test_inline_stages(self):
+        buffer = []
+
+        def pairs(x):
+            buffer.append(x)
+            if len(buffer) == 2:
+                yield tuple(buffer)
+                buffer.clear()
+
+        pipeline = StagePipeline(range(5), [
+            Stage("drop_odd", lambda x: x if x % 2 == 0 else None),
+            Stage("pairs", pairs, expand=True, flush=lambda: [tuple(buffer)] if buffer else []),
+        ])
+        self.assertEqual(list(pipeline.run()), [(0, 2), (4,)])
+        self.assertEqual(pipeline.metrics["drop_odd"]["items"], 5)
+        self.assertEqual(pipeline.metrics["pairs"]["items"], 3)
+
+    def test_thread_pool_keeps_order(self):
+        def slow(x):
+            time.sleep(0.01 * (5 - x % 5))
+            return x
+
+        pipeline = StagePipeline(range(20), [Stage("slow", slow, backend="thread", workers=4)])
+        start = time.perf_counter()
+        self.assertEqual(list(pipeline.run()), list(range(20)))
+        self.assertLess(time.perf_counter() - start, 0.6 * 0.01 * sum(5 - x % 5 for x in range(20)))
+
+    def test_process_backend(self):
+        pipeline = StagePipeline(range(6), [Stage("square", square, backend="process", workers=2)])
+        self.assertEqual(list(pipeline.run()), [x * x for x in range(6)])
+        pipeline = StagePipeline(range(4), [Stage("pid", pid, backend="process")])
+        self.assertNotIn(os.getpid(), set(pipeline.run()))
+
+    def test_backpressure(self):
+        produced = []
+
+        def source():
+            for i in range(100):
+                produced.append(i)
+                yield i
+
+        pipeline = StagePipeline(source(), [Stage("a", lambda x: x, backend="thread", queue_size=2)], queue_size=2)
+        results = pipeline.run()
+        self.assertEqual(next(results), 0)
+        time.sleep(0.2)
+        # queue in front of "a" + the one held by "a" + queue to the caller + the one held by the source
+        self.assertLessEqual(len(produced), 2 + 1 + 2 + 1 + 1)
+        results.close()
+        time.sleep(0.1)  # the blocked source notices the stop
+        self.assertGreater(pipeline.metrics["source"]["wait_output"], 0.1)
+
+    def test_error_is_raised(self):
+        def fail(x):
+            if x == 3:
+                raise ValueError("bad item")
+            return x
+
+        pipeline = StagePipeline(range(10), [Stage("fail", fail, backend="thread")])
+        with self.assertRaisesRegex(ValueError, "bad item"):
+            list(pipeline.run())
+
+    def test_close_stops_source(self):
+        stopped = threading.Event()
+
+        def source():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                stopped.set()
+
+        pipeline = StagePipeline(source(), [Stage("a", lambda x: x, backend="thread")])
+        for x in pipeline.run():
+            if x == 5:
+                break
+        self.assertTrue(stopped.wait(1.0))
+
+    def test_metrics_show_bottleneck(self):
+        pipeline = StagePipeline(range(10), [
+            Stage("fast", lambda x: x, backend="thread"),
+            Stage("slow", lambda x: time.sleep(0.02) or x, backend="thread"),
+        ])
+        list(pipeline.run())
+        m = pipeline.metrics
+        self.assertGreater(m["slow"]["busy"], 0.15)
+        self.assertGreater(m["fast"]["wait_output"], 0.05)  # stalled behind "slow"
+        self.assertGreaterEqual(m["slow"]["max_queue_depth"], 1)
+        self.assertIn("slow", pipeline.report())
+
+    def test_invalid_stages(self):
+        with self.assertRaises(ValueError):
+            Stage("a", square, backend="gpu")
+        with self.assertRaises(ValueError):
+            Stage("a", square, backend="process", flush=list)
+        with self.assertRaises(ValueError):
+            StagePipeline([], [Stage("a", square), Stage("a", square)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import sys
+import subprocess
+import threading
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from startup import Startup
+from fake_voicevox import FakeVoicevoxCore
+from llm_client import OllamaClient
+from stub_ollama import StubOllamaServer
+from tts_engine import TTSEngine
+
+class SlowCore(FakeVoicevoxCore):
+    created = 0
+
+    def __init__(self, *args, **kwargs):
+        time.sleep(0.1)
+        SlowCore.created += 1
+        super().__init__(*args, **kwargs)
+
+class TestStartup(unittest.TestCase):
+    def test_background_steps(self):
+        startup = Startup()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+
+        startup.run("slow", slow, background=True)
+        self.assertEqual(startup.run("fast", lambda x: x * 2, 21), 42)
+        started.wait(5)
+        self.assertIsNone(startup.steps["slow"]["duration"])
+        self.assertIn("running", startup.report())
+        release.set()
+        startup.wait("slow")
+        self.assertIsNotNone(startup.steps["slow"]["duration"])
+        self.assertTrue(startup.steps["slow"]["background"])
+
+    def test_background_error(self):
+        def fail():
+            raise RuntimeError("no dictionary")
+
+        startup = Startup()
+        startup.run("tts", fail, background=True)
+        with self.assertRaises(RuntimeError):
+            startup.wait("tts")
+        self.assertIn("FAILED: no dictionary", startup.report())
+
+    def test_tts_core_is_lazy(self):
+        SlowCore.created = 0
+        tts = TTSEngine(core_factory=SlowCore)
+        self.assertEqual(SlowCore.created, 0)
+
+        warm = threading.Thread(target=tts.warm_up, args=([1],))
+        warm.start()
+        time.sleep(0.02)
+        # Waits for the warm-up instead of creating a second core
+        query = tts.generate_audio_query("あいう", 1)
+        warm.join()
+        self.assertEqual(SlowCore.created, 1)
+        self.assertTrue(tts.core.is_model_loaded(1))
+        self.assertEqual(len(query["accent_phrases"][0]["moras"]), 3)
+
+    def test_heavy_imports_deferred(self):
+        code = ("import sys; sys.path.insert(0, 'src'); import main; "
+                "print(sorted(m for m in ('pykakasi', 'alkana', 'scipy', 'voicevox_core') if m in sys.modules))")
+        out = subprocess.run([sys.executable, "-c", code], cwd=Path(__file__).parent,
+                             capture_output=True, text=True, check=True).stdout
+        self.assertEqual(out.strip(), "[]")
+
+    def test_preload_model(self):
+        with StubOllamaServer() as server:
+            with OllamaClient(server.url, keep_alive=-1, auto_start=False) as client:
+                self.assertTrue(client.preload("m"))
+            payload = server.requests[0]
+        self.assertEqual(payload["model"], "m")
+        self.assertEqual(payload["prompt"], "")
+        self.assertEqual(payload["keep_alive"], -1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+import unittest
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from alignment import TokenMoraMapper
+from emotion_dynamics import EmotionDynamics
+from streaming import SentenceSegmenter, StreamingPipeline
+from text_processing import TextProcessor
+
+
+def feed_all(tokens):
+    seg = SentenceSegmenter()
+    segments = []
+    for t in tokens:
+        segments.extend(seg.feed({"token": t, "prob": 0.5, "entropy": 0.1}))
+    segments.extend(seg.flush())
+    return ["".join(c["token"] for c in s) for s in segments]
+
+
+class FakeLLM:
+    def __init__(self, tokens, delay=0.0):
+        self.tokens = tokens
+        self.delay = delay
+
+    def generate_stream(self, model, prompt, system="", options=None):
+        for t in self.tokens:
+            time.sleep(self.delay)
+            yield {"token": t, "done": False, "prob": 0.5, "entropy": 0.2}
+        yield {"token": "", "done": True, "prob": 1.0, "entropy": 0.0}
+
+
+class FakeTTS:
+    """AudioQuery with one mora per character, wav = the modulated pitches."""
+
+    def generate_audio_query(self, text, speaker_id):
+        moras = [{"text": c, "pitch": 5.0, "vowel_length": 0.1} for c in text if c.strip() and c not in "。、"]
+        return {"accent_phrases": [{"moras": moras}], "speedScale": 1.0}
+
+    def synthesis(self, query, speaker_id):
+        return [m["pitch"] for p in query["accent_phrases"] for m in p["moras"]]
+
+
+class TestSentenceSegmenter(unittest.TestCase):
+    def test_japanese(self):
+        self.assertEqual(feed_all(["こんにちは", "。", "元気", "です", "か？", "はい"]),
+                         ["こんにちは。", "元気ですか？", "はい"])
+
+    def test_split_inside_token(self):
+        self.assertEqual(feed_all(["です。そ", "れで"]), ["です。", "それで"])
+
+    def test_english_requires_space(self):
+        self.assertEqual(feed_all(["Pi is 3", ".", "14. It", " is"]), ["Pi is 3.14.", " It is"])
+        self.assertEqual(feed_all(["Hello", ".", " World"]), ["Hello.", " World"])
+
+    def test_closers_stay_with_sentence(self):
+        self.assertEqual(feed_all(["「そうだ。", "」と", "言った。"]), ["「そうだ。」", "と言った。"])
+
+    def test_max_tokens_cuts_long_sentence(self):
+        seg = SentenceSegmenter(max_tokens=3)
+        segments = []
+        for t in ["a", "b", "c", "d", "e。", "f"]:
+            segments.extend(seg.feed({"token": t}))
+        segments.extend(seg.flush())
+        self.assertEqual(["".join(c["token"] for c in s) for s in segments], ["abc", "de。", "f"])
+
+    def test_split_token_keeps_emotion(self):
+        seg = SentenceSegmenter()
+        out = seg.feed({"token": "だ。次", "prob": 0.3, "entropy": 0.4})
+        self.assertEqual(out[0][0]["token"], "だ。")
+        self.assertEqual(out[0][0]["prob"], 0.3)
+        self.assertEqual(seg.flush()[0][0]["entropy"], 0.4)
+
+
+class TestStreamingPipeline(unittest.TestCase):
+    def test_segments_in_order_with_carried_state(self):
+        llm = FakeLLM(["あい", "う。", "---\n", "かき", "く。"])
+        dynamics = EmotionDynamics(decay_rate=1.0, pitch_sensitivity=1.0, speed_sensitivity=0.0)
+        pipeline = StreamingPipeline(llm, TokenMoraMapper(TextProcessor()), dynamics, FakeTTS(), verbose=False)
+
+        results = list(pipeline.run("model", "prompt"))
+
+        self.assertEqual([r["text"] for r in results], ["あいう。", "かきく。"])
+        self.assertEqual([r["index"] for r in results], [0, 1])
+        # decay 1.0 -> pitch keeps accumulating across the sentence boundary
+        self.assertAlmostEqual(results[0]["wav"][-1], 5.0 - 1.5)
+        self.assertAlmostEqual(results[1]["wav"][0], 5.0 - 2.0)
+        self.assertEqual(pipeline.metrics["segments"], 2)
+        self.assertEqual(pipeline.metrics["tokens"], 5)
+
+    def test_first_audio_before_generation_ends(self):
+        llm = FakeLLM(["はい。"] + ["あ"] * 10 + ["。"], delay=0.02)
+        # Dictionary / scipy are loaded lazily; main.py warms them up while the LLM starts
+        tp = TextProcessor()
+        tp.warm_up()
+        dynamics = EmotionDynamics()
+        dynamics.warm_up()
+        pipeline = StreamingPipeline(llm, TokenMoraMapper(tp), dynamics, FakeTTS(), verbose=False)
+
+        results = list(pipeline.run("model", "prompt"))
+
+        self.assertEqual(len(results), 2)
+        self.assertLess(pipeline.metrics["time_to_first_audio"], pipeline.metrics["generation_time"])
+
+    def test_thinking_not_spoken(self):
+        llm = FakeLLM(["<th", "ink>考え", "中。</", "think>\n", "はい。"])
+        pipeline = StreamingPipeline(llm, TokenMoraMapper(TextProcessor()), EmotionDynamics(), FakeTTS(), verbose=False)
+
+        results = list(pipeline.run("model", "prompt"))
+
+        self.assertEqual([r["text"] for r in results], ["はい。"])
+        self.assertIsNotNone(pipeline.metrics["time_to_first_visible"])
+        self.assertEqual(pipeline.metrics["think_tokens"], 3)
+
+    def test_error(self):
+        class ErrorLLM:
+            def generate_stream(self, *args, **kwargs):
+                yield {"error": "boom"}
+
+        pipeline = StreamingPipeline(ErrorLLM(), TokenMoraMapper(TextProcessor()), EmotionDynamics(), FakeTTS(), verbose=False)
+        self.assertEqual(list(pipeline.run("model", "prompt")), [{"error": "boom"}])
+
+
+if __name__ == '__main__':
+    unittest.main()
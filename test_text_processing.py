@@ -0,0 +1,116 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from lru_cache import LRUCache
+from text_processing import TextProcessor
+
+class TestLRUCache(unittest.TestCase):
+    def test_eviction_order(self):
+        cache = LRUCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        cache.get("a")      # "b" is now least recently used
+        cache.put("c", 3)
+
+        self.assertIn("a", cache)
+        self.assertNotIn("b", cache)
+        self.assertEqual(cache.evictions, 1)
+
+    def test_counters(self):
+        cache = LRUCache(4)
+        cache.get("x")
+        cache.put("x", 1)
+        cache.get("x")
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertAlmostEqual(stats["hit_rate"], 0.5)
+
+class TestReadingCache(unittest.TestCase):
+    def test_repeated_token_hits_cache(self):
+        tp = TextProcessor()
+        first = tp.analyze("です")
+        second = tp.analyze("です")
+
+        self.assertEqual(first, second)
+        self.assertEqual(tp.cache.hits, 1)
+        self.assertEqual(tp.cache.misses, 1)
+
+    def test_disabled(self):
+        tp = TextProcessor(cache_size=0)
+        self.assertIsNone(tp.cache)
+        self.assertEqual(tp.analyze("ちょっと")["mora_count"], 3)
+
+    def test_persist_and_prewarm(self):
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "reading_cache.json")
+            tp = TextProcessor(cache_path=path)
+            expected = tp.analyze("Hello")
+            tp.save_cache()
+
+            warmed = TextProcessor(cache_path=path)
+            self.assertEqual(len(warmed.cache), 1)
+            self.assertEqual(warmed.analyze("Hello"), expected)
+            self.assertEqual(warmed.cache.misses, 0)
+
+    def test_repeated_segment_hits_cache(self):
+        tokens = ["今日", "は", "い", "い", "天気", "です", "。"]
+        with tempfile.TemporaryDirectory() as d:
+            path = os.path.join(d, "reading_cache.json")
+            tp = TextProcessor(cache_path=path)
+            expected = tp.analyze_tokens(tokens)
+            hits = tp.cache.hits
+            self.assertEqual(tp.analyze_tokens(tokens), expected)
+            self.assertEqual(tp.cache.hits, hits + 1)
+            tp.save_cache()
+
+            warmed = TextProcessor(cache_path=path)
+            self.assertEqual(warmed.analyze_tokens(tokens), expected)
+            self.assertEqual(warmed.cache.misses, 0)
+
+class TestBatchReading(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.tp = TextProcessor()
+
+    def readings(self, tokens):
+        return [a["reading"] for a in self.tp.analyze_tokens(tokens)]
+
+    def test_matches_per_token_for_whole_words(self):
+        tokens = ["ちょっと", "待って", "ファイル", "。"]
+        self.assertEqual(self.tp.analyze_tokens(tokens), [self.tp.analyze(t) for t in tokens])
+
+    def test_compound_split_across_tokens(self):
+        # Per token "東" is read "ひがし"
+        self.assertEqual(self.readings(["東", "京", "タワー"]), ["とう", "きょう", "たわー"])
+        self.assertEqual(self.tp.analyze("東")["mora_count"], 3)
+        self.assertEqual(self.tp.analyze_tokens(["東", "京"])[0]["mora_count"], 2)
+
+    def test_okurigana_keeps_position(self):
+        self.assertEqual(self.readings(["行", "きました"]), ["い", "きました"])
+        self.assertEqual(self.readings(["待", "って"]), ["ま", "って"])
+
+    def test_english_word_split_across_tokens(self):
+        readings = self.readings([" Py", "thon", "の"])
+        self.assertEqual("".join(readings), " ぱいそんの")
+        self.assertEqual(readings[2], "の")
+
+    def test_total_moras_preserved(self):
+        text = "今日は、いい天気ですね。Hello world!\n次の行です。"
+        tokens = [text[i:i + 3] for i in range(0, len(text), 3)]
+        whole = self.tp.analyze_tokens([text])[0]
+        split = self.tp.analyze_tokens(tokens)
+        self.assertEqual(sum(a["mora_count"] for a in split), whole["mora_count"])
+        self.assertEqual([a["original"] for a in split], tokens)
+
+    def test_empty(self):
+        self.assertEqual(self.tp.analyze_tokens([]), [])
+        self.assertEqual(self.readings(["", "の", ""]), ["", "の", ""])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import sys
+import re
+import random
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from think_filter import ThinkFilter, strip_think
+
+def chunks(tokens):
+    return [{"token": t, "done": False, "prob": i / 10, "entropy": 0.1} for i, t in enumerate(tokens)]
+
+def visible(tokens, **kwargs):
+    return "".join(c["token"] for c in strip_think(chunks(tokens), **kwargs))
+
+def reference(text):
+    """
+    Left-to-right scan of the whole text. (A regex substitution differs when removing a
+    block joins "<thi" + "nk>" into a new tag, which never existed in the stream.)
+    """
+    out = []
+    i = 0
+    while True:
+        start = text.find("<think>", i)
+        if start < 0:
+            out.append(text[i:])
+            break
+        out.append(text[i:start])
+        end = text.find("</think>", start + 7)
+        if end < 0:
+            break  # unclosed block is dropped
+        i = end + 8
+    return "".join(out).lstrip()
+
+class TestThinkFilter(unittest.TestCase):
+    def test_whole_tags(self):
+        self.assertEqual(visible(["<think>", "hmm", "</think>", "\n\n", "こんにちは"]), "こんにちは")
+
+    def test_no_think(self):
+        self.assertEqual(visible(["a < b", " and c<d>e"]), "a < b and c<d>e")
+
+    def test_tags_split_in_every_position(self):
+        text = "<think>考え中</think>答え<think>再考</think>です"
+        for i in range(1, len(text)):
+            for j in range(i + 1, len(text)):
+                tokens = [text[:i], text[i:j], text[j:]]
+                self.assertEqual(visible(tokens), "答えです", tokens)
+
+    def test_one_char_tokens(self):
+        self.assertEqual(visible(list("<think>x</think>yes")), "yes")
+
+    def test_false_starts(self):
+        # Prefixes of a tag that turn out not to be one are visible, in order
+        self.assertEqual(visible(["答え<th", "ing>"]), "答え<thing>")
+        self.assertEqual(visible(["<", "<think>x</thi", "nk", "s>", "</think>ok<"]), "<ok<")
+        self.assertEqual(visible(["<think>a</thin", "</think>b"]), "b")
+
+    def test_unclosed_think_dropped(self):
+        self.assertEqual(visible(["前", "<think>", "ずっと考え"]), "前")
+
+    def test_starts_in_think(self):
+        self.assertEqual(visible(["考え", "</th", "ink>", "答え"], starts_in_think=True), "答え")
+
+    def test_split_token_keeps_values(self):
+        out = strip_think(chunks(["<think>x", "</think>答", "え"]))
+        self.assertEqual([c["token"] for c in out], ["答", "え"])
+        self.assertEqual([c["prob"] for c in out], [0.1, 0.2])
+
+    def test_visible_signal_and_counts(self):
+        seen = []
+        f = ThinkFilter(on_visible=seen.append)
+        out = []
+        for c in chunks(["<think>", "ab", "c</think>", " ", "答え", "!"]):
+            out.extend(f.feed(c))
+            if c["token"] == " ":
+                self.assertFalse(f.visible_started)
+        self.assertTrue(f.visible_started)
+        self.assertEqual([c["token"] for c in seen], ["答え"])
+        self.assertEqual(f.think_chars, 3)
+        self.assertEqual(f.think_tokens, 3)
+
+    def test_done_chunk_flushes_held_text(self):
+        f = ThinkFilter()
+        out = f.feed({"token": "まる<thi", "done": False})
+        self.assertEqual([c["token"] for c in out], ["まる"])
+        out = f.feed({"token": "", "done": True})
+        self.assertEqual([c["token"] for c in out], ["<thi", ""])
+        self.assertTrue(out[-1]["done"])
+
+    def test_done_chunk_with_text_flushes(self):
+        # The last chunk carries text and ends with a partial tag: nothing is lost
+        stream = [{"token": "まる", "done": False}, {"token": "です<thi", "done": True}]
+        out = list(ThinkFilter().filter(stream))
+        self.assertEqual("".join(c["token"] for c in out), "まるです<thi")
+        out = list(ThinkFilter().filter([{"token": "<think>a</think>b</thi", "done": True}]))
+        self.assertEqual("".join(c["token"] for c in out), "b</thi")
+
+    def test_error_passes_through(self):
+        out = list(ThinkFilter().filter([{"token": "<think>a", "done": False}, {"error": "boom"}]))
+        self.assertEqual(out, [{"error": "boom"}])
+
+    def test_random_splits_match_regex(self):
+        rng = random.Random(0)
+        pieces = ["<think>", "</think>", "<", ">", "<thi", "nk>", "</", "あいう", "text ", "\n"]
+        for _ in range(500):
+            text = "".join(rng.choice(pieces) for _ in range(rng.randint(1, 20)))
+            cuts = sorted(rng.sample(range(1, len(text)), min(len(text) - 1, rng.randint(0, 6)))) if len(text) > 1 else []
+            tokens = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+            self.assertEqual(visible(tokens), reference(text), tokens)
+
+    def test_reference_agrees_with_regex(self):
+        text = " <think>a\nb</think> 答え<think>c</think>です"
+        self.assertEqual(reference(text), re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip())
+
+if __name__ == '__main__':
+    unittest.main()
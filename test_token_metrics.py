@@ -0,0 +1,50 @@
+import unittest
+import sys
+import math
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from token_metrics import compute_token_metrics, apply_token_metrics
+
+class TestTokenMetrics(unittest.TestCase):
+    def test_known_distributions(self):
+        uniform4 = [math.log(0.25)] * 4
+        certain = [0.0]
+        skewed = [math.log(0.5), math.log(0.25), math.log(0.25)]
+
+        conf, ent = compute_token_metrics(
+            [math.log(0.25), 0.0, math.log(0.5)],
+            [uniform4, certain, skewed]
+        )
+
+        self.assertAlmostEqual(conf[0], 0.25)
+        self.assertAlmostEqual(conf[1], 1.0)
+        self.assertAlmostEqual(ent[0], math.log(4))
+        self.assertAlmostEqual(ent[1], 0.0)
+        self.assertAlmostEqual(ent[2], -(0.5 * math.log(0.5) + 2 * 0.25 * math.log(0.25)))
+
+    def test_truncated_top_k_is_renormalized(self):
+        # Two candidates with 0.3 each (the rest of the mass is unknown) -> uniform over 2
+        _, ent = compute_token_metrics([math.log(0.3)], [[math.log(0.3), math.log(0.3)]])
+        self.assertAlmostEqual(ent[0], math.log(2))
+
+    def test_ragged_and_missing(self):
+        conf, ent = compute_token_metrics([None, math.log(0.5)], [[], [math.log(0.5), math.log(0.5)]])
+        self.assertEqual(conf[0], 1.0)
+        self.assertEqual(ent[0], 0.0)
+        self.assertAlmostEqual(ent[1], math.log(2))
+
+    def test_apply_leaves_tokens_without_logprobs(self):
+        tokens = [
+            {"token": "a", "prob": 1.0, "entropy": 0.0},
+            {"token": "b", "prob": 1.0, "entropy": 0.0, "logprob": math.log(0.5),
+             "top_logprobs": [["b", math.log(0.5)], ["c", math.log(0.5)]]},
+        ]
+        apply_token_metrics(tokens)
+        self.assertEqual(tokens[0]["prob"], 1.0)
+        self.assertAlmostEqual(tokens[1]["prob"], 0.5)
+        self.assertAlmostEqual(tokens[1]["entropy"], math.log(2))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+import math
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from llm_client import OllamaClient
+from stub_ollama import StubOllamaServer
+from token_recording import (NO_STRING, RecordingClient, ReplayClient, TokenRecording,
+                             recording_paths, scan_recordings)
+from token_streams import synthetic_stream
+
+CHUNKS = [
+    {"token": "今日", "done": False, "prob": 0.9, "entropy": 0.3, "logprob": math.log(0.9),
+     "top_logprobs": [["今日", math.log(0.9)], ["明日", math.log(0.1)]]},
+    {"token": "は", "done": False, "prob": 0.5, "entropy": 1.2, "logprob": math.log(0.5),
+     "top_logprobs": [["は", math.log(0.5)]]},
+    {"token": "今日", "done": False, "prob": 1.0, "entropy": 0.0},  # no logprobs
+    {"token": "", "done": True, "prob": 1.0, "entropy": 0.0},
+]
+
+
+class TestTokenRecording(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def assertChunksEqual(self, actual, expected):
+        self.assertEqual(len(actual), len(expected))
+        for a, e in zip(actual, expected):
+            self.assertEqual(set(a), set(e))
+            self.assertEqual((a["token"], a["done"]), (e["token"], e["done"]))
+            for key in ("prob", "entropy", "logprob"):
+                if key in e:
+                    self.assertAlmostEqual(a[key], e[key], places=6)
+            for (ta, la), (te, le) in zip(a.get("top_logprobs", []), e.get("top_logprobs", [])):
+                self.assertEqual(ta, te)
+                self.assertAlmostEqual(la, le, places=6)
+            self.assertEqual(len(a.get("top_logprobs", [])), len(e.get("top_logprobs", [])))
+
+    def test_roundtrip(self):
+        path = os.path.join(self.dir.name, "a.tokrec")
+        meta = {"model": "stub", "prompt": "天気は？"}
+        TokenRecording.from_chunks(CHUNKS, [0.1, 0.2, 0.3, 0.35], meta).save(path)
+        with TokenRecording.load(path) as rec:
+            self.assertEqual(len(rec), 4)
+            self.assertEqual(rec.meta, meta)
+            self.assertEqual(rec.text, "今日は今日")
+            self.assertEqual(rec.strings, ["今日", "は", "", "明日"])  # each text stored once
+            self.assertEqual(rec.top_ids[2].tolist(), [NO_STRING, NO_STRING])
+            self.assertAlmostEqual(float(rec.times[-1]), 0.35, places=6)
+            self.assertChunksEqual(list(rec.chunks()), CHUNKS)
+            self.assertEqual(rec.entropy.dtype.itemsize, 4)
+
+    def test_empty_and_invalid(self):
+        rec = TokenRecording.from_chunks([], meta={"error": "boom"})
+        self.assertEqual((len(rec), rec.text, list(rec.chunks())), (0, "", []))
+        path = os.path.join(self.dir.name, "bad.tokrec")
+        with open(path, "wb") as f:
+            f.write(b"not a recording, just some bytes")
+        with self.assertRaises(ValueError):
+            TokenRecording.load(path)
+
+    def test_close_with_arrays_kept(self):
+        path = os.path.join(self.dir.name, "a.tokrec")
+        TokenRecording.from_chunks(CHUNKS).save(path)
+        rec = TokenRecording.load(path)
+        prob = rec.prob
+        rec.close()  # the map stays until prob goes
+        self.assertAlmostEqual(float(prob[1]), 0.5)
+        self.assertIsNone(rec.prob)
+
+    def test_record_and_replay(self):
+        with StubOllamaServer(recorded=synthetic_stream(60), delay=0.0) as server, \
+                OllamaClient(server.url, top_logprobs=5, auto_start=False) as client:
+            recorder = RecordingClient(client, self.dir.name)
+            streamed = list(recorder.generate_stream("stub", "話して", options={"temperature": 0.5}))
+            generated = recorder.generate("stub", "もう一度")
+
+        paths = recording_paths(self.dir.name)
+        self.assertEqual(len(paths), 2)
+        self.assertEqual(recorder.last_path, paths[-1])
+        with TokenRecording.load(paths[0]) as rec:
+            self.assertEqual(rec.meta["prompt"], "話して")
+            self.assertEqual(rec.meta["options"], {"temperature": 0.5})
+            self.assertEqual(rec.k, 5)
+            self.assertChunksEqual(list(rec.chunks()), streamed)
+            self.assertTrue((rec.times[1:] >= rec.times[:-1]).all())
+
+        replay = ReplayClient(paths)
+        self.assertChunksEqual(list(replay.generate_stream("any", "prompt")), streamed)
+        result = replay.generate("any", "prompt")
+        self.assertEqual(result["response"], generated["response"])
+        self.assertChunksEqual(result["tokens"], generated["tokens"])
+        self.assertEqual(replay.calls, 2)
+
+        scanned = list(scan_recordings(paths))
+        self.assertEqual([s["path"] for s in scanned], paths)
+        self.assertEqual(len(scanned[0]["entropy"]), len(streamed))
+
+    def test_recording_when_stopped_early(self):
+        with StubOllamaServer(["あ", "い", "う"]) as server, OllamaClient(server.url, auto_start=False) as client:
+            recorder = RecordingClient(client, self.dir.name)
+            stream = recorder.generate_stream("stub", "hi")
+            next(stream)
+            stream.close()
+        with TokenRecording.load(recorder.last_path) as rec:
+            self.assertEqual(rec.tokens, ["あ"])
+
+    def test_realtime_replay(self):
+        rec = TokenRecording.from_chunks(CHUNKS, [0.05, 0.1, 0.15, 0.2])
+        start = time.perf_counter()
+        list(ReplayClient(rec, realtime=True, speed=2.0).generate_stream())
+        self.assertGreaterEqual(time.perf_counter() - start, 0.1)
+        start = time.perf_counter()
+        list(ReplayClient(rec).generate_stream())
+        self.assertLess(time.perf_counter() - start, 0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
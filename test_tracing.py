@@ -0,0 +1,86 @@
+import unittest
+import sys
+import os
+import io
+import json
+import contextlib
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from tracing import NULL_TRACE, Tracer
+from fake_voicevox import FakeVoicevoxCore
+from stub_ollama import StubOllamaServer
+from token_streams import synthetic_stream
+
+class TestTracing(unittest.TestCase):
+    def test_spans_and_counts(self):
+        tracer = Tracer()
+        trace = tracer.trace(mode="batch")
+        with trace.span("mapping", tokens=3) as span:
+            span.count(moras=5)
+            span.count(moras=2)
+        trace.record("llm_first_token", 0.25)
+        report = tracer.finish(trace)
+
+        self.assertEqual(report["mode"], "batch")
+        self.assertEqual([s["name"] for s in report["spans"]], ["mapping", "llm_first_token"])
+        mapping = report["spans"][0]
+        self.assertEqual((mapping["tokens"], mapping["moras"]), (3, 7))
+        self.assertGreater(mapping["duration"], 0.0)
+        self.assertAlmostEqual(mapping["moras_per_s"], 7 / mapping["duration"])
+        self.assertEqual(report["spans"][1]["duration"], 0.25)
+
+    def test_prometheus_aggregates_requests(self):
+        tracer = Tracer(prefix="t")
+        for n in (10, 20):
+            trace = tracer.trace()
+            trace.record("synthesis", 0.5, bytes=n)
+            tracer.finish(trace)
+        text = tracer.prometheus_text()
+        self.assertIn("t_requests_total 2", text)
+        self.assertIn('t_step_seconds_sum{step="synthesis"} 1.000000', text)
+        self.assertIn('t_step_seconds_count{step="synthesis"} 2', text)
+        self.assertIn('t_bytes_total{step="synthesis"} 30', text)
+
+    def test_disabled(self):
+        tracer = Tracer(enabled=False, jsonl_path="never_written.jsonl")
+        trace = tracer.trace()
+        self.assertIs(trace, NULL_TRACE)
+        with trace.span("mapping", tokens=1) as span:
+            span.count(moras=1)
+        trace.record("llm", 1.0)
+        self.assertIsNone(tracer.finish(trace))
+        self.assertFalse(os.path.exists("never_written.jsonl"))
+        self.assertIn("requests_total 0", tracer.prometheus_text())
+
+    def test_main_writes_trace(self):
+        import main as pipeline_main
+        cwd = os.getcwd()
+        with StubOllamaServer(recorded=synthetic_stream(80)) as server, tempfile.TemporaryDirectory() as tmp:
+            os.chdir(tmp)
+            try:
+                for stream in (False, True):
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        pipeline_main.main(stream=stream, base_url=server.url, core_factory=FakeVoicevoxCore,
+                                           trace_path="trace.jsonl", metrics_path="metrics.prom")
+                with open("trace.jsonl", encoding="utf-8") as f:
+                    batch, streamed = [json.loads(line) for line in f]
+                with open("metrics.prom", encoding="utf-8") as f:
+                    metrics = f.read()
+            finally:
+                os.chdir(cwd)
+
+        steps = [s["name"] for s in batch["spans"] if not s["name"].startswith("startup_")]
+        self.assertEqual(steps, ["llm", "llm_first_token", "think_filter", "mapping", "audio_query",
+                                 "alignment", "modulation", "synthesis", "file_write"])
+        self.assertEqual(batch["spans"][0]["tokens"], 80)
+        self.assertIn("startup_tts", {s["name"] for s in batch["spans"]})
+        self.assertEqual(streamed["mode"], "stream")
+        self.assertIn("file_write", {s["name"] for s in streamed["spans"]})
+        self.assertIn('requests_total 1', metrics)  # a new Tracer per main() call
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import threading
+import time
+import unittest
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from fake_voicevox import FakeVoicevoxCore
+from tts_engine import TTSEngine
+
+class TestAudioQueryCache(unittest.TestCase):
+    def test_hit_skips_core(self):
+        tts = TTSEngine(core_factory=FakeVoicevoxCore)
+        tts.generate_audio_query("こんにちは。", 1)
+        tts.generate_audio_query(" こんにちは。 ", 1)   # same after normalization
+        tts.generate_audio_query("こんにちは。", 2)     # other speaker
+
+        self.assertEqual(tts.core.calls["audio_query"], 2)
+        stats = tts.query_cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_same_key_same_query(self):
+        # ＡＢ / AB and the newline / space normalize to the same key
+        texts = ["ＡＢ\nい", "AB い"]
+        queries = []
+        for order in (texts, texts[::-1]):
+            tts = TTSEngine(core_factory=FakeVoicevoxCore)
+            queries.append({text: tts.generate_audio_query(text, 1) for text in order})
+        uncached = TTSEngine(core_factory=FakeVoicevoxCore, query_cache_size=0)
+        for text in texts:
+            self.assertEqual(queries[0][text], queries[1][text])
+            self.assertEqual(queries[0][text], uncached.generate_audio_query(text, 1))
+
+    def test_modulation_does_not_corrupt_cache(self):
+        tts = TTSEngine(core_factory=FakeVoicevoxCore)
+        first = tts.generate_audio_query("あいう", 1)
+        first["accent_phrases"][0]["moras"][0]["pitch"] += 1.0
+        first["speedScale"] = 1.2
+
+        second = tts.generate_audio_query("あいう", 1)
+        self.assertEqual(second["accent_phrases"][0]["moras"][0]["pitch"], 5.5)
+        self.assertEqual(second["speedScale"], 1.0)
+        second["accent_phrases"][0]["moras"][0]["pitch"] -= 1.0
+        self.assertEqual(tts.generate_audio_query("あいう", 1)["accent_phrases"][0]["moras"][0]["pitch"], 5.5)
+
+    def test_memory_cap(self):
+        tts = TTSEngine(core_factory=FakeVoicevoxCore, query_cache_bytes=20_000)
+        for i in range(20):
+            tts.generate_audio_query("あいうえお" * 2 + str(i), 1)
+        stats = tts.query_cache.stats()
+        self.assertLessEqual(stats["bytes"], 20_000)
+        self.assertGreater(stats["evictions"], 0)
+
+    def test_disabled(self):
+        tts = TTSEngine(core_factory=FakeVoicevoxCore, query_cache_size=0)
+        tts.generate_audio_query("あ", 1)
+        tts.generate_audio_query("あ", 1)
+        self.assertEqual(tts.core.calls["audio_query"], 2)
+
+class TestCoreAccess(unittest.TestCase):
+    def test_core_calls_are_serialized(self):
+        class ConcurrencyCheckingCore(FakeVoicevoxCore):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, **kwargs)
+                self.active = 0
+                self.max_active = 0
+
+            def _enter(self):
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+                time.sleep(0.005)
+                self.active -= 1
+
+            def audio_query(self, text, speaker_id):
+                self._enter()
+                return super().audio_query(text, speaker_id)
+
+            def synthesis(self, query, speaker_id):
+                self._enter()
+                return super().synthesis(query, speaker_id)
+
+        tts = TTSEngine(core_factory=ConcurrencyCheckingCore, query_cache_size=0)
+
+        def work(i):
+            for j in range(5):
+                tts.synthesis(tts.generate_audio_query(f"あいう{i}{j}", 1), 1)
+
+        threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(tts.core.calls["synthesis"], 20)
+        self.assertEqual(tts.core.max_active, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).parent / "src"))
+
+from emotion_dynamics import EmotionDynamics
+from token_recording import TokenRecording
+from tuning import STATISTICS, best, load_sequences, main, sweep
+
+
+def random_sequences(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return [(rng.uniform(0.2, 1.0, size), rng.uniform(0.0, 1.5, size)) for size in rng.integers(5, 60, n)]
+
+
+class TestTuning(unittest.TestCase):
+    def test_matches_emotion_dynamics(self):
+        sequences = random_sequences(8)
+        decays, pitch, speed = [0.5, 0.9], [0.0, 0.3, 1.0], [0.05, 0.2]
+        result = sweep(sequences, decays, pitch, speed, pitch_limit=0.5, length_limit=0.4)
+        for i, d in enumerate(decays):
+            for j, p in enumerate(pitch):
+                for k, s in enumerate(speed):
+                    dynamics = EmotionDynamics(decay_rate=d, pitch_sensitivity=p, speed_sensitivity=s)
+                    curves = []
+                    for confidence, entropy in sequences:
+                        dynamics.reset()
+                        curves.append(dynamics.update_batch(confidence, entropy))
+                    pitch_delta = np.concatenate([c["pitch_delta"] for c in curves])
+                    speed_delta = np.concatenate([c["speed_delta"] for c in curves])
+                    expected = {
+                        "pitch_std": pitch_delta.std(), "pitch_mean": pitch_delta.mean(),
+                        "pitch_clip_rate": np.mean(np.abs(pitch_delta) > 0.5),
+                        "mean_slowdown": speed_delta.mean(), "slowdown_std": speed_delta.std(),
+                        "length_clip_rate": np.mean(np.abs(speed_delta) > 0.4),
+                    }
+                    for name in STATISTICS:
+                        self.assertAlmostEqual(result[name][i, j, k], expected[name], places=9, msg=name)
+
+    def test_best_configuration(self):
+        sequences = random_sequences(20)
+        grid = dict(decay_rates=np.linspace(0.5, 0.95, 10), pitch_sensitivities=np.linspace(0, 1, 11),
+                    speed_sensitivities=np.linspace(0, 0.3, 7))
+        # Targets taken from one grid point: it must come out first
+        reference = sweep(sequences, **grid)
+        i, j, k = 6, 4, 2
+        targets = {name: (reference[name][i, j, k], 0.01) for name in ("pitch_std", "mean_slowdown")}
+        rows = best(sweep(sequences, targets=targets, **grid), top=5)
+        self.assertEqual(len(rows), 5)
+        self.assertAlmostEqual(rows[0]["decay_rate"], grid["decay_rates"][i])
+        self.assertAlmostEqual(rows[0]["pitch_sensitivity"], grid["pitch_sensitivities"][j])
+        self.assertAlmostEqual(rows[0]["speed_sensitivity"], grid["speed_sensitivities"][k])
+        self.assertAlmostEqual(rows[0]["score"], 0.0)
+        self.assertEqual([r["score"] for r in rows], sorted(r["score"] for r in rows))
+
+    def test_workers(self):
+        sequences = random_sequences(10)
+        args = ([0.6, 0.7, 0.8], [0.1, 0.5], [0.1, 0.2])
+        single = sweep(sequences, *args)
+        parallel = sweep(sequences, *args, workers=2)
+        np.testing.assert_array_equal(single["score"], parallel["score"])
+
+    def test_unknown_target(self):
+        with self.assertRaises(ValueError):
+            sweep(random_sequences(2), [0.8], [0.2], [0.1], targets={"loudness": (1.0, 0.1)})
+
+    def test_recordings(self):
+        chunks = [{"token": t, "done": False, "prob": p, "entropy": e}
+                  for t, p, e in [("<think>", 0.1, 2.0), ("考え", 0.1, 2.0), ("</think>", 0.1, 2.0),
+                                  ("今日", 0.9, 0.2), ("は", 0.6, 0.8)]]
+        with tempfile.TemporaryDirectory() as d:
+            for i in range(3):
+                TokenRecording.from_chunks(chunks).save(os.path.join(d, f"{i}.tokrec"))
+            (confidence, entropy), = load_sequences([os.path.join(d, "0.tokrec")])
+            np.testing.assert_allclose(confidence, [0.9, 0.6], rtol=1e-6)
+            np.testing.assert_allclose(entropy, [0.2, 0.8], rtol=1e-6)
+            self.assertEqual(len(load_sequences([os.path.join(d, "0.tokrec")], strip_think=False)[0][0]), 5)
+
+            out = os.path.join(d, "best.json")
+            rows = main([d, "--decay", "0.7,0.8", "--pitch", "0:1:5", "--speed", "0.1",
+                         "--target", "pitch_std=0.1:0.05", "--workers", "1", "--top", "3", "--json", out])
+            with open(out, encoding="utf-8") as f:
+                saved = json.load(f)
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(saved["best"], rows)
+        self.assertEqual(saved["targets"], {"pitch_std": [0.1, 0.05]})
+
+
+if __name__ == '__main__':
+    unittest.main()
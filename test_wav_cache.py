@@ -0,0 +1,58 @@
+import unittest
+import sys
+import os
+import tempfile
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent / "src"))
+sys.path.append(str(Path(__file__).parent / "benchmarks"))
+
+from fake_voicevox import FakeVoicevoxCore
+from tts_engine import TTSEngine
+from wav_cache import WavCache
+
+class TestWavCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_quantized(self):
+        cache = WavCache(self.dir, tolerance=1e-3)
+        q = {"accent_phrases": [{"moras": [{"text": "ア", "pitch": 5.5}]}], "speedScale": 1.2}
+        near = {"accent_phrases": [{"moras": [{"text": "ア", "pitch": 5.5 + 1e-5}]}], "speedScale": 1.2}
+        far = {"accent_phrases": [{"moras": [{"text": "ア", "pitch": 5.6}]}], "speedScale": 1.2}
+        self.assertEqual(cache.key(q, 1), cache.key(near, 1))
+        self.assertNotEqual(cache.key(q, 1), cache.key(far, 1))
+        self.assertNotEqual(cache.key(q, 1), cache.key(q, 2))
+
+    def test_tts_engine_hit(self):
+        tts = TTSEngine(core_factory=FakeVoicevoxCore, wav_cache=WavCache(self.dir))
+        query = tts.generate_audio_query("こんにちは。", 1)
+        first = tts.synthesis(query, 1)
+        second = tts.synthesis(query, 1)
+
+        self.assertEqual(tts.core.calls["synthesis"], 1)
+        self.assertEqual(bytes(second), first)
+
+        # Persisted: a new process (new cache object) hits as well
+        tts2 = TTSEngine(core_factory=FakeVoicevoxCore, wav_cache=WavCache(self.dir))
+        self.assertEqual(bytes(tts2.synthesis(query, 1)), first)
+        self.assertEqual(tts2.core.calls["synthesis"], 0)
+
+    def test_lru_budget(self):
+        cache = WavCache(self.dir, max_bytes=2500)
+        for name in ["a", "b", "c"]:
+            cache.put(cache.key({"t": name}, 1), b"x" * 1000)
+            if name == "b":
+                cache.get(cache.key({"t": "a"}, 1))  # "a" becomes most recent
+        self.assertIsNotNone(cache.get(cache.key({"t": "a"}, 1)))
+        self.assertIsNone(cache.get(cache.key({"t": "b"}, 1)))
+        self.assertLessEqual(cache.stats()["bytes"], 2500)
+        # No temp files left behind
+        self.assertEqual([p for p in Path(self.dir).rglob("*") if p.suffix == ".tmp"], [])
+
+if __name__ == '__main__':
+    unittest.main()